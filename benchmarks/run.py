@@ -0,0 +1,130 @@
+""" Benchmarks each stage of the salad generation pipeline against synthetic
+corpora of increasing size, and writes the timings and peak memory of every
+stage to a JSON results file so that runs can be compared between commits.
+
+Usage, from the repository root:
+
+    python -m benchmarks.run --scales 1 10 --output bench_results.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+from models.graph import Graph
+from preprocessing.main import read_data
+from preprocessing.similarity import similarity_mappings
+from traversal.traverser import Traverser, greedy_chooser
+from benchmarks.synthetic import generate_scaled_corpus
+
+STAGES: Tuple[str, ...] = ("read_data", "create_mappings", "graph_init",
+                           "closest_neighbors", "next_candidates")
+
+
+def measure(fn: Callable[[], Any], memory: bool = True) -> Tuple[Any, float, int]:
+    """ Calls fn and returns its result, the wall time it took in seconds and,
+    if memory is set, the peak memory it allocated in bytes as reported by
+    tracemalloc. The timing comes from a separate call without tracemalloc
+    running, as tracing slows allocation-heavy code down considerably.
+    """
+    gc.collect()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+
+    peak = None
+    if memory:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark_corpus(data_path: str, memory: bool = True, queries: int = 100,
+                     stages: Sequence[str] = STAGES) -> List[Dict]:
+    """ Runs every stage against the corpus at data_path and returns one
+    result per stage. Later stages use the output of the earlier ones.
+    """
+    results: List[Dict] = []
+
+    def record(stage: str, fn: Callable[[], Any]) -> Any:
+        result, seconds, peak = measure(fn, memory and stage in stages)
+        if stage in stages:
+            results.append({"stage": stage, "seconds": seconds, "peak_bytes": peak})
+        return result
+
+    ingredients = record("read_data", lambda: read_data(data_path))
+    mappings = record("create_mappings", lambda: similarity_mappings(ingredients))
+    graph = record("graph_init", lambda: Graph(mappings))
+
+    nodes = graph.get_nodes()
+    record("closest_neighbors",
+           lambda: [graph.closest_neighbors(nodes[i % len(nodes)], 10)
+                    for i in range(queries)])
+
+    def traverse():
+        return Traverser(graph).generate(greedy_chooser, nodes[0])
+    record("next_candidates", traverse)
+
+    for result in results:
+        result["ingredients"] = len(ingredients)
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales: Sequence[float], output: str, seed: int = 0, memory: bool = True,
+        stages: Sequence[str] = STAGES) -> Dict:
+    """ Generates a corpus at every scale, benchmarks it, and writes all
+    results to the output path. Returns the written document.
+    """
+    document = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": []
+    }
+
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as root:
+            generate_scaled_corpus(root, scale, seed)
+            for result in benchmark_corpus(root, memory, stages=stages):
+                result["scale"] = scale
+                document["results"].append(result)
+                print(f"scale {scale:<8g} {result['stage']:<20} "
+                      f"{result['seconds']:>10.4f}s {result['peak_bytes'] or 0:>14,d}B")
+
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+    return document
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the pipeline on synthetic corpora.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10],
+                        help="corpus sizes as multiples of the checked-in data directory")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the tracemalloc pass which measures peak memory")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    run(args.scales, args.output, args.seed, not args.no_memory, args.stages)
@@ -0,0 +1,109 @@
+""" Measures cold start: how long importing each package module takes, and
+how long the interactive traversal CLI takes to show its first prompt. Every
+measurement runs in a fresh interpreter, so nothing is already imported or
+cached in memory. Each result is compared against a budget, and the command
+exits with status 1 if any budget is exceeded.
+
+Usage, from the repository root:
+
+    python -m benchmarks.startup --repeat 3
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Sequence
+
+# Budgets, in seconds, for the cumulative import time of each module as
+# reported by python -X importtime.
+IMPORT_BUDGETS: Dict[str, float] = {
+    "models.graph": 0.1,
+    "preprocessing.main": 0.1,
+    "traversal.traverser": 0.15,
+    "service.server": 0.2
+}
+
+# Budget, in seconds, for the traversal CLI to show its first prompt with a
+# warm corpus cache.
+FIRST_PROMPT_BUDGET: float = 1.5
+
+FIRST_PROMPT: str = "Choose an ingredient:"
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module: str) -> float:
+    """ Returns the cumulative time, in seconds, taken to import the supplied
+    module in a fresh interpreter.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=ROOT, capture_output=True, text=True, check=True)
+    for line in reversed(completed.stderr.splitlines()):
+        # Any other output on stderr, such as a warning, is skipped.
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == module and not name[1:].startswith(" "):
+            return int(cumulative) / 1e6
+    raise ValueError(f"no import time reported for {module}")
+
+
+def measure_first_prompt(timeout: float = 60) -> float:
+    """ Starts the traversal CLI and returns the time, in seconds, until its
+    first prompt is written. The CLI is stopped once the prompt appears.
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "__init__.py"],
+                               cwd=os.path.join(ROOT, "traversal"), stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+    try:
+        output = b""
+        while FIRST_PROMPT.encode() not in output:
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError("the traversal CLI did not prompt in time")
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError("the traversal CLI exited before prompting")
+            output += chunk
+        return time.perf_counter() - started
+    finally:
+        process.kill()
+        process.wait()
+
+
+def run(repeat: int = 1, modules: Sequence[str] = tuple(IMPORT_BUDGETS),
+        first_prompt: bool = True) -> List[Dict]:
+    """ Takes the best of repeat measurements of every module's import time
+    and, if first_prompt is set, of the time to the first prompt. Returns one
+    result per measurement with its budget and whether it was met.
+    """
+    results: List[Dict] = []
+    for module in modules:
+        seconds = min(measure_import(module) for _ in range(repeat))
+        budget = IMPORT_BUDGETS.get(module)
+        results.append({"measure": f"import {module}", "seconds": seconds, "budget": budget,
+                        "ok": budget is None or seconds <= budget})
+
+    if first_prompt:
+        # The first run may build the corpus cache, so it is not counted.
+        measure_first_prompt()
+        seconds = min(measure_first_prompt() for _ in range(repeat))
+        results.append({"measure": "first prompt", "seconds": seconds,
+                        "budget": FIRST_PROMPT_BUDGET, "ok": seconds <= FIRST_PROMPT_BUDGET})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures import and first prompt times.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-prompt", action="store_true",
+                        help="only measure import times")
+    args = parser.parse_args()
+
+    results = run(args.repeat, first_prompt=not args.skip_prompt)
+    for r in results:
+        print(f"{r['measure']:<32} {r['seconds'] * 1000:8.1f} ms  "
+              f"(budget {r['budget'] * 1000:.0f} ms){'' if r['ok'] else '  OVER BUDGET'}")
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
@@ -0,0 +1,115 @@
+""" Generates synthetic FlavorDB corpora for benchmarking.
+
+The generated files follow the layout of the data directory, with one
+folder per ingredient type, and each file is shaped like a FlavorDB entity so
+that it can be read by preprocessing.main.read_data.
+
+Molecule popularity follows a Zipf-like distribution, so a few molecules are
+shared by most ingredients while the long tail appears in only a handful of
+them. This gives a similar spread of shared-molecule counts to the real
+database. Generation is fully determined by the seed.
+"""
+import itertools
+import json
+import os
+import random
+from typing import Dict, List
+
+# Fraction of ingredients of each type, matching the checked-in data.
+TYPE_SHARES: Dict[str, float] = {"base": 7 / 50, "topping": 34 / 50,
+                                 "protein": 8 / 50, "dressing": 1 / 50}
+
+# Number of ingredient files in the checked-in data directory, used as the
+# unit for scale factors.
+BASE_CORPUS_SIZE: int = 50
+
+FLAVOR_TERMS: List[str] = [
+    "bitter", "sweet", "green", "fruity", "floral", "waxy", "fatty", "nutty",
+    "earthy", "spicy", "woody", "citrus", "herbal", "mint", "creamy", "sour",
+    "savory", "meaty", "smoky", "roasted", "caramel", "vanilla", "musty",
+    "sulfurous", "pungent", "balsamic", "coffee", "cocoa", "almond", "honey"]
+
+
+def molecule_record(rng: random.Random, pubchem_id: int, padding: int) -> Dict:
+    """ Returns a FlavorDB-shaped molecule. Padding adds that many filler fields
+    so that files carry unused data like the real ~45-field records.
+    """
+    profile = rng.sample(FLAVOR_TERMS, rng.randint(1, 5))
+    record = {
+        "pubchem_id": pubchem_id,
+        "common_name": f"molecule-{pubchem_id}",
+        "fooddb_flavor_profile": "@".join(profile),
+        "flavor_profile": "@".join(reversed(profile)),
+        "molecular_weight": round(rng.uniform(30, 600), 3),
+        "taste": rng.choice(["bitter", "sweet", "", "sour"]),
+        "smile": "C" * rng.randint(4, 40),
+    }
+    for i in range(padding):
+        record[f"field_{i}"] = rng.randint(0, 1000)
+    return record
+
+
+def generate_corpus(root_path: str, n_ingredients: int, n_molecules: int,
+                    molecules_per_ingredient: int = 120, zipf_exponent: float = 1.1,
+                    padding: int = 30, seed: int = 0) -> List[str]:
+    """ Writes n_ingredients FlavorDB-shaped files under root_path, drawing
+    about molecules_per_ingredient molecules for each from a pool of
+    n_molecules. Returns the paths of the written files.
+    """
+    assert n_molecules >= molecules_per_ingredient, \
+        "n_molecules must be at least molecules_per_ingredient"
+    rng = random.Random(seed)
+
+    # Molecules are encoded once and spliced into every file containing them.
+    molecules = [json.dumps(molecule_record(rng, 1000 + i, padding))
+                 for i in range(n_molecules)]
+    cumulative_popularity = list(itertools.accumulate(
+        1 / (rank + 1) ** zipf_exponent for rank in range(n_molecules)))
+
+    types: List[str] = []
+    for t, share in TYPE_SHARES.items():
+        types.extend([t] * max(1, round(share * n_ingredients)))
+    types = types[:n_ingredients]
+    while len(types) < n_ingredients:
+        types.append("topping")
+    rng.shuffle(types)
+
+    for t in TYPE_SHARES:
+        os.makedirs(os.path.join(root_path, t), exist_ok=True)
+
+    paths: List[str] = []
+    for i, t in enumerate(types):
+        count = max(1, min(n_molecules, int(rng.gauss(molecules_per_ingredient,
+                                                      molecules_per_ingredient / 4))))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(rng.choices(range(n_molecules), cum_weights=cumulative_popularity,
+                                      k=count - len(chosen)))
+        entity = {
+            "category": "synthetic",
+            "entity_id": 100000 + i,
+            "category_readable": "Synthetic",
+            "entity_alias_readable": f"Ingredient {i}",
+            "natural_source_name": "",
+            "molecules": []
+        }
+        encoded = json.dumps(entity)
+        assert encoded.endswith("[]}"), "molecules must be the last field"
+        path = os.path.join(root_path, t, f"ingredient-{i}.json")
+        with open(path, "w") as f:
+            f.write(encoded[:-2])
+            f.write(", ".join(molecules[m] for m in sorted(chosen)))
+            f.write("]}")
+        paths.append(path)
+
+    return paths
+
+
+def generate_scaled_corpus(root_path: str, scale: float, seed: int = 0) -> List[str]:
+    """ Writes a corpus with scale times as many ingredients as the checked-in
+    data directory, with a molecule pool that grows with the square root of
+    the corpus size, as it does across FlavorDB.
+    """
+    n_ingredients = max(1, int(BASE_CORPUS_SIZE * scale))
+    n_molecules = int(2000 * max(1.0, scale) ** 0.5)
+    return generate_corpus(root_path, n_ingredients, n_molecules, seed=seed)
@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from models.ingredient import IngredientType
+from preprocessing.main import read_data
+from .synthetic import generate_corpus, generate_scaled_corpus
+from .run import run, STAGES
+from .startup import measure_import, run as run_startup
+
+def read_tree(root):
+    contents = {}
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(dirpath, name)) as f:
+                contents[os.path.relpath(os.path.join(dirpath, name), root)] = f.read()
+    return contents
+
+class TestBenchmarks:
+    def test_generator_is_deterministic(self, tmp_path):
+        generate_corpus(str(tmp_path / "a"), 20, 300, molecules_per_ingredient=40, seed=3)
+        generate_corpus(str(tmp_path / "b"), 20, 300, molecules_per_ingredient=40, seed=3)
+        generate_corpus(str(tmp_path / "c"), 20, 300, molecules_per_ingredient=40, seed=4)
+        assert read_tree(tmp_path / "a") == read_tree(tmp_path / "b")
+        assert read_tree(tmp_path / "a") != read_tree(tmp_path / "c")
+
+    def test_generated_corpus_is_readable(self, tmp_path):
+        paths = generate_scaled_corpus(str(tmp_path), 1)
+        assert len(paths) == 50
+
+        ingredients = read_data(str(tmp_path))
+        assert len(ingredients) == 50
+        assert {i.get_type() for i in ingredients} == set(IngredientType)
+        assert all(len(i.get_molecule_ids()) > 0 for i in ingredients)
+        with open(paths[0]) as f:
+            assert "molecular_weight" in json.load(f)["molecules"][0]
+
+    def test_run_writes_results(self, tmp_path):
+        output = str(tmp_path / "results.json")
+        run([0.5], output, memory=False)
+        with open(output) as f:
+            document = json.load(f)
+        assert [r["stage"] for r in document["results"]] == list(STAGES)
+        assert all(r["seconds"] >= 0 and r["scale"] == 0.5 for r in document["results"])
+
+    def test_imports_defer_heavy_dependencies(self):
+        for module in ["models.graph", "preprocessing.main", "traversal.traverser"]:
+            loaded = subprocess.run(
+                [sys.executable, "-c", f"import sys, {module}; print(' '.join(sys.modules))"],
+                capture_output=True, text=True, check=True).stdout.split()
+            assert "networkx" not in loaded
+            assert "numpy" not in loaded
+        assert measure_import("models.graph") > 0
+
+    def test_measure_import_skips_other_stderr_output(self, monkeypatch):
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        350 | models.graph\n"
+                  "warning: something unrelated\n")
+        monkeypatch.setattr(subprocess, "run", lambda *args, **kwargs:
+                            subprocess.CompletedProcess(args, 0, "", stderr))
+        assert measure_import("models.graph") == pytest.approx(350 / 1e6)
+
+    def test_startup_reports_budgets(self):
+        results = run_startup(modules=["models.graph"], first_prompt=False)
+        assert [r["measure"] for r in results] == ["import models.graph"]
+        assert results[0]["budget"] > 0 and "ok" in results[0]
@@ -0,0 +1,41 @@
+import pytest
+from typing import List
+from preprocessing.main import create_mappings, read_data
+from models.graph import BACKENDS, Graph, create_graph
+from models.ingredient import Ingredient, IngredientType
+from models.molecule import Molecule
+
+
+def make_ingredient(name: str, id: int, pubchem_ids: List[int]) -> Ingredient:
+    """ Builds a topping with one bitter molecule per supplied Pubchem ID, for
+    tests which need a small corpus of their own.
+    """
+    molecules: List[Molecule] = [Molecule(p, str(p), ("bitter",)) for p in pubchem_ids]
+    return Ingredient(name, "test", id, molecules, IngredientType.TOPPING)
+
+
+@pytest.fixture(scope="session")
+def sample_ingredients():
+    """ The ingredients of the corpus under ./data, read once per test run.
+    """
+    return read_data("./data")
+
+
+@pytest.fixture(scope="session")
+def sample_mappings():
+    """ The mappings of the corpus under ./data, computed once per test run
+    rather than while the test modules are collected.
+    """
+    return create_mappings("./data")
+
+
+@pytest.fixture(scope="session")
+def sample_graph(sample_mappings):
+    return Graph(sample_mappings)
+
+
+@pytest.fixture(scope="session")
+def sample_graphs(sample_mappings):
+    """ A graph of the sample mappings for every backend, keyed by backend.
+    """
+    return {backend: create_graph(sample_mappings, backend) for backend in BACKENDS}
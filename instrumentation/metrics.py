@@ -0,0 +1,237 @@
+""" An opt-in instrumentation layer which records how long each pipeline
+stage takes, how often hot methods are called and, optionally, the peak
+memory allocated within each stage.
+
+Instrumentation is disabled by default. While disabled, span returns a shared
+no-op context manager and count returns immediately; hot call sites also
+check metrics.enabled themselves so that they only pay for an attribute
+lookup. Enable it with metrics.enable(), run the code of interest, then
+export the results with to_json or to_prometheus.
+
+Spans may be nested. Peak memory is measured with tracemalloc, which is
+started by enable(memory=True) and slows allocation-heavy code down, so it
+is kept separate from timing. Each span resets the tracemalloc peak when it
+starts. Python 3.9 and later reset it with tracemalloc.reset_peak; older
+interpreters clear the traces instead, carrying the memory in use over, so
+memory allocated before a span and freed within it is not subtracted from
+its peak.
+
+tracemalloc traces the whole process, so a span's peak also includes memory
+allocated meanwhile by other threads, such as batch or prefetch workers.
+Peaks are therefore only recorded for spans run on the thread which enabled
+memory tracking, and are exact only while no other thread allocates.
+"""
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+
+class SpanStats:
+    """ The accumulated measurements of every run of one named span. Peak
+    memory is the largest allocation above the memory in use when the span
+    started, over all its runs, or None if memory was not tracked.
+    """
+    __slots__ = ("count", "total_seconds", "max_seconds", "peak_memory")
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.peak_memory = None
+
+    def json(self) -> Dict:
+        return {"count": self.count, "total_seconds": self.total_seconds,
+                "max_seconds": self.max_seconds, "peak_memory_bytes": self.peak_memory}
+
+
+class _Frame:
+    __slots__ = ("start_memory", "peak")
+
+    def __init__(self, start_memory: int):
+        self.start_memory = start_memory
+        self.peak = start_memory
+
+
+class _NullSpan:
+    """ The context manager returned by span while instrumentation is
+    disabled.
+    """
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Instrumentation:
+    """ Collects span timings and call counters. A single instance, metrics,
+    is shared by the whole process.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self._memory_thread: int = None
+        self._memory_base = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.spans: Dict[str, SpanStats] = {}
+        self.counters: Dict[str, int] = {}
+
+    def enable(self, memory: bool = False):
+        """ Starts recording. If memory is set, tracemalloc is started as well
+        and each span run on the calling thread also records its peak memory.
+        """
+        self.memory = memory
+        if memory:
+            self._memory_thread = threading.get_ident()
+            self._memory_base = 0
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        """ Stops recording, keeping what was recorded so far.
+        """
+        self.enabled = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+        self._memory_thread = None
+
+    def reset(self):
+        with self._lock:
+            self.spans = {}
+            self.counters = {}
+
+    def count(self, name: str, n: int = 1):
+        """ Adds n to the named call counter.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def span(self, name: str):
+        """ Returns a context manager which times the enclosed block under the
+        given stage name.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        frame = self._enter_memory() \
+            if self.memory and threading.get_ident() == self._memory_thread else None
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            peak = self._exit_memory(frame) if frame is not None else None
+            with self._lock:
+                stats = self.spans.get(name)
+                if stats is None:
+                    stats = self.spans[name] = SpanStats()
+                stats.count += 1
+                stats.total_seconds += seconds
+                stats.max_seconds = max(stats.max_seconds, seconds)
+                if peak is not None:
+                    stats.peak_memory = max(stats.peak_memory or 0, peak)
+
+    def _frames(self) -> List[_Frame]:
+        frames = getattr(self._local, "frames", None)
+        if frames is None:
+            frames = self._local.frames = []
+        return frames
+
+    def _enter_memory(self) -> _Frame:
+        # The tracemalloc peak is reset for the new span, so the peak reached
+        # so far is first handed to the spans enclosing it.
+        frames = self._frames()
+        current, peak = self._traced_memory()
+        for frame in frames:
+            frame.peak = max(frame.peak, peak)
+        self._reset_peak()
+        frame = _Frame(current)
+        frames.append(frame)
+        return frame
+
+    def _exit_memory(self, frame: _Frame) -> int:
+        frames = self._frames()
+        _, peak = self._traced_memory()
+        frame.peak = max(frame.peak, peak)
+        frames.remove(frame)
+        if frames:
+            frames[-1].peak = max(frames[-1].peak, frame.peak)
+        return frame.peak - frame.start_memory
+
+    def _traced_memory(self) -> Tuple[int, int]:
+        current, peak = tracemalloc.get_traced_memory()
+        return self._memory_base + current, self._memory_base + peak
+
+    def _reset_peak(self):
+        if _RESET_PEAK:
+            tracemalloc.reset_peak()
+        else:
+            # Clearing the traces resets the peak but also the memory in use,
+            # which is carried over so that readings stay comparable.
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.clear_traces()
+            self._memory_base += current
+
+    def report(self) -> Dict:
+        """ Returns every span's statistics and every counter as a dictionary.
+        """
+        with self._lock:
+            return {"spans": {name: stats.json() for name, stats in sorted(self.spans.items())},
+                    "counters": dict(sorted(self.counters.items()))}
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.report(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "salad") -> str:
+        """ Returns the recorded metrics in the Prometheus text exposition
+        format.
+        """
+        report = self.report()
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help: str, label: str, values: Dict):
+            lines.append(f"# HELP {prefix}_{name} {help}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for key, value in values.items():
+                lines.append(f'{prefix}_{name}{{{label}="{_escape(key)}"}} {value!r}')
+
+        spans = report["spans"]
+        family("span_seconds_total", "counter", "Total time spent in each stage.", "span",
+               {k: s["total_seconds"] for k, s in spans.items()})
+        family("span_calls_total", "counter", "Number of times each stage ran.", "span",
+               {k: s["count"] for k, s in spans.items()})
+        family("span_max_seconds", "gauge", "Longest single run of each stage.", "span",
+               {k: s["max_seconds"] for k, s in spans.items()})
+        family("span_peak_memory_bytes", "gauge", "Peak memory allocated within each stage.",
+               "span", {k: s["peak_memory_bytes"] for k, s in spans.items()
+                        if s["peak_memory_bytes"] is not None})
+        family("calls_total", "counter", "Number of calls to each instrumented method.",
+               "name", report["counters"])
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# Whether tracemalloc can reset its peak without clearing its traces, which
+# needs Python 3.9 or later.
+_RESET_PEAK: bool = hasattr(tracemalloc, "reset_peak")
+
+
+# The instrumentation shared by every module in the process.
+metrics = Instrumentation()
@@ -0,0 +1,105 @@
+import json
+import pytest
+from models.graph import create_graph
+from preprocessing.main import create_mappings
+from traversal.traverser import Traverser
+from .metrics import Instrumentation, metrics
+
+
+@pytest.fixture
+def recording():
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.reset()
+
+
+class TestMetrics:
+    def test_disabled_records_nothing(self):
+        instrumentation = Instrumentation()
+        with instrumentation.span("stage"):
+            instrumentation.count("call")
+        assert instrumentation.report() == {"spans": {}, "counters": {}}
+
+    def test_spans_and_counters(self):
+        instrumentation = Instrumentation()
+        instrumentation.enable()
+        for _ in range(3):
+            with instrumentation.span("outer"):
+                with instrumentation.span("inner"):
+                    instrumentation.count("call", 2)
+        report = instrumentation.report()
+        assert report["spans"]["outer"]["count"] == 3
+        assert report["spans"]["inner"]["total_seconds"] <= \
+            report["spans"]["outer"]["total_seconds"]
+        assert report["spans"]["inner"]["peak_memory_bytes"] is None
+        assert report["counters"] == {"call": 6}
+
+    @pytest.mark.parametrize("reset_peak", [True, False])
+    def test_peak_memory_of_nested_spans(self, reset_peak, monkeypatch):
+        import instrumentation.metrics as module
+        if reset_peak and not module._RESET_PEAK:
+            pytest.skip("requires tracemalloc.reset_peak")
+        monkeypatch.setattr(module, "_RESET_PEAK", reset_peak)
+        instrumentation = Instrumentation()
+        instrumentation.enable(memory=True)
+        try:
+            with instrumentation.span("outer"):
+                with instrumentation.span("inner"):
+                    block = bytearray(1 << 20)
+                    del block
+                with instrumentation.span("small"):
+                    pass
+        finally:
+            instrumentation.disable()
+        spans = instrumentation.report()["spans"]
+        assert spans["inner"]["peak_memory_bytes"] >= 1 << 20
+        assert spans["outer"]["peak_memory_bytes"] >= 1 << 20
+        assert spans["small"]["peak_memory_bytes"] < 1 << 20
+
+    def test_pipeline_stages(self, recording, sample_mappings):
+        # The corpus stages are recorded over one folder rather than the whole
+        # corpus, which the session fixtures have already read.
+        create_mappings("./data/protein")
+        G = create_graph(sample_mappings, "array")
+        Traverser(G).generate()
+        G.get_weight_between("spinach", "tomato")
+        G.get_node_by_name("spinach")
+
+        report = recording.report()
+        for stage in ["read_data", "read_data.read_file", "read_data.decode_json",
+                      "read_data.construct_ingredient", "create_mappings",
+                      "create_mappings.similarity", "create_mappings.sort", "graph_init",
+                      "next_candidates"]:
+            assert report["spans"][stage]["count"] > 0, stage
+        assert report["spans"]["read_data.read_file"]["count"] == 8
+        assert report["counters"] == {"get_weight_between": 1, "get_node_by_name": 1}
+        assert json.loads(recording.to_json()) == report
+
+    def test_prometheus_export(self):
+        instrumentation = Instrumentation()
+        instrumentation.enable()
+        with instrumentation.span('odd "name"'):
+            instrumentation.count("get_weight_between")
+        text = instrumentation.to_prometheus()
+        assert "# TYPE salad_span_seconds_total counter" in text
+        assert 'salad_span_calls_total{span="odd \\"name\\""} 1' in text
+        assert 'salad_calls_total{name="get_weight_between"} 1' in text
+        assert "salad_span_peak_memory_bytes{" not in text
+        assert text.endswith("\n")
+
+    def test_memory_is_only_tracked_on_the_enabling_thread(self):
+        import threading
+        instrumentation = Instrumentation()
+        instrumentation.enable(memory=True)
+        try:
+            def worker():
+                with instrumentation.span("worker"):
+                    pass
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        finally:
+            instrumentation.disable()
+        assert instrumentation.report()["spans"]["worker"]["peak_memory_bytes"] is None
@@ -0,0 +1,69 @@
+"""Stores the flavor profiles of a corpus of ingredients as a single matrix,
+with one row per ingredient and one column per flavor profile term, so that
+flavors can be compared across all ingredients at once.
+"""
+from typing import Dict, List
+import numpy as np
+from .ingredient import Ingredient, FlavorProfiles
+
+
+class FlavorMatrix:
+    """Vocabulary-indexed flavor profile counts for a list of ingredients.
+    Row i holds the counts of the i-th ingredient, and column j the counts of
+    the flavor profile vocabulary[j].
+    """
+    def __init__(self, ingredients: List[Ingredient]):
+        assert ingredients is not None, "ingredients must be supplied"
+
+        self.ingredients = ingredients
+        self.vocabulary: List[str] = sorted({fp for ing in ingredients
+                                             for fp, _ in ing.flavor_profiles})
+        self.term_index: Dict[str, int] = {t: i for i, t in enumerate(self.vocabulary)}
+        self.ingredient_index: Dict[Ingredient, int] = {ing: i for i, ing in enumerate(ingredients)}
+
+        self.counts = np.zeros((len(ingredients), len(self.vocabulary)), dtype=np.float64)
+        for row, ing in enumerate(ingredients):
+            for fp, count in ing.flavor_profiles:
+                self.counts[row, self.term_index[fp]] = count
+
+        self._top_flavors: Dict[Ingredient, FlavorProfiles] = {}
+        self._cosine: np.ndarray = None
+
+    def row(self, ingredient: Ingredient) -> np.ndarray:
+        """Returns the flavor profile counts of the supplied ingredient.
+        """
+        return self.counts[self.ingredient_index[ingredient]]
+
+    def top_flavors(self, ingredient: Ingredient, count: int = None) -> FlavorProfiles:
+        """Returns the most common flavor profiles of the supplied ingredient
+        with their counts, strongest first, with ties in vocabulary order.
+        The ranking of each ingredient is computed once and cached.
+        """
+        ranked = self._top_flavors.get(ingredient)
+        if ranked is None:
+            row = self.row(ingredient)
+            order = np.argsort(-row, kind="stable")
+            ranked = [(self.vocabulary[j], int(row[j])) for j in order if row[j] > 0]
+            self._top_flavors[ingredient] = ranked
+        return ranked if count is None else ranked[:count]
+
+    def ingredients_with_flavor(self, term: str) -> List[Ingredient]:
+        """Returns the ingredients containing at least one molecule with the
+        supplied flavor profile.
+        """
+        column = self.term_index.get(term)
+        if column is None:
+            return []
+        return [self.ingredients[i] for i in np.flatnonzero(self.counts[:, column])]
+
+    def cosine_similarity(self) -> np.ndarray:
+        """Returns the n x n matrix of cosine similarities between the flavor
+        profile counts of every pair of ingredients. Ingredients without any
+        flavor profiles have a similarity of 0 to everything.
+        """
+        if self._cosine is None:
+            norms = np.linalg.norm(self.counts, axis=1)
+            unit = np.divide(self.counts, norms[:, None], out=np.zeros_like(self.counts),
+                             where=norms[:, None] > 0)
+            self._cosine = np.clip(unit @ unit.T, 0.0, 1.0)
+        return self._cosine
@@ -1,10 +1,14 @@
-from typing import List, Tuple
-import networkx as nx
-import os
+from typing import Dict, List, Tuple
 import sys
 sys.path.append("../..")
-from preprocessing.main import create_mappings
 from models.ingredient import Ingredient, IngredientType
+from models.graph.edges import Mapping, select_edges
+from instrumentation.metrics import metrics
+
+# networkx and numpy are only imported once a graph of the matching backend is
+# built, so that importing this module stays cheap; see __getattr__.
+
+Neighbor = Tuple[Ingredient, Dict]
 
 """
 Wraps the Networkx graph class to provide additional functionality relevant to salad generation,
@@ -13,53 +17,251 @@ including convenience methods for returning the closest neighbours of a given in
 class Graph:
     """
     Instantiates a Graph object by creating a Networkx graph from a given list of
-    ingredient mappings.
+    ingredient mappings. By default every mapping becomes an edge. Passing top_k,
+    optionally with per_type, or min_weight builds a sparse graph keeping only the
+    strongest edges of each ingredient, see select_edges. Every ingredient remains a
+    node of the graph even if all of its edges are dropped.
     """
-    def __init__(self, mappings: List[Tuple[Ingredient, Ingredient, int]]):
-        self.G = nx.Graph()
-        for item in mappings:
-            self.G.add_edge(item[0], item[1], weight=item[2])
+    def __init__(self, mappings: List[Tuple[Ingredient, Ingredient, int]], top_k: int = None,
+                 per_type: bool = False, min_weight: float = None):
+        with metrics.span("graph_init"):
+            import networkx as nx
+            self.G = nx.Graph()
+            for item in mappings:
+                self.G.add_node(item[0])
+                self.G.add_node(item[1])
+            for item in select_edges(mappings, top_k, per_type, min_weight):
+                self.G.add_edge(item[0], item[1], weight=item[2])
+            self._build_indexes()
         print(self.G)
 
+    def _build_indexes(self):
+        """
+        Builds the lookup indexes over the Networkx graph: nodes keyed by name and by
+        id, and the neighbours of every node presorted from strongest to weakest, both
+        in full and partitioned by ingredient type.
+        """
+        self._nodes_by_name: Dict[str, Ingredient] = {}
+        self._nodes_by_id: Dict[int, Ingredient] = {}
+        self._sorted_neighbors: Dict[Ingredient, List[Neighbor]] = {}
+        self._sorted_neighbors_by_type: Dict[Ingredient, Dict[IngredientType, List[Neighbor]]] = {}
+
+        for n in self.G:
+            self._nodes_by_name.setdefault(n.get_name(), n)
+            self._nodes_by_id.setdefault(n.get_id(), n)
+            self._sort_neighbors(n)
+
+    def _sort_neighbors(self, node):
+        """
+        Sorts the neighbours of a node from strongest to weakest into the index, both in
+        full and partitioned by ingredient type.
+        """
+        ordered = sorted(self.G[node].items(), key=lambda n: n[1]['weight'], reverse=True)
+        by_type: Dict[IngredientType, List[Neighbor]] = {t: [] for t in IngredientType}
+        for neighbor in ordered:
+            by_type[neighbor[0].get_type()].append(neighbor)
+
+        self._sorted_neighbors[node] = ordered
+        self._sorted_neighbors_by_type[node] = by_type
+
+    def _neighbors_by_type(self, node) -> Dict[IngredientType, List[Neighbor]]:
+        # Sorted neighbours are dropped from the index when a node's edges change, and
+        # sorted again on the next query.
+        if node not in self._sorted_neighbors_by_type:
+            self._sort_neighbors(node)
+        return self._sorted_neighbors_by_type[node]
+
+    def add_ingredient(self, ingredient: Ingredient, weights: Dict[Ingredient, int],
+                       min_weight: float = None):
+        """
+        Adds an ingredient to the graph, with an edge to every existing node in weights
+        that meets min_weight, and patches the indexes in place. The sorted neighbours of
+        the affected nodes are dropped and re-sorted when next queried.
+        """
+        assert ingredient not in self.G, f"{ingredient} is already in the graph"
+        self.G.add_node(ingredient)
+        for other, weight in weights.items():
+            if other in self.G and other != ingredient and \
+                    (min_weight is None or weight >= min_weight):
+                self.G.add_edge(ingredient, other, weight=weight)
+                self._invalidate_neighbors(other)
+
+        self._nodes_by_name.setdefault(ingredient.get_name(), ingredient)
+        self._nodes_by_id.setdefault(ingredient.get_id(), ingredient)
+        self._sort_neighbors(ingredient)
+
+    def remove_ingredient(self, ingredient: Ingredient):
+        """
+        Removes an ingredient and its edges from the graph, and patches the indexes in
+        place.
+        """
+        for other in list(self.G[ingredient]):
+            self._invalidate_neighbors(other)
+        self.G.remove_node(ingredient)
+        self._invalidate_neighbors(ingredient)
+
+        if self._nodes_by_name.get(ingredient.get_name()) is ingredient:
+            del self._nodes_by_name[ingredient.get_name()]
+            for n in self.G:
+                if n.get_name() == ingredient.get_name():
+                    self._nodes_by_name[n.get_name()] = n
+                    break
+        if self._nodes_by_id.get(ingredient.get_id()) is ingredient:
+            del self._nodes_by_id[ingredient.get_id()]
+
+    def _invalidate_neighbors(self, node):
+        self._sorted_neighbors.pop(node, None)
+        self._sorted_neighbors_by_type.pop(node, None)
+
     """
     Returns the node of the graph that matches the supplied ingredient name.
     """
     def get_node_by_name(self, name: str):
-        for n in self.G:
-            if n.get_name() == name:
-                return n
-        return None
+        if metrics.enabled:
+            metrics.count("get_node_by_name")
+        return self._nodes_by_name.get(name)
+
+    """
+    Returns the node of the graph that matches the supplied FlavorDB entity id.
+    """
+    def get_node_by_id(self, id: int):
+        return self._nodes_by_id.get(id)
 
     def get_nodes(self):
         return list(self.G.nodes)
 
+    def number_of_edges(self) -> int:
+        return self.G.number_of_edges()
+
+    def get_edges(self) -> List[Mapping]:
+        """
+        Returns every edge of the graph as an (ingredient, ingredient, weight) tuple.
+        """
+        return [(a, b, attrs['weight']) for a, b, attrs in self.G.edges(data=True)]
+
     """
-    Returns all neighbours of a given ingredient. Optionally filters the neighbors list
-    to include only ingredients of a given type.
+    Returns all neighbours of a given ingredient, ordered from strongest to weakest.
+    Optionally filters the neighbors list to include only ingredients of a given type.
     """
     def get_neighbors_of(self, node, ingredient_type: IngredientType = None):
-        for n, neighbors in self.G.adjacency():
-            if node == n:
-                if ingredient_type is None:
-                    return neighbors.items()
-                else:
-                    return [node for node in neighbors.items()
-                            if node[0].get_type() == ingredient_type]
+        if node not in self.G:
+            return None
+        by_type = self._neighbors_by_type(node)
+        if ingredient_type is None:
+            return list(self._sorted_neighbors[node])
+        return list(by_type[ingredient_type])
 
     """
     Returns the closest neighbours of a given ingredient, the number of ingredients is specified
     by the count. Optionally filters the neighbors list to include only ingredients of a given type.
     """
     def closest_neighbors(self, node, count: int, ingredient_type: IngredientType = None):
-        neighbors = self.get_neighbors_of(node, ingredient_type)
-        sorted_neighbors = sorted(neighbors, key=lambda node: node[1]['weight'], reverse=True)
-        return sorted_neighbors[:count]
+        by_type = self._neighbors_by_type(node)
+        if ingredient_type is None:
+            return self._sorted_neighbors[node][:count]
+        return by_type[ingredient_type][:count]
+
+    def get_weights_from(self, node) -> Dict[Ingredient, int]:
+        """
+        Returns the weights between a given node and each of its neighbours, keyed by
+        the neighbouring node. In a sparse graph, nodes without an edge to the given node
+        are left out and should be treated as having a weight of 0.
+        """
+        return {n: attrs['weight'] for n, attrs in self.G[node].items()}
 
     def get_weight_between(self, node_a: str, node_b: str):
         """
-        Returns the weight between two given nodes from their names.
+        Returns the weight between two given nodes from their names. Returns 0 if both
+        nodes exist but the edge between them was dropped when building a sparse graph.
+        """
+        if metrics.enabled:
+            metrics.count("get_weight_between")
+        node_a_in_graph = self._nodes_by_name.get(node_a)
+        node_b_in_graph = self._nodes_by_name.get(node_b)
+        if node_a_in_graph is None or node_b_in_graph is None:
+            raise KeyError(f"no ingredient named {node_a if node_a_in_graph is None else node_b}")
+
+        edge = self.G[node_a_in_graph].get(node_b_in_graph)
+        return edge['weight'] if edge is not None else 0
+
+    def _matrices(self, order: str = None):
+        """
+        Returns the nodes in the given order, see models.graph.export.node_order, with the
+        n x n weight and edge matrices over them, filled in one vectorised assignment from
+        the Networkx edges.
+        """
+        import numpy as np
+        from models.graph.export import node_order
+
+        nodes = list(self.G.nodes)
+        nodes = [nodes[i] for i in node_order(nodes, order).tolist()]
+        index = {n: i for i, n in enumerate(nodes)}
+        edges = list(self.G.edges(data='weight'))
+        integral = all(isinstance(w, (int, np.integer)) for _, _, w in edges)
+        weights = np.zeros((len(nodes), len(nodes)), dtype=np.int64 if integral else np.float64)
+        mask = np.zeros((len(nodes), len(nodes)), dtype=bool)
+        if edges:
+            rows = np.fromiter((index[a] for a, _, _ in edges), dtype=np.int64, count=len(edges))
+            cols = np.fromiter((index[b] for _, b, _ in edges), dtype=np.int64, count=len(edges))
+            values = np.array([w for _, _, w in edges], dtype=weights.dtype)
+            weights[rows, cols] = weights[cols, rows] = values
+            mask[rows, cols] = mask[cols, rows] = True
+        return nodes, weights, mask
+
+    def ordered_nodes(self, order: str = None) -> List[Ingredient]:
+        """
+        Returns the nodes of the graph in the order used by to_numpy for the same order:
+        "type", "name", or None for the graph's own node order.
+        """
+        from models.graph.export import node_order
+        nodes = self.get_nodes()
+        return [nodes[i] for i in node_order(nodes, order).tolist()]
+
+    def to_numpy(self, order: str = None):
         """
-        node_a_in_graph = self.get_node_by_name(node_a)
-        node_b_in_graph = self.get_node_by_name(node_b)
+        Returns the symmetric n x n weight matrix of the graph, with 0 for missing edges.
+        Row and column i belong to the i-th node of ordered_nodes(order).
+        """
+        return self._matrices(order)[1]
+
+    def to_dataframe(self, order: str = None, label: str = "name"):
+        """
+        Returns the weight matrix of to_numpy as a pandas DataFrame whose rows and columns
+        are labelled by ingredient name, FlavorDB entity id or the ingredients themselves.
+        """
+        from models.graph.export import adjacency_dataframe
+        nodes, weights, _ = self._matrices(order)
+        return adjacency_dataframe(nodes, weights, label)
+
+    def to_edge_list(self, order: str = None):
+        """
+        Returns every edge of the graph as a row of a pandas DataFrame with the columns
+        ingredient_a, id_a, ingredient_b, id_b and weight, ordered by the given node order.
+        """
+        from models.graph.export import edge_dataframe
+        return edge_dataframe(*self._matrices(order))
+
+
+# Names of the available graph backends, accepted by create_graph.
+BACKENDS = ("networkx", "array")
+
+def create_graph(mappings: List[Mapping], backend: str = "networkx", **options):
+    """
+    Builds an ingredient graph from the given mappings using the chosen backend: "networkx"
+    for Graph, or "array" for the numpy-backed ArrayGraph. Both offer the same interface.
+    Any options, such as top_k, per_type or min_weight, are passed to the backend.
+    """
+    if backend == "networkx":
+        return Graph(mappings, **options)
+    if backend == "array":
+        from models.graph.array import ArrayGraph
+        return ArrayGraph(mappings, **options)
+    raise ValueError(f"unknown graph backend {backend}")
+
 
-        return self.G.get_edge_data(node_a_in_graph, node_b_in_graph)['weight']
+def __getattr__(name: str):
+    # Resolves ArrayGraph on first access rather than at import time.
+    if name == "ArrayGraph":
+        from models.graph.array import ArrayGraph
+        return ArrayGraph
+    raise AttributeError(f"module {__name__} has no attribute {name}")
@@ -0,0 +1,343 @@
+"""
+An array-backed ingredient graph, offering the same interface as the Networkx-backed Graph.
+Ingredients are stored in an indexed list and edge weights in a dense numpy matrix, so
+neighbour queries and weight lookups are array operations instead of walks over nested
+dictionaries.
+"""
+from typing import Dict, List, Tuple
+import numpy as np
+from models.ingredient import Ingredient, IngredientType
+from models.graph.edges import Mapping, select_edges
+from models.graph.export import adjacency_dataframe, edge_dataframe, node_order
+from instrumentation.metrics import metrics
+
+Neighbor = Tuple[Ingredient, Dict]
+
+class ArrayGraph:
+    """
+    Instantiates an ArrayGraph from a given list of ingredient mappings. The top_k, per_type
+    and min_weight options build a sparse graph in the same way as Graph. Row and column i of
+    the weight matrix belong to the i-th node, in order of first appearance in the mappings.
+    """
+    def __init__(self, mappings: List[Mapping], top_k: int = None, per_type: bool = False,
+                 min_weight: float = None):
+        with metrics.span("graph_init"):
+            nodes: List[Ingredient] = []
+            index: Dict[Ingredient, int] = {}
+            for a, b, _ in mappings:
+                for node in (a, b):
+                    if node not in index:
+                        index[node] = len(nodes)
+                        nodes.append(node)
+
+            edges = select_edges(mappings, top_k, per_type, min_weight)
+            integral = all(isinstance(w, (int, np.integer)) for _, _, w in edges)
+            self._size = len(nodes)
+            self._weights = np.zeros((self._size, self._size),
+                                     dtype=np.int64 if integral else np.float64)
+            self._edges = np.zeros((self._size, self._size), dtype=bool)
+            if edges:
+                rows = np.fromiter((index[a] for a, _, _ in edges), dtype=np.int64,
+                                   count=len(edges))
+                cols = np.fromiter((index[b] for _, b, _ in edges), dtype=np.int64,
+                                   count=len(edges))
+                values = np.array([w for _, _, w in edges], dtype=self._weights.dtype)
+                self._weights[rows, cols] = values
+                self._weights[cols, rows] = values
+                self._edges[rows, cols] = True
+                self._edges[cols, rows] = True
+
+            self._init_indexes(nodes)
+
+        print(f"ArrayGraph with {len(nodes)} nodes and {self.number_of_edges()} edges")
+
+    @classmethod
+    def from_matrix(cls, nodes: List[Ingredient], weights: np.ndarray, edges: np.ndarray = None,
+                    min_weight: float = None) -> "ArrayGraph":
+        """
+        Builds an ArrayGraph directly from an n x n weight matrix whose row and column i
+        belong to the i-th node, such as one mapped from a similarity artifact. The
+        matrices are used as given, without copying, unless min_weight drops edges. By
+        default every pair of distinct nodes has an edge.
+        """
+        graph = cls.__new__(cls)
+        graph._size = len(nodes)
+        if edges is None:
+            edges = ~np.eye(len(nodes), dtype=bool)
+        if min_weight is not None:
+            edges = edges & (weights >= min_weight)
+            weights = np.where(edges, weights, 0)
+        graph._weights = weights
+        graph._edges = edges
+        graph._init_indexes(list(nodes))
+        print(f"ArrayGraph with {len(nodes)} nodes and {graph.number_of_edges()} edges")
+        return graph
+
+    @property
+    def weights(self) -> np.ndarray:
+        """
+        The n x n weight matrix of the graph, with 0 for missing edges.
+        """
+        return self._weights[:self._size, :self._size]
+
+    @property
+    def edges(self) -> np.ndarray:
+        """
+        The n x n boolean matrix marking which pairs of nodes share an edge.
+        """
+        return self._edges[:self._size, :self._size]
+
+    def _init_indexes(self, nodes: List[Ingredient]):
+        """
+        Builds the node indexes. The column order of each row, from strongest to weakest
+        edge, is computed the first time the row is queried.
+        """
+        self.nodes = nodes
+        self._index: Dict[Ingredient, int] = {n: i for i, n in enumerate(nodes)}
+        self._nodes_by_name: Dict[str, Ingredient] = {}
+        self._nodes_by_id: Dict[int, Ingredient] = {}
+        for n in nodes:
+            self._nodes_by_name.setdefault(n.get_name(), n)
+            self._nodes_by_id.setdefault(n.get_id(), n)
+        self._reset_orders()
+
+    def _reset_orders(self):
+        self._reset_type_columns()
+        self._orders: Dict[int, Dict[IngredientType, np.ndarray]] = {}
+
+    def _reset_type_columns(self):
+        types = np.array([n.get_type().value for n in self.nodes])
+        self._type_columns = {t: np.flatnonzero(types == t.value) for t in IngredientType}
+
+    def _invalidate_rows(self, rows):
+        # Only rows with an edge to a changed node hold a cached order mentioning it.
+        for row in rows:
+            self._orders.pop(row, None)
+
+    def _row_order(self, row: int, ingredient_type: IngredientType = None) -> np.ndarray:
+        """
+        Returns the columns of a row's edges, optionally restricted to one ingredient type,
+        ordered from strongest to weakest edge.
+        """
+        orders = self._orders.setdefault(row, {})
+        order = orders.get(ingredient_type)
+        if order is None:
+            cols = np.flatnonzero(self.edges[row])
+            if ingredient_type is not None:
+                cols = np.intersect1d(cols, self._type_columns[ingredient_type])
+            order = cols[np.argsort(-self.weights[row, cols], kind="stable")]
+            orders[ingredient_type] = order
+        return order
+
+    def _reserve(self, size: int):
+        """
+        Grows the weight and edge buffers to hold at least size nodes, doubling their
+        capacity so that a run of additions is amortised.
+        """
+        capacity = len(self._weights)
+        if size <= capacity:
+            # Matrices mapped read-only from an artifact are copied before the first write.
+            if not (self._weights.flags.writeable and self._edges.flags.writeable):
+                self._weights = np.array(self._weights)
+                self._edges = np.array(self._edges)
+            return
+        capacity = max(size, 2 * capacity)
+        for attr in ("_weights", "_edges"):
+            old = getattr(self, attr)
+            new = np.zeros((capacity, capacity), dtype=old.dtype)
+            new[:self._size, :self._size] = old[:self._size, :self._size]
+            setattr(self, attr, new)
+
+    def add_ingredient(self, ingredient: Ingredient, weights: Dict[Ingredient, int],
+                       min_weight: float = None):
+        """
+        Adds an ingredient to the graph, with an edge to every existing node in weights
+        that meets min_weight, and patches the indexes in place. Cached neighbour orders
+        of the new node's neighbours are dropped and recomputed when next queried.
+        """
+        assert ingredient not in self._index, f"{ingredient} is already in the graph"
+        if self._weights.dtype != np.float64 and \
+                not all(isinstance(w, (int, np.integer)) for w in weights.values()):
+            self._weights = self._weights.astype(np.float64)
+
+        row = self._size
+        self._reserve(row + 1)
+        self._size += 1
+        self._weights[row, :self._size] = 0
+        self._weights[:self._size, row] = 0
+        self._edges[row, :self._size] = False
+        self._edges[:self._size, row] = False
+
+        for other, weight in weights.items():
+            col = self._index.get(other)
+            if col is None or (min_weight is not None and weight < min_weight):
+                continue
+            self._weights[row, col] = self._weights[col, row] = weight
+            self._edges[row, col] = self._edges[col, row] = True
+
+        self.nodes.append(ingredient)
+        self._index[ingredient] = row
+        self._nodes_by_name.setdefault(ingredient.get_name(), ingredient)
+        self._nodes_by_id.setdefault(ingredient.get_id(), ingredient)
+        self._type_columns[ingredient.get_type()] = \
+            np.append(self._type_columns[ingredient.get_type()], row)
+        self._invalidate_rows(np.flatnonzero(self._edges[row, :self._size]).tolist() + [row])
+
+    def remove_ingredient(self, ingredient: Ingredient):
+        """
+        Removes an ingredient and its edges from the graph, and patches the indexes in
+        place. The last node takes over the removed node's row and column. Only the cached
+        neighbour orders of rows with an edge to either node are dropped.
+        """
+        row = self._index.pop(ingredient)
+        self._reserve(self._size)
+        last = self._size - 1
+        # Rows with an edge to the removed node, or to the node taking over its
+        # row, hold cached orders which mention either column.
+        touched = np.flatnonzero(self._edges[row, :self._size] | self._edges[last, :self._size])
+        self._invalidate_rows(touched.tolist() + [row, last])
+        if row != last:
+            self._weights[[row, last], :self._size] = self._weights[[last, row], :self._size]
+            self._weights[:self._size, [row, last]] = self._weights[:self._size, [last, row]]
+            self._edges[[row, last], :self._size] = self._edges[[last, row], :self._size]
+            self._edges[:self._size, [row, last]] = self._edges[:self._size, [last, row]]
+            moved = self.nodes[last]
+            self.nodes[row] = moved
+            self._index[moved] = row
+        self.nodes.pop()
+        self._size -= 1
+
+        if self._nodes_by_name.get(ingredient.get_name()) is ingredient:
+            del self._nodes_by_name[ingredient.get_name()]
+            for n in self.nodes:
+                if n.get_name() == ingredient.get_name():
+                    self._nodes_by_name[n.get_name()] = n
+                    break
+        if self._nodes_by_id.get(ingredient.get_id()) is ingredient:
+            del self._nodes_by_id[ingredient.get_id()]
+        self._reset_type_columns()
+
+    def get_index(self, node: Ingredient) -> int:
+        """
+        Returns the row of the weight matrix belonging to the given node.
+        """
+        return self._index[node]
+
+    def get_node_by_name(self, name: str):
+        if metrics.enabled:
+            metrics.count("get_node_by_name")
+        return self._nodes_by_name.get(name)
+
+    def get_node_by_id(self, id: int):
+        return self._nodes_by_id.get(id)
+
+    def get_nodes(self):
+        return list(self.nodes)
+
+    def number_of_edges(self) -> int:
+        return int(self.edges.sum()) // 2
+
+    def get_edges(self) -> List[Mapping]:
+        """
+        Returns every edge of the graph as an (ingredient, ingredient, weight) tuple.
+        """
+        rows, cols = np.nonzero(np.triu(self.edges, k=1))
+        return [(self.nodes[a], self.nodes[b], w) for a, b, w in
+                zip(rows.tolist(), cols.tolist(), self.weights[rows, cols].tolist())]
+
+    def _neighbors(self, row: int, order: np.ndarray) -> List[Neighbor]:
+        weights = self.weights[row]
+        return [(self.nodes[j], {'weight': w}) for j, w in
+                zip(order.tolist(), weights[order].tolist())]
+
+    def get_neighbors_of(self, node, ingredient_type: IngredientType = None):
+        """
+        Returns all neighbours of a given ingredient as (ingredient, {'weight': weight}) pairs,
+        ordered from strongest to weakest. Optionally filters the neighbors list to include
+        only ingredients of a given type.
+        """
+        row = self._index.get(node)
+        if row is None:
+            return None
+        return self._neighbors(row, self._row_order(row, ingredient_type))
+
+    def closest_neighbors(self, node, count: int, ingredient_type: IngredientType = None):
+        """
+        Returns the closest neighbours of a given ingredient, the number of ingredients is
+        specified by the count. Optionally filters the neighbors list to include only
+        ingredients of a given type.
+        """
+        row = self._index[node]
+        return self._neighbors(row, self._row_order(row, ingredient_type)[:count])
+
+    def get_weights_from(self, node) -> Dict[Ingredient, int]:
+        """
+        Returns the weights between a given node and each of its neighbours, keyed by the
+        neighbouring node. Nodes without an edge to the given node are left out.
+        """
+        row = self._index[node]
+        cols = np.flatnonzero(self.edges[row])
+        return dict(zip([self.nodes[j] for j in cols.tolist()],
+                        self.weights[row, cols].tolist()))
+
+    def get_weight_row(self, node) -> np.ndarray:
+        """
+        Returns the weights between a given node and every node of the graph, in index order,
+        with 0 for missing edges.
+        """
+        return self.weights[self._index[node]]
+
+    def get_weight_between(self, node_a: str, node_b: str):
+        """
+        Returns the weight between two given nodes from their names, or 0 if there is no edge
+        between them.
+        """
+        if metrics.enabled:
+            metrics.count("get_weight_between")
+        node_a_in_graph = self._nodes_by_name.get(node_a)
+        node_b_in_graph = self._nodes_by_name.get(node_b)
+        if node_a_in_graph is None or node_b_in_graph is None:
+            raise KeyError(f"no ingredient named {node_a if node_a_in_graph is None else node_b}")
+
+        return self.weights[self._index[node_a_in_graph], self._index[node_b_in_graph]].item()
+
+    def _matrices(self, order: str = None):
+        """
+        Returns the nodes in the given order, see models.graph.export.node_order, with the
+        weight and edge matrices permuted to match. The matrices are the graph's own when no
+        order is given.
+        """
+        perm = node_order(self.nodes, order)
+        if order is None:
+            return list(self.nodes), self.weights, self.edges
+        grid = np.ix_(perm, perm)
+        return [self.nodes[i] for i in perm.tolist()], self.weights[grid], self.edges[grid]
+
+    def ordered_nodes(self, order: str = None) -> List[Ingredient]:
+        """
+        Returns the nodes of the graph in the order used by to_numpy for the same order:
+        "type", "name", or None for the graph's own node order.
+        """
+        return [self.nodes[i] for i in node_order(self.nodes, order).tolist()]
+
+    def to_numpy(self, order: str = None) -> np.ndarray:
+        """
+        Returns a copy of the symmetric n x n weight matrix of the graph, with 0 for missing
+        edges. Row and column i belong to the i-th node of ordered_nodes(order).
+        """
+        return np.array(self._matrices(order)[1])
+
+    def to_dataframe(self, order: str = None, label: str = "name"):
+        """
+        Returns the weight matrix of to_numpy as a pandas DataFrame whose rows and columns
+        are labelled by ingredient name, FlavorDB entity id or the ingredients themselves.
+        """
+        nodes, weights, _ = self._matrices(order)
+        return adjacency_dataframe(nodes, np.array(weights), label)
+
+    def to_edge_list(self, order: str = None):
+        """
+        Returns every edge of the graph as a row of a pandas DataFrame with the columns
+        ingredient_a, id_a, ingredient_b, id_b and weight, ordered by the given node order.
+        """
+        return edge_dataframe(*self._matrices(order))
@@ -0,0 +1,36 @@
+"""
+Selects which ingredient mappings become edges of a graph, shared by every graph backend.
+"""
+from typing import Dict, List, Tuple
+import heapq
+from models.ingredient import Ingredient
+
+Mapping = Tuple[Ingredient, Ingredient, int]
+
+def select_edges(mappings: List[Mapping], top_k: int = None, per_type: bool = False,
+                 min_weight: float = None) -> List[Mapping]:
+    """
+    Returns the mappings kept when building a sparse graph. Mappings below min_weight are
+    dropped. If top_k is given, a mapping is kept only if it is among the top_k strongest
+    mappings of at least one of its two ingredients, counted separately for each type of
+    neighbouring ingredient if per_type is set. Ties are broken in favour of mappings which
+    come first. The kept mappings retain their original order.
+    """
+    if min_weight is not None:
+        mappings = [m for m in mappings if m[2] >= min_weight]
+    if top_k is None:
+        return mappings
+
+    strongest: Dict[Tuple, List[Tuple]] = {}
+    for idx, (a, b, weight) in enumerate(mappings):
+        for node, other in ((a, b), (b, a)):
+            key = (node, other.get_type() if per_type else None)
+            heap = strongest.setdefault(key, [])
+            entry = (weight, -idx)
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    kept = sorted({-neg_idx for heap in strongest.values() for _, neg_idx in heap})
+    return [mappings[idx] for idx in kept]
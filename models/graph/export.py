@@ -0,0 +1,68 @@
+"""
+Exports an ingredient graph as a labelled adjacency matrix or an edge list, shared by every
+graph backend. Each backend supplies its nodes and its n x n weight and edge matrices; the
+functions here only reorder and label them. pandas is imported when a DataFrame is first
+built.
+"""
+from typing import List
+import numpy as np
+from models.ingredient import Ingredient, IngredientType
+
+# Node orderings accepted by the export methods. None keeps the graph's own node order.
+ORDERS = ("type", "name")
+# Labels accepted for the rows and columns of an exported DataFrame.
+LABELS = ("name", "id", "ingredient")
+
+_TYPE_RANKS = {t: rank for rank, t in enumerate(IngredientType)}
+
+def node_order(nodes: List[Ingredient], order: str = None) -> np.ndarray:
+    """
+    Returns the positions of the given nodes in the requested order: "type" groups them by
+    ingredient type, in the order the types are declared, and by name within each type;
+    "name" sorts them by name. Nodes which compare equal are ordered by FlavorDB entity id.
+    """
+    if order is None:
+        return np.arange(len(nodes))
+    if order == "type":
+        key = lambda i: (_TYPE_RANKS[nodes[i].get_type()], nodes[i].get_name(), nodes[i].get_id())
+    elif order == "name":
+        key = lambda i: (nodes[i].get_name(), nodes[i].get_id())
+    else:
+        raise ValueError(f"unknown node order {order}")
+    return np.array(sorted(range(len(nodes)), key=key), dtype=np.int64)
+
+def labels(nodes: List[Ingredient], label: str = "name") -> list:
+    """
+    Returns the row and column labels of the given nodes: their names, their FlavorDB
+    entity ids or the ingredients themselves.
+    """
+    if label == "name":
+        return [n.get_name() for n in nodes]
+    if label == "id":
+        return [n.get_id() for n in nodes]
+    if label == "ingredient":
+        return list(nodes)
+    raise ValueError(f"unknown label {label}")
+
+def adjacency_dataframe(nodes: List[Ingredient], weights: np.ndarray, label: str = "name"):
+    """
+    Wraps a weight matrix in a DataFrame whose rows and columns are labelled by the given
+    nodes. The matrix is used as given, without copying.
+    """
+    import pandas as pd
+    names = labels(nodes, label)
+    return pd.DataFrame(weights, index=names, columns=names, copy=False)
+
+def edge_dataframe(nodes: List[Ingredient], weights: np.ndarray, edges: np.ndarray):
+    """
+    Returns the edges of a graph as a DataFrame with one row per edge and the columns
+    ingredient_a, id_a, ingredient_b, id_b and weight. Rows follow the upper triangle of the
+    matrices in row-major order, so they keep the order of the given nodes.
+    """
+    import pandas as pd
+    rows, cols = np.nonzero(np.triu(edges, k=1))
+    names = np.array([n.get_name() for n in nodes], dtype=object)
+    ids = np.array([n.get_id() for n in nodes], dtype=np.int64)
+    return pd.DataFrame({"ingredient_a": names[rows], "id_a": ids[rows],
+                         "ingredient_b": names[cols], "id_b": ids[cols],
+                         "weight": weights[rows, cols]})
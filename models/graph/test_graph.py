@@ -2,33 +2,35 @@ from typing import List, Tuple
 import pytest
 import sys
 sys.path.append("../../")
-from preprocessing.main import create_mappings
 from models.ingredient import Ingredient, IngredientType
-from models.graph import Graph
+from models.graph import Graph, BACKENDS, create_graph
 
+@pytest.mark.parametrize("backend", BACKENDS)
 class TestGraph:
-    sample_mappings: List[Tuple[Ingredient, Ingredient, int]] = create_mappings("./data")
-
-    def test_initialises_graph(self):
-        G = Graph(self.sample_mappings)
+    def test_initialises_graph(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend)
         assert G is not None
 
-    def test_can_get_node_by_name(self):
-        G = Graph(self.sample_mappings)
+    def test_can_get_node_by_name(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend)
         spinach = G.get_node_by_name("spinach")
         assert spinach is not None
         assert spinach.get_name() == "spinach"
 
-    def test_can_get_neighbors_of_node(self):
-        G = Graph(self.sample_mappings)
+    def test_can_get_neighbors_of_node(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend)
         spinach = G.get_node_by_name("spinach")
         spinach_nbrs = G.get_neighbors_of(spinach)
         assert spinach_nbrs is not None
         spinach_nbrs_filtered = G.get_neighbors_of(spinach, IngredientType.BASE)
         assert spinach_nbrs_filtered is not None
+        for nbrs in (spinach_nbrs, spinach_nbrs_filtered):
+            weights = [attrs["weight"] for _, attrs in nbrs]
+            assert weights == sorted(weights, reverse=True)
+        assert len(spinach_nbrs) == len(G.get_weights_from(spinach))
 
-    def test_can_get_closest_neighbors_of_node(self):
-        G = Graph(self.sample_mappings)
+    def test_can_get_closest_neighbors_of_node(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend)
         spinach = G.get_node_by_name("spinach")
         spinach_nbrs = G.get_neighbors_of(spinach)
         # Sort neighbors of spinach from weakest to strongest so
@@ -38,7 +40,152 @@ class TestGraph:
         spinach_nbrs_closest = G.closest_neighbors(spinach, 1)
         assert spinach_nbrs_weakest[0] != spinach_nbrs_closest[0]
 
-    def test_can_get_weight_between_nodes(self):
-        G = Graph(self.sample_mappings)
+    def test_can_get_weight_between_nodes(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend)
         weight = G.get_weight_between("spinach", "tomato")
         assert weight == 114
+
+    def test_can_get_node_by_id(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend)
+        spinach = G.get_node_by_name("spinach")
+        assert G.get_node_by_id(spinach.get_id()) is spinach
+        assert G.get_node_by_name("not an ingredient") is None
+
+    def test_closest_neighbors_match_full_sort(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend)
+        spinach = G.get_node_by_name("spinach")
+        for ingredient_type in [None] + list(IngredientType):
+            nbrs = G.get_neighbors_of(spinach, ingredient_type)
+            expected = sorted(nbrs, key=lambda node: node[1]["weight"], reverse=True)
+            assert G.closest_neighbors(spinach, 3, ingredient_type) == expected[:3]
+            assert all(n[0].get_type() == ingredient_type
+                       for n in G.closest_neighbors(spinach, 3, ingredient_type)
+                       if ingredient_type is not None)
+
+    def test_weight_between_is_symmetric(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend)
+        assert G.get_weight_between("tomato", "spinach") == \
+            G.get_weight_between("spinach", "tomato")
+
+    def test_can_get_weights_from_node(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend)
+        spinach = G.get_node_by_name("spinach")
+        tomato = G.get_node_by_name("tomato")
+        weights = G.get_weights_from(spinach)
+        assert weights[tomato] == 114
+        assert len(weights) == len(G.get_nodes()) - 1
+
+    def test_sparse_top_k_graph(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend, top_k=3)
+        nodes = G.get_nodes()
+        assert len(nodes) == len(create_graph(sample_mappings, backend).get_nodes())
+        assert G.number_of_edges() <= 3 * len(nodes)
+
+        full = create_graph(sample_mappings, backend)
+        spinach = G.get_node_by_name("spinach")
+        # Each node keeps at least its own strongest edges.
+        assert [n for n, _ in G.closest_neighbors(spinach, 3)][:1] == \
+            [n for n, _ in full.closest_neighbors(spinach, 1)]
+
+    def test_sparse_per_type_graph(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend, top_k=1, per_type=True)
+        spinach = G.get_node_by_name("spinach")
+        for ingredient_type in IngredientType:
+            assert len(G.closest_neighbors(spinach, 5, ingredient_type)) >= 1
+
+    def test_min_weight_graph_and_missing_edges(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend, min_weight=100)
+        assert all(w >= 100 for _, _, w in G.get_edges())
+
+        missing = [(a, b) for a, b, w in sample_mappings if w < 100][0]
+        assert G.get_weight_between(missing[0].get_name(), missing[1].get_name()) == 0
+        assert missing[1] not in G.get_weights_from(missing[0])
+        with pytest.raises(KeyError):
+            G.get_weight_between("spinach", "not an ingredient")
+
+    def test_backends_agree(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend, top_k=4, per_type=True)
+        reference = Graph(sample_mappings, top_k=4, per_type=True)
+        assert G.number_of_edges() == reference.number_of_edges()
+        def edge_set(graph):
+            return sorted((min(a.get_id(), b.get_id()), max(a.get_id(), b.get_id()), w)
+                          for a, b, w in graph.get_edges())
+        assert edge_set(G) == edge_set(reference)
+        for node in reference.get_nodes():
+            assert G.get_weights_from(node) == reference.get_weights_from(node)
+            assert [attrs["weight"] for _, attrs in G.closest_neighbors(node, 5)] == \
+                [attrs["weight"] for _, attrs in reference.closest_neighbors(node, 5)]
+
+    def test_add_and_remove_ingredient(self, backend, sample_mappings):
+        without_spinach = [m for m in sample_mappings
+                           if "spinach" not in (m[0].get_name(), m[1].get_name())]
+        full = create_graph(sample_mappings, backend)
+        G = create_graph(without_spinach, backend)
+        spinach = full.get_node_by_name("spinach")
+        assert G.get_node_by_name("spinach") is None
+
+        G.add_ingredient(spinach, full.get_weights_from(spinach))
+        assert G.number_of_edges() == full.number_of_edges()
+        assert G.get_weight_between("spinach", "tomato") == 114
+        tomato = G.get_node_by_name("tomato")
+        assert G.closest_neighbors(tomato, 5) == full.closest_neighbors(tomato, 5)
+
+        G.remove_ingredient(spinach)
+        assert G.get_node_by_name("spinach") is None
+        assert spinach not in G.get_weights_from(tomato)
+        assert G.number_of_edges() == create_graph(without_spinach, backend).number_of_edges()
+
+    def test_matrix_export(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend, top_k=4)
+        for order in (None, "type", "name"):
+            nodes = G.ordered_nodes(order)
+            weights = G.to_numpy(order)
+            assert weights.shape == (len(nodes), len(nodes))
+            assert (weights == weights.T).all()
+            for i, a in enumerate(nodes):
+                assert weights[i].tolist() == \
+                    [G.get_weights_from(a).get(b, 0) for b in nodes]
+
+        types = [n.get_type() for n in G.ordered_nodes("type")]
+        assert types == sorted(types, key=list(IngredientType).index)
+        names = [n.get_name() for n in G.ordered_nodes("name")]
+        assert names == sorted(names)
+
+        frame = G.to_dataframe("name")
+        assert list(frame.index) == names and list(frame.columns) == names
+        assert frame.loc["spinach", "tomato"] == G.get_weight_between("spinach", "tomato")
+        assert list(G.to_dataframe(label="id").index) == [n.get_id() for n in G.get_nodes()]
+        with pytest.raises(ValueError):
+            G.to_numpy("weight")
+
+    def test_edge_list_export(self, backend, sample_mappings):
+        G = create_graph(sample_mappings, backend, min_weight=100)
+        edges = G.to_edge_list("name")
+        assert list(edges.columns) == ["ingredient_a", "id_a", "ingredient_b", "id_b", "weight"]
+        assert len(edges) == G.number_of_edges()
+        assert set(map(frozenset, zip(edges.id_a, edges.id_b))) == \
+            set(frozenset((a.get_id(), b.get_id())) for a, b, _ in G.get_edges())
+        assert (edges.ingredient_a <= edges.ingredient_b).all()
+        for row in edges.itertuples():
+            assert G.get_weight_between(row.ingredient_a, row.ingredient_b) == row.weight
+
+def test_array_graph_updates_keep_untouched_orders(sample_mappings):
+    spinach_free = [m for m in sample_mappings
+                    if "spinach" not in (m[0].get_name(), m[1].get_name())]
+    full = create_graph(sample_mappings, "array")
+    spinach = full.get_node_by_name("spinach")
+    G = create_graph(spinach_free, "array", min_weight=100)
+    for node in G.get_nodes():
+        G.closest_neighbors(node, 3)
+    cached = set(G._orders)
+
+    G.add_ingredient(spinach, full.get_weights_from(spinach), min_weight=100)
+    neighbors = {G.get_index(n) for n in G.get_weights_from(spinach)}
+    assert set(G._orders) == cached - neighbors
+    assert len(set(G._orders)) > 0
+
+    G.remove_ingredient(spinach)
+    reference = create_graph(spinach_free, "array", min_weight=100)
+    for node in reference.get_nodes():
+        assert [a["weight"] for _, a in G.closest_neighbors(node, 5, IngredientType.TOPPING)] == \
+            [a["weight"] for _, a in reference.closest_neighbors(node, 5, IngredientType.TOPPING)]
@@ -0,0 +1,107 @@
+"""Inverted indexes over a corpus of ingredients, from Pubchem ID and from
+flavor profile term to the ingredients containing them, so that these
+questions can be answered without scanning every ingredient's molecules.
+
+Every posting list is a sorted list of integers: ingredient positions for the
+inverted indexes, and Pubchem IDs for the forward index of each ingredient's
+molecules. Queries combine posting lists by merging them in order.
+"""
+from typing import Dict, Iterable, List
+from .ingredient import Ingredient
+from .molecule import Molecule
+
+
+def intersect_sorted(a: List[int], b: List[int]) -> List[int]:
+    """Returns the values found in both of the supplied sorted lists, in order.
+    """
+    result: List[int] = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i] < b[j]:
+            i += 1
+        elif a[i] > b[j]:
+            j += 1
+        else:
+            result.append(a[i])
+            i += 1
+            j += 1
+    return result
+
+
+class IngredientIndex:
+    """Posting lists for a list of ingredients, built once when the index is
+    created. Top flavors are those returned by Ingredient.get_top_flavors.
+    """
+    def __init__(self, ingredients: List[Ingredient]):
+        assert ingredients is not None, "ingredients must be supplied"
+
+        self.ingredients = list(ingredients)
+        self._positions: Dict[Ingredient, int] = {ing: i for i, ing in enumerate(self.ingredients)}
+        self._molecules: Dict[int, Molecule] = {}
+        self._molecule_ids: List[List[int]] = []
+        self._by_molecule: Dict[int, List[int]] = {}
+        self._by_flavor: Dict[str, List[int]] = {}
+        self._by_top_flavor: Dict[str, List[int]] = {}
+
+        # Ingredients are visited in position order, so every posting list is
+        # built already sorted.
+        for position, ing in enumerate(self.ingredients):
+            for molecule in ing.get_molecules():
+                self._molecules.setdefault(molecule.get_pubchem_id(), molecule)
+            ids = sorted(set(ing.get_molecule_ids()))
+            self._molecule_ids.append(ids)
+            for pubchem_id in ids:
+                self._by_molecule.setdefault(pubchem_id, []).append(position)
+            for term, _ in ing.flavor_profiles:
+                self._by_flavor.setdefault(term, []).append(position)
+            for term, _ in ing.get_top_flavors():
+                self._by_top_flavor.setdefault(term, []).append(position)
+
+    def _ingredients_at(self, positions: Iterable[int]) -> List[Ingredient]:
+        return [self.ingredients[p] for p in positions]
+
+    def ingredients_with_molecule(self, pubchem_id: int) -> List[Ingredient]:
+        """Returns the ingredients containing the molecule with the supplied
+        Pubchem ID.
+        """
+        return self._ingredients_at(self._by_molecule.get(pubchem_id, []))
+
+    def ingredients_with_molecules(self, pubchem_ids: Iterable[int]) -> List[Ingredient]:
+        """Returns the ingredients containing every one of the supplied
+        molecules. The shortest posting lists are intersected first.
+        """
+        postings = sorted((self._by_molecule.get(p, []) for p in pubchem_ids), key=len)
+        if not postings:
+            return []
+        positions = postings[0]
+        for posting in postings[1:]:
+            positions = intersect_sorted(positions, posting)
+        return self._ingredients_at(positions)
+
+    def ingredients_with_flavor(self, term: str, top: bool = False) -> List[Ingredient]:
+        """Returns the ingredients containing at least one molecule with the
+        supplied flavor profile, or, if top is set, only those for which it is
+        one of the top flavors.
+        """
+        index = self._by_top_flavor if top else self._by_flavor
+        return self._ingredients_at(index.get(term, []))
+
+    def molecule(self, pubchem_id: int) -> Molecule:
+        """Returns the molecule with the supplied Pubchem ID, or None if no
+        ingredient contains it.
+        """
+        return self._molecules.get(pubchem_id)
+
+    def shared_molecule_ids(self, ing_a: Ingredient, ing_b: Ingredient) -> List[int]:
+        """Returns the sorted Pubchem IDs of the molecules shared by the
+        supplied ingredients.
+        """
+        return intersect_sorted(self._molecule_ids[self._positions[ing_a]],
+                                self._molecule_ids[self._positions[ing_b]])
+
+    def explain(self, ing_a: Ingredient, ing_b: Ingredient) -> List[Molecule]:
+        """Returns the molecules shared by the supplied ingredients, which
+        make up the shared molecule count of the edge between them, ordered
+        by Pubchem ID.
+        """
+        return [self._molecules[p] for p in self.shared_molecule_ids(ing_a, ing_b)]
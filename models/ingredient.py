@@ -1,10 +1,11 @@
 """Defines the Ingredient class to store processed information on an ingredient.
 """
+from array import array
 from enum import Enum
 import json
 from typing import List, Tuple, Dict
 import math
-from .molecule import Molecule
+from .molecule import Molecule, registry
 
 FlavorProfiles = List[Tuple[str, int]]
 
@@ -17,7 +18,13 @@ class IngredientType(Enum):
 
 class Ingredient:
     """An ingredient extracted from the FlavorDB database.
+
+    The ingredient's molecules are stored in the shared molecule registry,
+    and the ingredient itself only holds a compact array of their registry
+    slots, which it releases when it is garbage collected.
     """
+    __slots__ = ("name", "category", "id", "_molecule_slots", "flavor_profiles", "type")
+
     def __init__(self, name: str, category: str, flavor_db_entity_id: int,
                  molecules: List[Molecule], type: str):
         assert name is not None, "name must be supplied"
@@ -30,13 +37,31 @@ class Ingredient:
         self.name = name.lower()
         self.category = category.lower()
         self.id = flavor_db_entity_id
-        self.molecules = molecules
+        self._molecule_slots = array("I", [registry.register(m) for m in molecules])
         self.flavor_profiles = self._extract_flavor_profiles_from_molecules()
         self.type = type
 
     def __repr__(self):
         return f"[{self.name}::{self.category}::{self.id}]"
 
+    def __del__(self):
+        # Releases this ingredient's references to its molecules. The
+        # registry may already be gone while the interpreter shuts down.
+        slots = getattr(self, "_molecule_slots", None)
+        if slots is not None and registry is not None:
+            for slot in slots:
+                registry.release(slot)
+            self._molecule_slots = array("I")
+
+    def __reduce__(self):
+        # Registry slots are only meaningful within one process, so the
+        # molecules themselves are pickled and registered again on load.
+        return (Ingredient, (self.name, self.category, self.id, self.molecules, self.type))
+
+    @property
+    def molecules(self) -> List[Molecule]:
+        return [registry.get(s) for s in self._molecule_slots]
+
     def _extract_flavor_profiles_from_molecules(self) -> FlavorProfiles:
         """ Returns a sorted list of flavor profiles and associated counts
         extracted from the molecules in this ingredient
@@ -60,10 +85,15 @@ class Ingredient:
         in this ingredient. If no pct is supplied, defaults to 25%. The ceiling
         is used when the cutoff index is computed.
         """
-        profiles: FlavorProfiles = self._extract_flavor_profiles_from_molecules()
-        cutoff_idx: int = math.ceil(len(profiles) * (pct/100))
+        cutoff_idx: int = math.ceil(len(self.flavor_profiles) * (pct/100))
         return self.flavor_profiles[:cutoff_idx]
 
+    def get_flavor_counts(self) -> Dict[str, int]:
+        """ Returns the number of this ingredient's molecules carrying each
+        flavor profile.
+        """
+        return dict(self.flavor_profiles)
+
     def get_top_flavor(self) -> str:
         """Returns the top flavor from the flavor_profiles array.
         """
@@ -77,7 +107,7 @@ class Ingredient:
     def get_molecule_ids(self) -> List[int]:
         """Returns this ingredient's molecules as a list of Pubchem IDs.
         """
-        return [x.get_pubchem_id() for x in self.molecules]
+        return [registry.get_pubchem_id(s) for s in self._molecule_slots]
 
     def get_category(self) -> str:
         return self.category
@@ -94,7 +124,10 @@ class Ingredient:
     def json(self):
         """Returns a stringified JSON representation of the ingredient.
         """
-        return json.dumps(self.__dict__)
+        return json.dumps({"name": self.name, "category": self.category, "id": self.id,
+                           "type": self.type.value,
+                           "molecule_ids": self.get_molecule_ids(),
+                           "flavor_profiles": self.flavor_profiles})
 
     def __eq__(self, other) -> bool:
         if isinstance(other, Ingredient):
@@ -1,11 +1,19 @@
-"""Defines a Molecule class.
+"""Defines a Molecule class, and a registry which stores each distinct
+molecule once no matter how many ingredients contain it.
 """
+import sys
+from array import array
+from typing import Any, Dict, List, Tuple
 
 class Molecule:
     """Data model for a molecule. Stores the Pubchem ID, common name,
-    and a tuple of flavor profiles.
+    and a tuple of flavor profiles. Any additional FlavorDB fields kept during
+    parsing are stored in the properties dictionary.
     """
-    def __init__(self, pubchem_id: int, name: str, flavor_profiles: tuple):
+    __slots__ = ("pubchem_id", "name", "flavor_profiles", "properties")
+
+    def __init__(self, pubchem_id: int, name: str, flavor_profiles: tuple,
+                 properties: Dict[str, Any] = None):
         assert pubchem_id is not None, "pubchem_id must be supplied"
         assert name is not None, "name must be supplied"
         assert flavor_profiles is not None, "flavor_profiles must be supplied"
@@ -13,10 +21,29 @@ class Molecule:
         self.pubchem_id = pubchem_id
         self.name = name.lower()
         self.flavor_profiles = flavor_profiles
+        # Most molecules keep no extra fields, so no dictionary is allocated
+        # for them.
+        self.properties = properties if properties else None
 
     def __repr__(self):
         return f"{self.pubchem_id} - {self.name}"
 
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Molecule):
+            return self._key() == other._key() and \
+                self.get_properties() == other.get_properties()
+        return False
+
+    def __hash__(self):
+        return hash(self.pubchem_id)
+
+    def _key(self) -> Tuple:
+        """Returns a hashable value identifying this molecule from its known
+        fields. Extra properties may hold unhashable values such as lists, so
+        they are compared separately rather than hashed.
+        """
+        return (self.pubchem_id, self.name, self.flavor_profiles)
+
     def get_flavor_profiles(self):
         """Returns the molecule's flavor profiles.
         """
@@ -27,3 +54,120 @@ class Molecule:
 
     def get_pubchem_id(self):
         return self.pubchem_id
+
+    def get_properties(self) -> Dict[str, Any]:
+        return self.properties if self.properties is not None else {}
+
+    def get_property(self, field: str, default: Any = None) -> Any:
+        """Returns the value of an additional FlavorDB field kept for this
+        molecule, or the default if the field was not kept.
+        """
+        if self.properties is None:
+            return default
+        return self.properties.get(field, default)
+
+
+class MoleculeRegistry:
+    """Stores each distinct molecule exactly once and refers to it by a small
+    integer slot. Ingredients hold arrays of slots rather than their own
+    Molecule objects, so a compound found in many ingredients is only kept
+    in memory once. Flavor profile strings and tuples are interned so that
+    equal profiles share the same objects.
+
+    Molecules are identified by their full contents, so two records with the
+    same Pubchem ID but different names, flavor profiles or properties are
+    kept apart.
+
+    Every slot counts the references taken by register. An ingredient takes
+    one per molecule when it is created and releases them when it is garbage
+    collected, so the molecules of ingredients which are no longer used are
+    dropped, and their slots reused, in long-running processes.
+    """
+    def __init__(self):
+        self._molecules: List[Molecule] = []
+        self._pubchem_ids = array("q")
+        self._references = array("q")
+        self._slots: Dict[Tuple, List[int]] = {}
+        self._free: List[int] = []
+        self._profiles: Dict[tuple, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._molecules) - len(self._free)
+
+    def _intern_profiles(self, flavor_profiles: tuple) -> tuple:
+        interned = self._profiles.get(flavor_profiles)
+        if interned is None:
+            interned = tuple(sys.intern(fp) for fp in flavor_profiles)
+            self._profiles[interned] = interned
+        return interned
+
+    def _find(self, key: Tuple, properties: Dict[str, Any]) -> int:
+        for slot in self._slots.get(key, ()):
+            if self._molecules[slot].get_properties() == properties:
+                return slot
+        return None
+
+    def register(self, molecule: Molecule) -> int:
+        """Returns the slot of the supplied molecule and takes a reference to
+        it, storing an interned copy first if no equal molecule has been
+        registered yet. The supplied molecule is left unchanged.
+        """
+        key = molecule._key()
+        slot = self._find(key, molecule.get_properties())
+        if slot is None:
+            stored = Molecule(molecule.pubchem_id, molecule.name,
+                              self._intern_profiles(molecule.flavor_profiles),
+                              molecule.properties)
+            if self._free:
+                slot = self._free.pop()
+                self._molecules[slot] = stored
+                self._pubchem_ids[slot] = stored.pubchem_id
+            else:
+                slot = len(self._molecules)
+                self._molecules.append(stored)
+                self._pubchem_ids.append(stored.pubchem_id)
+                self._references.append(0)
+            self._slots.setdefault(key, []).append(slot)
+        self._references[slot] += 1
+        return slot
+
+    def release(self, slot: int):
+        """Releases a reference taken by register. The molecule is dropped,
+        and its slot reused, once no references remain.
+        """
+        self._references[slot] -= 1
+        if self._references[slot] > 0:
+            return
+        molecule = self._molecules[slot]
+        key = molecule._key()
+        slots = self._slots[key]
+        slots.remove(slot)
+        if not slots:
+            del self._slots[key]
+        self._molecules[slot] = None
+        self._free.append(slot)
+
+    def references(self, slot: int) -> int:
+        return self._references[slot]
+
+    def molecule(self, pubchem_id: int, name: str, flavor_profiles: tuple,
+                 properties: Dict[str, Any] = None) -> Molecule:
+        """Returns the registered molecule with the supplied contents, or a new
+        molecule with interned flavor profiles if none is registered. No
+        reference is taken; the molecule is stored once an ingredient
+        registers it.
+        """
+        slot = self._find((pubchem_id, name.lower(), flavor_profiles), properties or {})
+        if slot is not None:
+            return self._molecules[slot]
+        return Molecule(pubchem_id, name, self._intern_profiles(flavor_profiles), properties)
+
+    def get(self, slot: int) -> Molecule:
+        return self._molecules[slot]
+
+    def get_pubchem_id(self, slot: int) -> int:
+        return self._pubchem_ids[slot]
+
+
+# The registry shared by every ingredient in the process.
+registry = MoleculeRegistry()
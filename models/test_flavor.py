@@ -0,0 +1,46 @@
+import pytest
+import numpy as np
+from typing import List
+from .ingredient import Ingredient, IngredientType
+from .molecule import Molecule
+from .flavor import FlavorMatrix
+
+toy_ingredients: List[Ingredient] = [
+    Ingredient("Pasta", "Bakery", 484, [
+        Molecule(323, "coumarin", ("bitter", "green", "sweet")),
+        Molecule(107971, "Daidzin", ("bitter",))], IngredientType.BASE),
+    Ingredient("Rice", "Cereal", 485, [
+        Molecule(107971, "Daidzin", ("bitter",))], IngredientType.BASE),
+    Ingredient("Tofu", "Legume", 486, [
+        Molecule(7284, "2-Methy1butyra1dehyde", ("nutty", "almond"))], IngredientType.PROTEIN),
+    Ingredient("Water", "Drink", 487, [], IngredientType.DRESSING)]
+
+class TestFlavorMatrix:
+    def test_counts(self):
+        matrix = FlavorMatrix(toy_ingredients)
+        assert matrix.vocabulary == ["almond", "bitter", "green", "nutty", "sweet"]
+        assert matrix.row(toy_ingredients[0]).tolist() == [0, 2, 1, 0, 1]
+        assert matrix.counts.sum() == sum(sum(c for _, c in i.flavor_profiles)
+                                          for i in toy_ingredients)
+
+    def test_top_flavors(self):
+        matrix = FlavorMatrix(toy_ingredients)
+        pasta = toy_ingredients[0]
+        assert matrix.top_flavors(pasta) == [("bitter", 2), ("green", 1), ("sweet", 1)]
+        assert matrix.top_flavors(pasta, 1) == [("bitter", 2)]
+        assert matrix.top_flavors(pasta) is matrix.top_flavors(pasta)
+        assert matrix.top_flavors(toy_ingredients[3]) == []
+
+    def test_ingredients_with_flavor(self):
+        matrix = FlavorMatrix(toy_ingredients)
+        assert matrix.ingredients_with_flavor("bitter") == toy_ingredients[:2]
+        assert matrix.ingredients_with_flavor("umami") == []
+
+    def test_cosine_similarity(self):
+        similarity = FlavorMatrix(toy_ingredients).cosine_similarity()
+        assert similarity.shape == (4, 4)
+        assert np.allclose(similarity, similarity.T)
+        assert similarity[0, 1] == pytest.approx(2 / np.sqrt(6))
+        assert similarity[0, 2] == 0
+        assert similarity[1, 1] == pytest.approx(1)
+        assert similarity[3].tolist() == [0, 0, 0, 0]
@@ -0,0 +1,58 @@
+import pytest
+from typing import List
+from .ingredient import Ingredient, IngredientType
+from .molecule import Molecule
+from .index import IngredientIndex, intersect_sorted
+
+toy_ingredients: List[Ingredient] = [
+    Ingredient("Pasta", "Bakery", 484, [
+        Molecule(323, "coumarin", ("bitter", "green", "sweet")),
+        Molecule(107971, "Daidzin", ("bitter",))], IngredientType.BASE),
+    Ingredient("Rice", "Cereal", 485, [
+        Molecule(107971, "Daidzin", ("bitter",)),
+        Molecule(323, "coumarin", ("bitter", "green", "sweet"))], IngredientType.BASE),
+    Ingredient("Tofu", "Legume", 486, [
+        Molecule(7284, "2-Methy1butyra1dehyde", ("nutty", "almond"))], IngredientType.PROTEIN),
+    Ingredient("Water", "Drink", 487, [], IngredientType.DRESSING)]
+
+class TestIngredientIndex:
+    def test_intersect_sorted(self):
+        assert intersect_sorted([1, 3, 5, 7], [2, 3, 4, 7, 9]) == [3, 7]
+        assert intersect_sorted([], [1]) == []
+
+    def test_molecule_postings(self):
+        index = IngredientIndex(toy_ingredients)
+        pasta, rice, tofu, _ = toy_ingredients
+        assert index.ingredients_with_molecule(323) == [pasta, rice]
+        assert index.ingredients_with_molecule(1) == []
+        assert index.ingredients_with_molecules([323, 107971]) == [pasta, rice]
+        assert index.ingredients_with_molecules([323, 7284]) == []
+        assert index.molecule(7284).get_name() == "2-methy1butyra1dehyde"
+
+    def test_flavor_postings(self):
+        index = IngredientIndex(toy_ingredients)
+        pasta, rice, tofu, _ = toy_ingredients
+        assert index.ingredients_with_flavor("green") == [pasta, rice]
+        assert index.ingredients_with_flavor("bitter", top=True) == [pasta, rice]
+        assert index.ingredients_with_flavor("green", top=True) == []
+        assert index.ingredients_with_flavor("umami") == []
+
+    def test_explain(self):
+        index = IngredientIndex(toy_ingredients)
+        pasta, rice, tofu, water = toy_ingredients
+        assert [m.get_pubchem_id() for m in index.explain(pasta, rice)] == [323, 107971]
+        assert index.explain(pasta, tofu) == []
+        assert index.shared_molecule_ids(rice, water) == []
+
+    def test_matches_corpus_scan(self, sample_ingredients):
+        ingredients = sample_ingredients
+        index = IngredientIndex(ingredients)
+        spinach = next(i for i in ingredients if i.get_name() == "spinach")
+        tomato = next(i for i in ingredients if i.get_name() == "tomato")
+        shared = set(spinach.get_molecule_ids()) & set(tomato.get_molecule_ids())
+        assert index.shared_molecule_ids(spinach, tomato) == sorted(shared)
+        assert len(index.explain(spinach, tomato)) == 114
+
+        pubchem_id = spinach.get_molecule_ids()[0]
+        assert index.ingredients_with_molecule(pubchem_id) == \
+            [i for i in ingredients if pubchem_id in i.get_molecule_ids()]
@@ -1,7 +1,8 @@
+import pickle
 import pytest
 from typing import List
 from .ingredient import Ingredient, FlavorProfiles, IngredientType
-from .molecule import Molecule
+from .molecule import Molecule, registry
 
 sample_molecules: List[Molecule] = [
     Molecule(323, "coumarin", ("bitter", "green", "sweet")),
@@ -53,5 +54,34 @@ class TestIngredient:
 
         assert pasta.get_molecule_ids() == [323, 107971, 7284]
 
+    def test_molecules_are_shared(self):
+        pasta = Ingredient("Pasta", "Bakery", 484, sample_molecules,
+                           IngredientType.BASE)
+        rice = Ingredient("Rice", "Cereal", 485, list(reversed(sample_molecules)),
+                          IngredientType.BASE)
+
+        assert pasta.get_molecules()[0] is rice.get_molecules()[2]
+        assert not hasattr(pasta, "__dict__")
+
+    def test_pickle_round_trip(self):
+        pasta = Ingredient("Pasta", "Bakery", 484, sample_molecules,
+                           IngredientType.BASE)
+        loaded = pickle.loads(pickle.dumps(pasta))
+
+        assert loaded == pasta
+        assert loaded.get_molecule_ids() == pasta.get_molecule_ids()
+        assert loaded.flavor_profiles == pasta.flavor_profiles
+        assert loaded.get_type() == IngredientType.BASE
+
     def test_json(self):
-        pass
+        pasta = Ingredient("Pasta", "Bakery", 484, sample_molecules,
+                           IngredientType.BASE)
+        assert '"molecule_ids": [323, 107971, 7284]' in pasta.json()
+
+    def test_releases_molecules_when_collected(self):
+        before = len(registry)
+        molecules = [Molecule(990001, "released", ("unique-flavor",))]
+        ing = Ingredient("Test", "Test", 990001, molecules, IngredientType.TOPPING)
+        assert len(registry) == before + 1
+        del ing
+        assert len(registry) == before
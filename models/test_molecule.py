@@ -1,5 +1,5 @@
 import pytest
-from .molecule import Molecule
+from .molecule import Molecule, MoleculeRegistry
 
 class TestMolecule:
     def test_checks_init_params(self):
@@ -21,3 +21,58 @@ class TestMolecule:
         id: int = 1
         m = Molecule(id, "test", ())
         assert m.get_pubchem_id() == id
+
+    def test_gets_properties(self):
+        m = Molecule(1, "test", (), {"taste": "bitter"})
+        assert m.get_property("taste") == "bitter"
+        assert m.get_property("molecular_weight") is None
+        assert Molecule(1, "test", ()).get_properties() == {}
+
+    def test_equality(self):
+        assert Molecule(1, "Test", ("sweet",)) == Molecule(1, "test", ("sweet",))
+        assert Molecule(1, "test", ("sweet",)) != Molecule(1, "test", ("bitter",))
+        assert Molecule(1, "test", ()) != Molecule(2, "test", ())
+
+    def test_has_no_instance_dict(self):
+        assert not hasattr(Molecule(1, "test", ()), "__dict__")
+
+    def test_registry_stores_molecules_once(self):
+        r = MoleculeRegistry()
+        slot = r.register(Molecule(323, "coumarin", ("bitter", "green")))
+        first = r.get(slot)
+        assert r.molecule(323, "Coumarin", ("bitter", "green")) is first
+        assert r.register(Molecule(323, "coumarin", ("bitter", "green"))) == slot
+        assert len(r) == 1 and r.references(slot) == 2
+
+        other = r.get(r.register(r.molecule(7284, "2-methylbutyraldehyde", ("bitter", "green"))))
+        assert other.get_flavor_profiles() is first.get_flavor_profiles()
+        assert r.molecule(323, "coumarin", ("bitter",)) is not first
+        assert len(r) == 2
+        assert r.get_pubchem_id(r.register(other)) == 7284
+
+    def test_register_does_not_modify_the_molecule(self):
+        r = MoleculeRegistry()
+        profiles = ("bit" + "ter",)
+        m = Molecule(1, "test", profiles)
+        assert r.get(r.register(m)) is not m
+        assert m.flavor_profiles is profiles
+
+    def test_unhashable_properties(self):
+        r = MoleculeRegistry()
+        a = r.register(Molecule(1, "test", (), {"synonyms": ["a", "b"]}))
+        b = r.register(Molecule(1, "test", (), {"synonyms": ["a", "c"]}))
+        assert a != b
+        assert r.register(Molecule(1, "test", (), {"synonyms": ["a", "b"]})) == a
+        assert Molecule(1, "test", (), {"x": [1]}) != Molecule(1, "test", (), {"x": [2]})
+
+    def test_released_molecules_are_dropped_and_slots_reused(self):
+        r = MoleculeRegistry()
+        slot = r.register(Molecule(1, "test", ()))
+        r.register(Molecule(1, "test", ()))
+        r.release(slot)
+        assert len(r) == 1
+        r.release(slot)
+        assert len(r) == 0
+        assert r.molecule(1, "test", ()) is not None
+        assert r.register(Molecule(2, "other", ())) == slot
+        assert r.get_pubchem_id(slot) == 2
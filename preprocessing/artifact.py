@@ -0,0 +1,243 @@
+""" Writes the ingredient index and the pairwise weight matrix of a corpus to
+a versioned binary artifact, which can later be opened read-only through
+mmap instead of recomputing the similarities.
+
+Every process which opens the same artifact maps the same file, so the
+weight matrix is shared between them by the operating system's page cache
+rather than copied into each process.
+
+Layout, with all integers little-endian:
+
+    header      magic, version, weight dtype, node count, the byte offsets of
+                the sections below and the size of the file (HEADER_FORMAT)
+    weights     n x n weight matrix, row-major, int64 or float64
+    edges       n x n edge mask, one byte per entry
+    provenance  pickled provenance of the artifact, or None
+    index       pickled list of the ingredient records, see preprocessing.cache
+
+The matrix sections start on ALIGNMENT byte boundaries.
+
+The provenance of an artifact built from a corpus records the fingerprint of
+every data file it was read from and the parameters the weights were computed
+with. is_current compares them against the corpus on disk, reading only the
+header and the provenance, so that a stale artifact is rebuilt by
+ensure_artifact, or refused, rather than silently used. A file which is
+truncated or cannot be read is stale too.
+"""
+import mmap
+import os
+import pickle
+import struct
+from typing import Dict, List, Tuple
+import numpy as np
+from models.ingredient import Ingredient
+from models.graph import create_graph
+from models.graph.array import ArrayGraph
+from preprocessing.cache import to_record, from_record, corpus_fingerprint, VALIDATE_MTIME
+from preprocessing.main import list_data_files, read_data
+from preprocessing.similarity import Mapping, combined_weights, mappings_from_matrix
+
+MAGIC: bytes = b"SALADSIM"
+# Bumped whenever the layout of the artifact changes.
+ARTIFACT_VERSION: int = 3
+HEADER_FORMAT: str = "<8sIIQQQQQQ"
+ALIGNMENT: int = 64
+
+_DTYPES = (np.dtype(np.int64), np.dtype(np.float64))
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _unpack_header(data: bytes, size: int, path: str) -> Tuple[int, ...]:
+    """ Returns the dtype index, node count, section offsets and file size of
+    an artifact from its header. Raises ValueError if the header is not that
+    of a complete artifact of the current version.
+    """
+    if len(data) < struct.calcsize(HEADER_FORMAT):
+        raise ValueError(f"{path} is not a similarity artifact")
+    magic, version, *fields = struct.unpack_from(HEADER_FORMAT, data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a similarity artifact")
+    if version != ARTIFACT_VERSION:
+        raise ValueError(f"{path} has artifact version {version}, "
+                         f"expected {ARTIFACT_VERSION}")
+    if fields[-1] != size:
+        raise ValueError(f"{path} is truncated")
+    return tuple(fields)
+
+
+def provenance(data_path: str, molecule_weight: float = 1, flavor_weight: float = 0,
+               metric: str = "count", validate: str = VALIDATE_MTIME) -> Dict:
+    """ Returns the provenance of an artifact built from the corpus currently
+    under data_path with the supplied parameters.
+    """
+    paths = [path for path, _ in list_data_files(data_path)]
+    return {"validate": validate,
+            "fingerprint": corpus_fingerprint(paths, validate),
+            "parameters": {"molecule_weight": molecule_weight,
+                           "flavor_weight": flavor_weight, "metric": metric}}
+
+
+def write_artifact(path: str, ingredients: List[Ingredient], weights: np.ndarray,
+                   edges: np.ndarray = None, provenance: Dict = None):
+    """ Writes the supplied ingredients and their symmetric weight matrix to
+    an artifact at path, along with its provenance, if known. Row and column
+    i of the matrix belong to the i-th ingredient. By default every pair of
+    distinct ingredients has an edge. The file is written under a temporary
+    name and moved into place, so a reader never sees a partial artifact.
+    """
+    n = len(ingredients)
+    assert weights.shape == (n, n), "weights must hold one row and column per ingredient"
+    weights = np.ascontiguousarray(weights, dtype=np.int64
+                                   if np.issubdtype(weights.dtype, np.integer) else np.float64)
+    if edges is None:
+        edges = ~np.eye(n, dtype=bool)
+    edges = np.ascontiguousarray(edges, dtype=bool)
+
+    origin = pickle.dumps(provenance, protocol=pickle.HIGHEST_PROTOCOL)
+    index = pickle.dumps([to_record(i) for i in ingredients], protocol=pickle.HIGHEST_PROTOCOL)
+    weights_offset = _aligned(struct.calcsize(HEADER_FORMAT))
+    edges_offset = _aligned(weights_offset + weights.nbytes)
+    provenance_offset = edges_offset + edges.nbytes
+    index_offset = provenance_offset + len(origin)
+    header = struct.pack(HEADER_FORMAT, MAGIC, ARTIFACT_VERSION,
+                         _DTYPES.index(weights.dtype), n, weights_offset, edges_offset,
+                         provenance_offset, index_offset, index_offset + len(index))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for offset, section in ((weights_offset, weights), (edges_offset, edges)):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(section.tobytes())
+        f.write(origin)
+        f.write(index)
+    os.replace(tmp_path, path)
+
+
+def build_artifact(data_path: str, artifact_path: str, cache_path: str = None,
+                   molecule_weight: float = 1, flavor_weight: float = 0,
+                   metric: str = "count"):
+    """ Reads the corpus under data_path and writes its pairwise weights, as
+    computed by create_mappings with the same weights and metric, to an
+    artifact.
+    """
+    # The fingerprint is taken before reading, so that files changed during
+    # the build leave the artifact stale rather than wrongly current.
+    origin = provenance(data_path, molecule_weight, flavor_weight, metric)
+    ingredients = read_data(data_path, cache_path)
+    write_artifact(artifact_path, ingredients,
+                   combined_weights(ingredients, molecule_weight, flavor_weight, metric),
+                   provenance=origin)
+
+
+def is_current(artifact_path: str, data_path: str, molecule_weight: float = 1,
+               flavor_weight: float = 0, metric: str = "count") -> bool:
+    """ Returns whether an artifact exists at artifact_path which was built
+    from the corpus currently under data_path with the supplied parameters.
+    """
+    if not os.path.isfile(artifact_path):
+        return False
+    try:
+        recorded = read_provenance(artifact_path)
+    except (OSError, EOFError, pickle.UnpicklingError, struct.error, AttributeError,
+            ImportError, IndexError, TypeError, ValueError):
+        return False
+    return isinstance(recorded, dict) and recorded == provenance(
+        data_path, molecule_weight, flavor_weight, metric, recorded.get("validate"))
+
+
+def ensure_artifact(data_path: str, artifact_path: str, cache_path: str = None,
+                    molecule_weight: float = 1, flavor_weight: float = 0,
+                    metric: str = "count") -> bool:
+    """ Builds the artifact unless an up to date one already exists at
+    artifact_path. Returns whether it was (re)built.
+    """
+    if is_current(artifact_path, data_path, molecule_weight, flavor_weight, metric):
+        return False
+    build_artifact(data_path, artifact_path, cache_path, molecule_weight, flavor_weight, metric)
+    return True
+
+
+def read_provenance(path: str) -> Dict:
+    """ Returns the provenance recorded in the artifact at path, or None if it
+    has none, without loading its matrices or its ingredients. Raises
+    ValueError if the file is not a complete artifact of the current version.
+    """
+    with open(path, "rb") as f:
+        _, _, _, _, provenance_offset, index_offset, _ = _unpack_header(
+            f.read(struct.calcsize(HEADER_FORMAT)), os.fstat(f.fileno()).st_size, path)
+        f.seek(provenance_offset)
+        return pickle.loads(f.read(index_offset - provenance_offset))
+
+
+class SimilarityArtifact:
+    """ An artifact opened read-only through mmap. The weights and edges
+    matrices are views onto the mapped file and cannot be written to.
+
+    The file stays mapped until close is called, or the artifact is used as a
+    context manager, or else until it and every array taken from it are
+    garbage collected.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            dtype, n, weights_offset, edges_offset, provenance_offset, index_offset, _ = \
+                _unpack_header(self._mmap, len(self._mmap), path)
+            self.provenance: Dict = pickle.loads(self._mmap[provenance_offset:index_offset])
+            self.ingredients: List[Ingredient] = \
+                [from_record(r) for r in pickle.loads(self._mmap[index_offset:])]
+        except Exception:
+            self._mmap.close()
+            raise
+
+        self.weights = np.frombuffer(self._mmap, dtype=_DTYPES[dtype], count=n * n,
+                                     offset=weights_offset).reshape(n, n)
+        self.edges = np.frombuffer(self._mmap, dtype=bool, count=n * n,
+                                   offset=edges_offset).reshape(n, n)
+
+    def close(self):
+        """ Unmaps the file and releases the matrices. If arrays taken from
+        them, such as the weights of a graph built directly on the artifact,
+        are still referenced, BufferError is raised and the file stays mapped
+        until they are garbage collected.
+        """
+        self.weights = self.edges = None
+        self._mmap.close()
+
+    def __enter__(self) -> "SimilarityArtifact":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def mappings(self) -> List[Mapping]:
+        """ Returns the artifact's weights as sorted (ingredient, ingredient,
+        weight) tuples, as returned by create_mappings.
+        """
+        return mappings_from_matrix(self.ingredients, self.weights)
+
+    def graph(self, backend: str = "array", **options):
+        """ Builds a graph from the artifact. The array backend uses the
+        mapped matrices directly unless top_k is given; the networkx backend
+        is built from the artifact's mappings.
+        """
+        if backend == "array" and options.get("top_k") is None:
+            return ArrayGraph.from_matrix(self.ingredients, self.weights, self.edges,
+                                          options.get("min_weight"))
+        return create_graph(self.mappings(), backend, **options)
+
+
+def open_artifact(path: str) -> SimilarityArtifact:
+    """ Opens the artifact at path read-only. Raises ValueError if the file is
+    not an artifact of the current version.
+    """
+    return SimilarityArtifact(path)
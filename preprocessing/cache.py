@@ -0,0 +1,111 @@
+""" Stores the parsed FlavorDB corpus in a compiled on-disk cache so that
+subsequent runs can skip reading and decoding the JSON files.
+
+The cache records a fingerprint of every data file, either its modification
+time and size or a hash of its contents. The cache is only used when the
+fingerprints of the files currently on disk match the recorded ones.
+"""
+import hashlib
+import os
+import pickle
+from typing import Dict, List, Optional, Sequence, Tuple
+from models.ingredient import Ingredient, IngredientType
+from models.molecule import registry
+
+# Bumped whenever the layout of the cached records changes.
+CACHE_VERSION: int = 2
+
+VALIDATE_MTIME: str = "mtime"
+VALIDATE_HASH: str = "hash"
+
+MoleculeRecord = Tuple[int, str, tuple, Dict]
+IngredientRecord = Tuple[str, str, int, str, List[MoleculeRecord]]
+
+
+def file_fingerprint(path: str, validate: str = VALIDATE_MTIME) -> Tuple:
+    """ Returns a value which changes whenever the file at the supplied path
+    changes, based on either its modification time and size, or a hash of its
+    contents.
+    """
+    if validate == VALIDATE_HASH:
+        with open(path, "rb") as f:
+            return (hashlib.sha1(f.read()).hexdigest(),)
+    assert validate == VALIDATE_MTIME, f"unknown validation mode {validate}"
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def corpus_fingerprint(paths: List[str], validate: str = VALIDATE_MTIME) -> Dict:
+    """ Returns the fingerprints of all supplied files keyed by path.
+    """
+    return {p: file_fingerprint(p, validate) for p in paths}
+
+
+def to_record(ingredient: Ingredient) -> IngredientRecord:
+    """ Flattens an ingredient into plain tuples for storage.
+    """
+    return (ingredient.get_name(), ingredient.get_category(), ingredient.get_id(),
+            ingredient.get_type().value,
+            [(m.get_pubchem_id(), m.get_name(), m.get_flavor_profiles(),
+              m.get_properties())
+             for m in ingredient.get_molecules()])
+
+
+def from_record(record: IngredientRecord) -> Ingredient:
+    """ Rebuilds an ingredient from its flattened form.
+    """
+    name, category, entity_id, type, molecules = record
+    return Ingredient(name, category, entity_id,
+                      [registry.molecule(*m) for m in molecules], IngredientType(type))
+
+
+def load_cache(cache_path: str, paths: List[str], validate: str = VALIDATE_MTIME,
+               extra_fields: Sequence[str] = ()) -> Optional[List[Ingredient]]:
+    """ Returns the cached ingredients if the cache exists and was built from
+    exactly the supplied files in their current state, keeping the same extra
+    molecule fields, otherwise None.
+    """
+    if not os.path.isfile(cache_path):
+        return None
+
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, IndexError, TypeError, ValueError):
+        return None
+
+    if not isinstance(cached, dict) or cached.get("version") != CACHE_VERSION:
+        return None
+    if cached.get("extra_fields") != sorted(extra_fields):
+        return None
+    if cached.get("validate") != validate or \
+            cached.get("fingerprint") != corpus_fingerprint(paths, validate):
+        return None
+
+    return [from_record(r) for r in cached["ingredients"]]
+
+
+def save_cache(cache_path: str, paths: List[str], ingredients: List[Ingredient],
+               validate: str = VALIDATE_MTIME, extra_fields: Sequence[str] = ()):
+    """ Writes the supplied ingredients to the cache, along with the
+    fingerprints of the files they were read from.
+    """
+    cache_dir = os.path.dirname(cache_path)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    cached = {
+        "version": CACHE_VERSION,
+        "validate": validate,
+        "extra_fields": sorted(extra_fields),
+        "fingerprint": corpus_fingerprint(paths, validate),
+        "ingredients": [to_record(i) for i in ingredients]
+    }
+
+    # Write to a temporary file first so that a concurrent reader never sees
+    # a partially written cache.
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
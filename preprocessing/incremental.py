@@ -0,0 +1,146 @@
+""" Keeps an ingredient graph in step with the data directory without
+rebuilding it from scratch.
+
+A CorpusUpdater reads the corpus once and remembers the fingerprint of every
+data file. A later scan compares the directory with those fingerprints, and
+refresh reads only the added or changed files. Each of those ingredients has
+its shared molecule counts against the rest of the corpus computed from an
+index of molecule to ingredients, and is patched into the graph in place.
+Removed files take their ingredient and its edges out of the graph. Each
+changed ingredient costs O(n) work instead of the O(n^2) of a full rebuild,
+and only the cached neighbour orders of the nodes it shares edges with are
+dropped. The molecules of removed or replaced ingredients are released from
+the shared molecule registry, so repeated updates do not accumulate them.
+"""
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+from models.ingredient import Ingredient
+from models.graph import create_graph
+from preprocessing.cache import file_fingerprint, VALIDATE_MTIME
+from preprocessing.main import (list_data_files, read_json, construct_ingredient,
+                                projection_fields)
+from preprocessing.similarity import similarity_mappings
+
+# The paths which were added, changed and removed since the last scan.
+ScanResult = Tuple[List[str], List[str], List[str]]
+
+
+class MoleculeIndex:
+    """ Maps each Pubchem ID to the set of ingredients containing that
+    molecule, so that the ingredients sharing molecules with a given one can
+    be found without visiting the others.
+    """
+    def __init__(self, ingredients: List[Ingredient] = ()):
+        self.ingredients: Set[Ingredient] = set()
+        self._postings: Dict[int, Set[Ingredient]] = {}
+        for ing in ingredients:
+            self.add(ing)
+
+    def add(self, ingredient: Ingredient):
+        self.ingredients.add(ingredient)
+        for pubchem_id in set(ingredient.get_molecule_ids()):
+            self._postings.setdefault(pubchem_id, set()).add(ingredient)
+
+    def remove(self, ingredient: Ingredient):
+        self.ingredients.discard(ingredient)
+        for pubchem_id in set(ingredient.get_molecule_ids()):
+            posting = self._postings.get(pubchem_id)
+            if posting is not None:
+                posting.discard(ingredient)
+                if not posting:
+                    del self._postings[pubchem_id]
+
+    def similarity_row(self, ingredient: Ingredient) -> Dict[Ingredient, int]:
+        """ Returns the number of molecules the supplied ingredient shares with
+        every indexed ingredient other than itself, including those sharing
+        none.
+        """
+        shared: Counter = Counter()
+        for pubchem_id in set(ingredient.get_molecule_ids()):
+            shared.update(self._postings.get(pubchem_id, ()))
+
+        return {other: shared[other] for other in self.ingredients if other != ingredient}
+
+
+class CorpusUpdater:
+    """ Reads the corpus under root_path into a graph, built with the given
+    backend and min_weight, and applies later changes to the data files to
+    that graph in place.
+
+    Weights are shared molecule counts, as with the default create_mappings.
+    Graphs keeping only the top_k edges of each node are not supported, as
+    adding a node may evict edges of any of its neighbours.
+    """
+    def __init__(self, root_path: str, backend: str = "networkx", min_weight: float = None,
+                 validate: str = VALIDATE_MTIME):
+        self.root_path = root_path
+        self.min_weight = min_weight
+        self.validate = validate
+        self._fields = projection_fields()
+        self.files: Dict[str, Tuple[Tuple, Ingredient]] = {}
+
+        for path, folder in list_data_files(root_path):
+            self.files[path] = (file_fingerprint(path, validate), self._read(path, folder))
+
+        ingredients = [ing for _, ing in self.files.values()]
+        self.index = MoleculeIndex(ingredients)
+        self.graph = create_graph(similarity_mappings(ingredients), backend,
+                                  min_weight=min_weight)
+
+        # A corpus of a single ingredient has no pairs, so its node is added here.
+        in_graph = set(self.graph.get_nodes())
+        for ing in ingredients:
+            if ing not in in_graph:
+                self.graph.add_ingredient(ing, self.index.similarity_row(ing), min_weight)
+
+    def _read(self, path: str, folder: str) -> Ingredient:
+        return construct_ingredient(read_json(path, self._fields), folder)
+
+    def scan(self) -> ScanResult:
+        """ Compares the files under the root path with those last read.
+        Returns the paths which were added, changed and removed since.
+        """
+        on_disk = list_data_files(self.root_path)
+        added: List[str] = []
+        changed: List[str] = []
+        for path, _ in on_disk:
+            if path not in self.files:
+                added.append(path)
+            elif file_fingerprint(path, self.validate) != self.files[path][0]:
+                changed.append(path)
+
+        present = {path for path, _ in on_disk}
+        removed = [path for path in self.files if path not in present]
+        return added, changed, removed
+
+    def refresh(self) -> ScanResult:
+        """ Applies every change found by scan to the graph, reading only the
+        added and changed files. Returns the result of the scan.
+        """
+        added, changed, removed = self.scan()
+        folders = dict(list_data_files(self.root_path)) if added or changed else {}
+
+        for path in removed + changed:
+            self.remove_ingredient(self.files.pop(path)[1])
+        for path in changed + added:
+            ingredient = self._read(path, folders[path])
+            self.files[path] = (file_fingerprint(path, self.validate), ingredient)
+            self.add_ingredient(ingredient)
+
+        return added, changed, removed
+
+    def add_ingredient(self, ingredient: Ingredient):
+        """ Adds an ingredient to the graph, with edges weighted by the number
+        of molecules it shares with each ingredient already in the corpus.
+        """
+        self.index.add(ingredient)
+        self.graph.add_ingredient(ingredient, self.index.similarity_row(ingredient),
+                                  self.min_weight)
+
+    def remove_ingredient(self, ingredient: Ingredient):
+        """ Removes an ingredient and its edges from the graph. The updater
+        keeps no other reference to it, so once the caller drops it too, its
+        molecules are released from the molecule registry.
+        """
+        self.index.remove(ingredient)
+        self.graph.remove_ingredient(ingredient)
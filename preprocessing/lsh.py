@@ -0,0 +1,134 @@
+""" Finds the ingredient pairs with high molecule overlap without comparing
+every pair, using MinHash signatures and locality-sensitive hashing (LSH).
+
+Each ingredient's set of molecules is summarised by a MinHash signature, in
+which the probability that two ingredients agree on any one position equals
+the Jaccard similarity of their molecule sets. The signatures are split into
+bands of rows, and ingredients whose signatures agree on every row of at
+least one band become candidate pairs. A pair with Jaccard similarity s
+becomes a candidate with probability 1 - (1 - s ** rows) ** bands, so the
+bands and rows parameters set the similarity around which pairs start to be
+found, roughly (1 / bands) ** (1 / rows).
+
+Shared molecule counts are then computed exactly, for the candidate pairs
+only.
+"""
+import itertools
+from typing import Dict, List, Set, Tuple
+import numpy as np
+from models.ingredient import Ingredient
+from preprocessing.similarity import Mapping, MoleculeIncidence, pairwise_shared_molecules
+
+# A Mersenne prime used as the modulus of the MinHash hash functions. Keeping
+# it below 2 ** 31 means a * x + b cannot overflow 64-bit integers.
+_PRIME: int = (1 << 31) - 1
+
+# Number of hash functions evaluated at a time, bounding the size of the
+# intermediate molecule x hash matrix.
+_PERMUTATION_BLOCK: int = 16
+
+
+def minhash_signatures(incidence: MoleculeIncidence, num_perm: int = 128,
+                       seed: int = 0) -> np.ndarray:
+    """ Returns an n x num_perm matrix holding the MinHash signature of each
+    ingredient's molecule set. Ingredients without molecules get a signature
+    of _PRIME in every position, a value no hash can take; candidate_pairs
+    leaves them out.
+    """
+    n_ings, _ = incidence.shape()
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _PRIME, size=num_perm, dtype=np.int64)
+    b = rng.randint(0, _PRIME, size=num_perm, dtype=np.int64)
+
+    signatures = np.full((n_ings, num_perm), _PRIME, dtype=np.int64)
+    if len(incidence.rows) == 0:
+        return signatures
+
+    # The coordinates are grouped by ingredient, so the minimum over each
+    # ingredient's molecules can be taken with reduceat over its run.
+    order = np.argsort(incidence.rows, kind="stable")
+    rows = incidence.rows[order]
+    cols = incidence.cols[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    molecules = incidence.molecule_ids % _PRIME
+
+    for start in range(0, num_perm, _PERMUTATION_BLOCK):
+        stop = min(start + _PERMUTATION_BLOCK, num_perm)
+        hashes = (molecules[:, None] * a[start:stop] + b[start:stop]) % _PRIME
+        signatures[rows[starts], start:stop] = np.minimum.reduceat(hashes[cols], starts, axis=0)
+
+    return signatures
+
+
+def candidate_pairs(signatures: np.ndarray, bands: int, rows: int) -> Set[Tuple[int, int]]:
+    """ Returns the index pairs (i, j), with i < j, of the ingredients whose
+    signatures agree on every row of at least one band. Ingredients without
+    molecules share no molecules with any other, so they are never paired.
+    """
+    n_ings, num_perm = signatures.shape
+    assert bands * rows <= num_perm, "bands * rows must not exceed the signature length"
+
+    # The empty signatures would otherwise all collide in every band.
+    kept = np.flatnonzero((signatures < _PRIME).any(axis=1))
+    signatures = signatures[kept]
+
+    pairs: Set[Tuple[int, int]] = set()
+    for band in range(bands):
+        band_slice = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        _, buckets = np.unique(band_slice, axis=0, return_inverse=True)
+        buckets = buckets.ravel()
+        order = np.argsort(buckets, kind="stable")
+        boundaries = np.flatnonzero(np.diff(buckets[order])) + 1
+        for members in np.split(order, boundaries):
+            if len(members) > 1:
+                pairs.update(itertools.combinations(sorted(kept[members].tolist()), 2))
+    return pairs
+
+
+def approximate_mappings(ingredients: List[Ingredient], bands: int = 20, rows: int = 5,
+                         seed: int = 0) -> List[Mapping]:
+    """ Returns (ingredient, ingredient, shared molecule count) tuples for the
+    candidate pairs found by LSH only, sorted by descending count. Pairs
+    which are not candidates are left out entirely.
+    """
+    incidence = MoleculeIncidence(ingredients)
+    pairs = sorted(candidate_pairs(minhash_signatures(incidence, bands * rows, seed),
+                                   bands, rows))
+    molecule_sets = [set(ing.get_molecule_ids()) for ing in ingredients]
+
+    mappings = [(ingredients[i], ingredients[j], len(molecule_sets[i] & molecule_sets[j]))
+                for i, j in pairs]
+    mappings.sort(key=lambda tup: tup[2], reverse=True)
+    return mappings
+
+
+def measure_recall(ingredients: List[Ingredient], bands: int = 20, rows: int = 5,
+                   min_jaccard: float = 0.5, seed: int = 0) -> Dict:
+    """ Compares the LSH candidate pairs with the exact all-pairs path. Returns
+    the recall over pairs whose molecule sets have a Jaccard similarity of at
+    least min_jaccard, along with the numbers of candidate, relevant and total
+    pairs, so that the bands and rows parameters can be tuned.
+    """
+    incidence = MoleculeIncidence(ingredients)
+    pairs = candidate_pairs(minhash_signatures(incidence, bands * rows, seed), bands, rows)
+
+    shared = pairwise_shared_molecules(ingredients).astype(np.float64)
+    sizes = np.diag(shared)
+    unions = sizes[:, None] + sizes[None, :] - shared
+    jaccard = np.divide(shared, unions, out=np.zeros_like(shared), where=unions > 0)
+
+    upper_a, upper_b = np.triu_indices(len(ingredients), k=1)
+    relevant = {(a, b) for a, b in zip(upper_a.tolist(), upper_b.tolist())
+                if jaccard[a, b] >= min_jaccard}
+    found = len(relevant & pairs)
+
+    return {
+        "bands": bands,
+        "rows": rows,
+        "min_jaccard": min_jaccard,
+        "total_pairs": len(upper_a),
+        "candidate_pairs": len(pairs),
+        "relevant_pairs": len(relevant),
+        "recall": found / len(relevant) if relevant else 1.0,
+        "precision": found / len(pairs) if pairs else 1.0
+    }
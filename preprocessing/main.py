@@ -1,50 +1,188 @@
 """ Preprocesses the JSON files downloaded from FlavorDB into a set of
 ingredients and their molecules.
 """
-import networkx as nx
 import os
-import itertools
 import sys
 sys.path.append(".")
-from typing import Dict, List, Tuple
+from typing import Dict, FrozenSet, Iterator, List, Sequence, Tuple, Union
 import json
 from models.ingredient import Ingredient, FlavorProfiles, IngredientType
-from models.molecule import Molecule
+from models.molecule import Molecule, registry
+from instrumentation.metrics import metrics
+from preprocessing.cache import load_cache, save_cache, VALIDATE_MTIME
 
-def read_data(root_path: str) -> List[Ingredient]:
-    """ Reads all JSON files within a specified root directory, where
-    subfolders of the directory are used as the "type" property of the
-    ingredient. Returns a list of Ingredient objects.
+# Fields of a FlavorDB entity and of each of its molecules which are always
+# kept when parsing. Any other field is dropped unless requested through
+# extra_fields.
+ENTITY_FIELDS: Tuple[str, ...] = ("entity_alias_readable", "category_readable",
+                                  "entity_id", "molecules")
+MOLECULE_FIELDS: Tuple[str, ...] = ("pubchem_id", "common_name", "fooddb_flavor_profile")
+
+# A data file which could not be turned into an ingredient, as a
+# (file path, error message) pair.
+FileError = Tuple[str, str]
+
+# The weight of a mapping: a shared molecule count under the "count" metric,
+# and a float under any other metric or once flavor weights are mixed in.
+Weight = Union[int, float]
+
+class IngestError(Exception):
+    """ Raised once all data files have been read if any of them could not be
+    turned into an ingredient. Holds the failures as FileError pairs.
     """
-    ingredients: List[Ingredient] = []
+    def __init__(self, errors: List[FileError]):
+        self.errors = errors
+        super().__init__("failed to read {} data file(s): {}".format(
+            len(errors), "; ".join(f"{path}: {msg}" for path, msg in errors)))
+
+def list_data_files(root_path: str) -> List[Tuple[str, str]]:
+    """ Returns the path of every file within the specified root directory,
+    paired with the name of its parent folder, in the order they are found.
+    """
+    data_files: List[Tuple[str, str]] = []
 
     for root, _, files in os.walk(root_path):
         for name in files:
             file_path: str = os.path.join(root, name)
             parent_folder_name: str = file_path.split("/")[len(file_path.split("/")) - 2]
-            ingredient: Ingredient = construct_ingredient(read_json(file_path),
-                                                          parent_folder_name)
+            data_files.append((file_path, parent_folder_name))
+
+    return data_files
+
+def read_data(root_path: str, cache_path: str = None, rebuild_cache: bool = False,
+              validate: str = VALIDATE_MTIME,
+              extra_fields: Sequence[str] = (), workers: int = 1,
+              errors: List[FileError] = None) -> List[Ingredient]:
+    """ Reads all JSON files within a specified root directory, where
+    subfolders of the directory are used as the "type" property of the
+    ingredient. Returns a list of Ingredient objects.
+
+    If a cache_path is supplied, the parsed ingredients are loaded from the
+    compiled cache at that path when it is still valid for the files on disk,
+    and the cache is (re)written otherwise. Validity is checked by file
+    modification time, or by content hash if validate is "hash". Setting
+    rebuild_cache forces the JSON files to be parsed again.
+
+    Only the molecule fields used by construct_ingredient are kept while
+    parsing. Any extra_fields are kept as well and stored as properties of
+    each Molecule.
+
+    If workers is greater than one, the files are parsed by a pool of that
+    many processes. The returned list is in the same order as a serial read.
+    In this mode a file that fails to parse does not stop the others from
+    being read: failures are appended to the supplied errors list and the
+    file is skipped, or, if no list is supplied, an IngestError describing
+    every failure is raised once all files have been read.
+    """
+    data_files = list_data_files(root_path)
+    paths: List[str] = [path for path, _ in data_files]
+
+    if cache_path is not None and not rebuild_cache:
+        with metrics.span("read_data.load_cache"):
+            cached = load_cache(cache_path, paths, validate, extra_fields)
+        if cached is not None:
+            return cached
+
+    ingredients: List[Ingredient] = []
+    fields = projection_fields(extra_fields)
+
+    if workers > 1:
+        failures: List[FileError] = []
+        ingredients = _read_files_in_parallel(data_files, fields, extra_fields,
+                                              workers, failures)
+        if failures:
+            if errors is None:
+                raise IngestError(failures)
+            errors.extend(failures)
+            # A partial corpus is never cached.
+            return ingredients
+    else:
+        for file_path, parent_folder_name in data_files:
+            ingredient: Ingredient = construct_ingredient(read_json(file_path, fields),
+                                                          parent_folder_name, extra_fields)
             ingredients.append(ingredient)
 
+    if cache_path is not None:
+        with metrics.span("read_data.save_cache"):
+            save_cache(cache_path, paths, ingredients, validate, extra_fields)
+
+    return ingredients
+
+def _read_file(job: Tuple[str, str, FrozenSet[str], Sequence[str]]) \
+        -> Tuple[Ingredient, str]:
+    """ Reads a single data file into an ingredient within a worker process.
+    Returns the ingredient, or None and the error message if it failed.
+    """
+    file_path, parent_folder_name, fields, extra_fields = job
+    try:
+        return construct_ingredient(read_json(file_path, fields),
+                                    parent_folder_name, extra_fields), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _read_files_in_parallel(data_files: List[Tuple[str, str]], fields: FrozenSet[str],
+                            extra_fields: Sequence[str], workers: int,
+                            errors: List[FileError]) -> List[Ingredient]:
+    """ Reads the supplied data files across a process pool, preserving their
+    order. Files which fail are skipped and recorded in errors.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = [(path, folder, fields, tuple(extra_fields)) for path, folder in data_files]
+    chunksize = max(1, len(jobs) // (workers * 4))
+    ingredients: List[Ingredient] = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for (path, _), (ingredient, error) in zip(data_files,
+                                                  executor.map(_read_file, jobs,
+                                                               chunksize=chunksize)):
+            if error is not None:
+                errors.append((path, error))
+            else:
+                ingredients.append(ingredient)
+
     return ingredients
 
-def read_json(path: str) -> Dict:
+def projection_fields(extra_fields: Sequence[str] = ()) -> FrozenSet[str]:
+    """ Returns the set of JSON keys kept when parsing a FlavorDB file.
+    """
+    return frozenset(ENTITY_FIELDS + MOLECULE_FIELDS + tuple(extra_fields))
+
+def read_json(path: str, fields: FrozenSet[str] = None) -> Dict:
     """ Reads the file at the supplied path into a dictionary.
+
+    If a set of fields is supplied, every JSON object is projected onto those
+    keys as soon as it is decoded, so the discarded values of one molecule
+    are released before the next molecule is parsed.
     """
-    input_file = open(path, "r")
-    contents: str = input_file.read()
-    return json.loads(contents)
+    with metrics.span("read_data.read_file"):
+        with open(path, "r") as input_file:
+            contents: str = input_file.read()
+
+    with metrics.span("read_data.decode_json"):
+        if fields is None:
+            return json.loads(contents)
 
-def construct_ingredient(json: Dict, type: str) -> Ingredient:
-    """ Returns an Ingredient object from a given JSON file
+        return json.loads(contents, object_pairs_hook=lambda pairs:
+                          {k: v for k, v in pairs if k in fields})
+
+def construct_ingredient(json: Dict, type: str,
+                         extra_fields: Sequence[str] = ()) -> Ingredient:
+    """ Returns an Ingredient object from a given JSON file. Any extra_fields
+    present on a molecule are stored as properties of that Molecule.
     """
-    ingredient_type = IngredientType(type)
+    with metrics.span("read_data.construct_ingredient"):
+        ingredient_type = IngredientType(type)
 
-    molecules: List[Molecule] = [Molecule(m["pubchem_id"], m["common_name"],
-                                          tuple(m["fooddb_flavor_profile"].split("@")))
-                                          for m in json["molecules"]]
-    return Ingredient(json["entity_alias_readable"], json["category_readable"],
-                      json["entity_id"], molecules, ingredient_type)
+        # Molecules are looked up in the shared registry so that a compound
+        # found in many ingredients is only allocated once.
+        molecules: List[Molecule] = [
+            registry.molecule(m["pubchem_id"], m["common_name"],
+                              tuple(m["fooddb_flavor_profile"].split("@")),
+                              {f: m[f] for f in extra_fields if f in m})
+            for m in json["molecules"]]
+        return Ingredient(json["entity_alias_readable"], json["category_readable"],
+                          json["entity_id"], molecules, ingredient_type)
 
 def calculate_similarity(ing_a: Ingredient, ing_b: Ingredient) -> float:
     """ Returns the number of shared molecules between the supplied
@@ -57,30 +195,120 @@ def calculate_similarity(ing_a: Ingredient, ing_b: Ingredient) -> float:
 
     return len(similar)
 
-def create_mappings(data_path: str) -> Tuple[Ingredient, Ingredient, int]:
-    all_ings: List[Ingredient] = read_data(data_path)
+def create_mappings(data_path: str, cache_path: str = None, molecule_weight: float = 1,
+                    flavor_weight: float = 0, approximate: bool = False, bands: int = 20,
+                    rows: int = 5, metric: str = "count") \
+        -> List[Tuple[Ingredient, Ingredient, int]]:
+    with metrics.span("read_data"):
+        all_ings: List[Ingredient] = read_data(data_path, cache_path)
 
     """
     Similarity mapping:
     (pasta, chicken, 5)
     (pasta, apple, 1)
     (chicken, mushroom, 4)
+
+    The shared molecule counts for all pairs are computed at once from a
+    sparse ingredient x molecule incidence matrix, see
+    preprocessing.similarity.
+
+    The metric selects how shared molecules are scored: "count", "jaccard",
+    "overlap" or "idf"; see preprocessing.similarity.METRICS. The graph's edge
+    weights are whatever the chosen metric produces.
+
+    Setting a flavor_weight adds the cosine similarity of each pair's
+    flavor profiles, scaled by that weight, to the scaled molecule score.
+
+    If approximate is set, only the pairs with high molecule overlap, as found
+    by MinHash locality-sensitive hashing with the given bands and rows, are
+    returned with their exact shared molecule counts; see preprocessing.lsh.
+    """
+
+    # The numpy-based similarity modules are imported here so that reading the
+    # corpus alone does not pay for them.
+    with metrics.span("create_mappings"):
+        if approximate:
+            from preprocessing.lsh import approximate_mappings
+            assert molecule_weight == 1 and not flavor_weight and metric == "count", \
+                "approximate mappings only support shared molecule counts"
+            return approximate_mappings(all_ings, bands, rows)
+
+        from preprocessing.similarity import similarity_mappings
+        return similarity_mappings(all_ings, molecule_weight, flavor_weight, metric)
+
+
+def create_metric_mappings(data_path: str, names: Sequence[str] = None,
+                           cache_path: str = None) \
+        -> Dict[str, List[Tuple[Ingredient, Ingredient, Weight]]]:
+    """ Returns the mappings of the corpus under each of the named similarity
+    metrics, by default all of them, keyed by metric. "count" mappings have
+    int weights and the others float weights. The corpus is
+    read once and every metric comes from the same co-occurrence pass, so
+    metrics can be compared for the cost of a single create_mappings.
     """
+    from preprocessing.similarity import METRICS, metric_weights, mappings_from_matrix
+
+    all_ings: List[Ingredient] = read_data(data_path, cache_path)
+    matrices = metric_weights(all_ings, METRICS if names is None else names)
+    return {metric: mappings_from_matrix(all_ings, weights)
+            for metric, weights in matrices.items()}
 
-    mappings: List[Tuple[Ingredient, Ingredient, int]] = []
 
-    for ing_a, ing_b in itertools.combinations(all_ings, 2):
-        similarity: int = calculate_similarity(ing_a, ing_b)
-        mappings.append((ing_a, ing_b, similarity))
+def stream_mappings(data_path: str, cache_path: str = None, molecule_weight: float = 1,
+                    flavor_weight: float = 0, metric: str = "count", top_k: int = None,
+                    per_ingredient: bool = False) \
+        -> Iterator[Tuple[Ingredient, Ingredient, Weight]]:
+    """ Yields the same mappings as create_mappings, one at a time and without
+    sorting them, so that only the pairwise weight matrix is held in memory;
+    see preprocessing.stream.
 
-    mappings.sort(key=lambda tup: tup[2], reverse=True)
+    If top_k is given, only the top_k strongest mappings are yielded,
+    strongest first, or, if per_ingredient is set, the top_k strongest
+    mappings of each ingredient in turn, each mapping only once.
+    """
+    from preprocessing.similarity import combined_weights
+    from preprocessing.stream import iter_mappings, top_k_mappings, top_k_per_ingredient
 
-    return mappings
+    all_ings: List[Ingredient] = read_data(data_path, cache_path)
+    mappings = iter_mappings(all_ings, combined_weights(all_ings, molecule_weight,
+                                                        flavor_weight, metric))
+    if top_k is None:
+        yield from mappings
+    elif not per_ingredient:
+        yield from top_k_mappings(mappings, top_k)
+    else:
+        seen = set()
+        strongest = top_k_per_ingredient(mappings, top_k)
+        for ing in all_ings:
+            for a, b, w in strongest.get(ing, []):
+                if (a, b) not in seen:
+                    seen.add((a, b))
+                    yield (a, b, w)
 
 
 if __name__ == "__main__":
-    DATA_PATH: str = "./data"
-    mappings = create_mappings(DATA_PATH)
+    import argparse
+    parser = argparse.ArgumentParser(description="Writes the ingredient mappings of a corpus.")
+    parser.add_argument("--data", default="./data")
+    parser.add_argument("--cache", default=None)
+    parser.add_argument("--metric", default="count")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="only write the k strongest mappings")
+    parser.add_argument("--per-ingredient", action="store_true",
+                        help="apply --top-k to each ingredient instead of the whole corpus")
+    parser.add_argument("--output", default=None,
+                        help="file to write; CSV unless it ends in .bin, printed if omitted")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+    if args.top_k is not None and args.top_k <= 0:
+        parser.error("--top-k must be positive")
 
-    for m in mappings:
-        print(m)
+    mappings = stream_mappings(args.data, args.cache, metric=args.metric, top_k=args.top_k,
+                               per_ingredient=args.per_ingredient)
+    if args.output is None:
+        for m in mappings:
+            print(m)
+    else:
+        from preprocessing.stream import write_binary, write_csv
+        write = write_binary if args.output.endswith(".bin") else write_csv
+        print(f"Wrote {write(args.output, mappings, args.chunk_size)} mappings to {args.output}")
@@ -0,0 +1,211 @@
+""" Computes pairwise molecule-sharing similarities for a list of ingredients
+in bulk, rather than one pair at a time.
+
+The ingredients are described by a sparse ingredient x molecule incidence
+matrix, stored as coordinate (row, column) index arrays. Shared-molecule
+counts for every pair are then obtained from the product of the incidence
+matrix with its transpose, evaluated in column blocks so that memory stays
+bounded for corpora with many distinct molecules.
+
+The shared counts can be turned into one of several similarity metrics, see
+METRICS. Every metric is derived from the same co-occurrence pass, so any
+number of them can be computed together for the cost of one.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from models.ingredient import Ingredient
+from models.flavor import FlavorMatrix
+from instrumentation.metrics import metrics as instrumentation
+
+Mapping = Tuple[Ingredient, Ingredient, int]
+
+# Number of molecule columns densified at a time when computing the
+# co-occurrence product.
+BLOCK_SIZE: int = 4096
+
+# The available similarity metrics between two ingredients A and B, where
+# |A| is the number of distinct molecules in A:
+#   count    the number of shared molecules, |A & B|
+#   jaccard  |A & B| / |A | B|
+#   overlap  |A & B| / min(|A|, |B|), the overlap coefficient
+#   idf      the sum of log(n / df) over the shared molecules, where n is the
+#            number of ingredients and df the number containing the molecule,
+#            so that rare molecules count for more than common ones
+METRICS: Tuple[str, ...] = ("count", "jaccard", "overlap", "idf")
+
+
+class MoleculeIncidence:
+    """ A sparse ingredient x molecule incidence matrix. Row i describes the
+    i-th supplied ingredient, and column j the molecule with Pubchem ID
+    molecule_ids[j]. A (row, column) coordinate is present in the rows and
+    cols arrays for every molecule contained in an ingredient.
+    """
+    def __init__(self, ingredients: List[Ingredient]):
+        assert ingredients is not None, "ingredients must be supplied"
+
+        self.ingredients = ingredients
+
+        rows: List[int] = []
+        pubchem_ids: List[int] = []
+        for idx, ing in enumerate(ingredients):
+            # Duplicate molecules within one ingredient only count once,
+            # matching the set intersection used by calculate_similarity.
+            ids = set(ing.get_molecule_ids())
+            rows.extend([idx] * len(ids))
+            pubchem_ids.extend(ids)
+
+        self.molecule_ids, cols = np.unique(np.asarray(pubchem_ids, dtype=np.int64),
+                                            return_inverse=True)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = cols.astype(np.int64).ravel()
+
+    def shape(self) -> Tuple[int, int]:
+        return (len(self.ingredients), len(self.molecule_ids))
+
+    def molecule_counts(self) -> np.ndarray:
+        """ Returns the number of distinct molecules in each ingredient.
+        """
+        return np.bincount(self.rows, minlength=len(self.ingredients))
+
+    def document_frequencies(self) -> np.ndarray:
+        """ Returns the number of ingredients containing each molecule.
+        """
+        return np.bincount(self.cols, minlength=len(self.molecule_ids))
+
+    def inverse_document_frequencies(self) -> np.ndarray:
+        """ Returns log(n / df) for each molecule, where n is the number of
+        ingredients and df the number of ingredients containing the molecule.
+        """
+        return np.log(len(self.ingredients) / self.document_frequencies())
+
+    def co_occurrence(self) -> np.ndarray:
+        """ Returns a symmetric n x n matrix holding the number of molecules
+        shared by every pair of ingredients. The diagonal holds the number of
+        molecules in each ingredient.
+        """
+        counts, = self.weighted_co_occurrences([None])
+        return np.rint(counts).astype(np.int64)
+
+    def weighted_co_occurrences(self, molecule_weights: Sequence[Optional[np.ndarray]]) \
+            -> List[np.ndarray]:
+        """ Returns, for each supplied array of per-molecule weights, a
+        symmetric n x n matrix holding the sum of the weights of the molecules
+        shared by every pair of ingredients, in a single pass over the
+        incidence matrix. A weight array of None counts every molecule as 1.
+        The diagonals hold the sums over each ingredient's own molecules.
+        """
+        n_ings, n_mols = self.shape()
+        products = [np.zeros((n_ings, n_ings), dtype=np.float64) for _ in molecule_weights]
+
+        # Molecules found in a single ingredient never contribute to a pair,
+        # so they are dropped before densifying.
+        shared = self.document_frequencies() > 1
+        shared_ids = np.flatnonzero(shared)
+        keep = shared[self.cols]
+        rows, cols = self.rows[keep], self.cols[keep]
+        _, cols = np.unique(cols, return_inverse=True)
+        cols = cols.ravel()
+        n_shared = int(shared.sum())
+
+        for start in range(0, n_shared, BLOCK_SIZE):
+            stop = min(start + BLOCK_SIZE, n_shared)
+            in_block = (cols >= start) & (cols < stop)
+            block = np.zeros((n_ings, stop - start), dtype=np.float32)
+            block[rows[in_block], cols[in_block] - start] = 1
+            for product, weights in zip(products, molecule_weights):
+                if weights is None:
+                    product += block @ block.T
+                else:
+                    scaled = block * weights[shared_ids[start:stop]].astype(np.float32)
+                    product += scaled @ block.T
+
+        for product, weights in zip(products, molecule_weights):
+            np.fill_diagonal(product, np.bincount(
+                self.rows, weights=None if weights is None else weights[self.cols],
+                minlength=n_ings))
+        return products
+
+
+def pairwise_shared_molecules(ingredients: List[Ingredient]) -> np.ndarray:
+    """ Returns the symmetric matrix of shared molecule counts between every
+    pair of the supplied ingredients.
+    """
+    return MoleculeIncidence(ingredients).co_occurrence()
+
+
+def metric_weights(ingredients: List[Ingredient],
+                   metrics: Sequence[str] = METRICS) -> Dict[str, np.ndarray]:
+    """ Returns the symmetric matrix of each of the requested similarity
+    metrics between every pair of the supplied ingredients, keyed by metric.
+    The count metric is integral and the others are floating point. All of
+    them are derived from a single co-occurrence pass.
+    """
+    unknown = [m for m in metrics if m not in METRICS]
+    assert not unknown, f"unknown similarity metrics {unknown}"
+
+    incidence = MoleculeIncidence(ingredients)
+    weightings: List[Optional[np.ndarray]] = [None]
+    if "idf" in metrics:
+        weightings.append(incidence.inverse_document_frequencies())
+    products = incidence.weighted_co_occurrences(weightings)
+
+    counts = np.rint(products[0]).astype(np.int64)
+    sizes = np.diag(counts).astype(np.float64)
+    matrices: Dict[str, np.ndarray] = {}
+    for metric in metrics:
+        if metric == "count":
+            matrices[metric] = counts
+        elif metric == "jaccard":
+            unions = sizes[:, None] + sizes[None, :] - counts
+            matrices[metric] = np.divide(counts, unions, out=np.zeros(counts.shape),
+                                         where=unions > 0)
+        elif metric == "overlap":
+            smaller = np.minimum(sizes[:, None], sizes[None, :])
+            matrices[metric] = np.divide(counts, smaller, out=np.zeros(counts.shape),
+                                         where=smaller > 0)
+        elif metric == "idf":
+            matrices[metric] = products[1]
+    return matrices
+
+
+def mappings_from_matrix(ingredients: List[Ingredient],
+                         weights: np.ndarray) -> List[Mapping]:
+    """ Converts a symmetric weight matrix into a list of
+    (ingredient, ingredient, weight) tuples, one per unordered pair, sorted by
+    descending weight. Pairs of equal weight keep the order produced by
+    itertools.combinations over the ingredients.
+    """
+    with instrumentation.span("create_mappings.sort"):
+        upper_a, upper_b = np.triu_indices(len(ingredients), k=1)
+        pair_weights = weights[upper_a, upper_b]
+        order = np.argsort(-pair_weights, kind="stable")
+
+        return [(ingredients[a], ingredients[b], w)
+                for a, b, w in zip(upper_a[order].tolist(), upper_b[order].tolist(),
+                                   pair_weights[order].tolist())]
+
+
+def combined_weights(ingredients: List[Ingredient], molecule_weight: float = 1,
+                     flavor_weight: float = 0, metric: str = "count") -> np.ndarray:
+    """ Returns the pairwise edge weights formed by adding molecule_weight times
+    the molecule similarity metric, by default the number of shared molecules,
+    to flavor_weight times the cosine similarity of the ingredients' flavor
+    profiles. With the default weights this is the shared molecule count alone.
+    """
+    with instrumentation.span("create_mappings.similarity"):
+        weights = np.zeros((len(ingredients), len(ingredients)), dtype=np.int64)
+        if molecule_weight:
+            weights = metric_weights(ingredients, [metric])[metric] * molecule_weight
+        if flavor_weight:
+            weights = weights + FlavorMatrix(ingredients).cosine_similarity() * flavor_weight
+        return weights
+
+
+def similarity_mappings(ingredients: List[Ingredient], molecule_weight: float = 1,
+                        flavor_weight: float = 0, metric: str = "count") -> List[Mapping]:
+    """ Returns the similarity of every pair of the supplied ingredients as a
+    sorted list of (ingredient, ingredient, weight) tuples. By default the
+    weight is the number of shared molecules; see combined_weights.
+    """
+    return mappings_from_matrix(ingredients, combined_weights(ingredients, molecule_weight,
+                                                              flavor_weight, metric))
@@ -0,0 +1,111 @@
+""" Produces ingredient mappings one at a time instead of as one sorted list,
+so that a corpus can be written out or reduced to its strongest pairs
+without holding a tuple for every pair in memory at once.
+
+The pairwise weights are still computed in bulk, as a compact numpy matrix
+(see preprocessing.similarity), but tuples are only created row by row as
+they are consumed. Top-k selections keep bounded heaps, and the writers
+flush the stream to disk in fixed-size chunks.
+"""
+import csv
+import heapq
+from typing import Dict, Iterable, Iterator, List, Tuple
+import numpy as np
+from models.ingredient import Ingredient
+from preprocessing.similarity import Mapping
+
+# The record written for each mapping by write_binary: the FlavorDB entity IDs
+# of the two ingredients and the weight between them, little-endian.
+MAPPING_RECORD = np.dtype([("a", "<i8"), ("b", "<i8"), ("weight", "<f8")])
+
+
+def iter_mappings(ingredients: List[Ingredient], weights: np.ndarray) -> Iterator[Mapping]:
+    """ Yields an (ingredient, ingredient, weight) tuple for every unordered
+    pair of the supplied ingredients, from their symmetric weight matrix. Pairs
+    come in row order, as itertools.combinations would give them, not sorted.
+    """
+    for i, ing in enumerate(ingredients):
+        row = weights[i, i + 1:].tolist()
+        for other, weight in zip(ingredients[i + 1:], row):
+            yield (ing, other, weight)
+
+
+def top_k_mappings(mappings: Iterable[Mapping], k: int) -> List[Mapping]:
+    """ Returns the k strongest of the supplied mappings, strongest first,
+    keeping at most k of them in memory. Ties favour earlier mappings.
+    """
+    assert k > 0, "k must be positive"
+    heap: List[Tuple] = []
+    for idx, mapping in enumerate(mappings):
+        entry = (mapping[2], -idx, mapping)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [mapping for _, _, mapping in sorted(heap, key=lambda e: e[:2], reverse=True)]
+
+
+def top_k_per_ingredient(mappings: Iterable[Mapping], k: int) -> Dict[Ingredient, List[Mapping]]:
+    """ Returns, for every ingredient, its k strongest mappings, strongest
+    first, keeping at most k mappings per ingredient in memory. Ties favour
+    earlier mappings.
+    """
+    assert k > 0, "k must be positive"
+    heaps: Dict[Ingredient, List[Tuple]] = {}
+    for idx, mapping in enumerate(mappings):
+        entry = (mapping[2], -idx, mapping)
+        for node in mapping[:2]:
+            heap = heaps.setdefault(node, [])
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+    return {node: [m for _, _, m in sorted(heap, key=lambda e: e[:2], reverse=True)]
+            for node, heap in heaps.items()}
+
+
+def _chunks(mappings: Iterable[Mapping], chunk_size: int) -> Iterator[List[Mapping]]:
+    chunk: List[Mapping] = []
+    for mapping in mappings:
+        chunk.append(mapping)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_csv(path: str, mappings: Iterable[Mapping], chunk_size: int = 10000) -> int:
+    """ Writes the supplied mappings to a CSV file with a header row, chunk_size
+    rows at a time. Returns the number of mappings written.
+    """
+    written = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ingredient_a", "id_a", "ingredient_b", "id_b", "weight"])
+        for chunk in _chunks(mappings, chunk_size):
+            writer.writerows((a.get_name(), a.get_id(), b.get_name(), b.get_id(), w)
+                             for a, b, w in chunk)
+            written += len(chunk)
+    return written
+
+
+def write_binary(path: str, mappings: Iterable[Mapping], chunk_size: int = 65536) -> int:
+    """ Writes the supplied mappings to a file of MAPPING_RECORD records,
+    chunk_size records at a time. Returns the number of mappings written.
+    """
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in _chunks(mappings, chunk_size):
+            records = np.array([(a.get_id(), b.get_id(), w) for a, b, w in chunk],
+                               dtype=MAPPING_RECORD)
+            f.write(records.tobytes())
+            written += len(chunk)
+    return written
+
+
+def read_binary(path: str) -> np.ndarray:
+    """ Reads a file written by write_binary into a structured array with the
+    fields a, b and weight.
+    """
+    return np.fromfile(path, dtype=MAPPING_RECORD)
@@ -0,0 +1,128 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from .artifact import build_artifact, ensure_artifact, is_current, open_artifact, read_provenance, \
+    write_artifact
+
+
+@pytest.fixture(scope="module")
+def artifact_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("artifact") / "corpus.sim")
+    build_artifact("./data", path)
+    return path
+
+
+def summarise(mappings):
+    return [(a.get_id(), b.get_id(), w) for a, b, w in mappings]
+
+
+class TestArtifact:
+    def test_round_trip_matches_create_mappings(self, artifact_path, sample_ingredients,
+                                                sample_mappings):
+        artifact = open_artifact(artifact_path)
+        assert summarise(artifact.mappings()) == summarise(sample_mappings)
+        assert [i.get_name() for i in artifact.ingredients] == \
+            [i.get_name() for i in sample_ingredients]
+
+    def test_matrices_are_read_only_maps(self, artifact_path):
+        artifact = open_artifact(artifact_path)
+        assert not artifact.weights.flags.writeable
+        assert artifact.weights.dtype == np.int64
+        with pytest.raises(ValueError):
+            artifact.weights[0, 1] = 1
+
+    def test_array_graph_uses_mapped_weights(self, artifact_path, sample_graph):
+        artifact = open_artifact(artifact_path)
+        G = artifact.graph("array")
+        reference = sample_graph
+        assert np.shares_memory(G.weights, artifact.weights)
+        assert G.number_of_edges() == reference.number_of_edges()
+        assert G.get_weight_between("spinach", "tomato") == 114
+        spinach = G.get_node_by_name("spinach")
+        assert [attrs["weight"] for _, attrs in G.closest_neighbors(spinach, 5)] == \
+            [attrs["weight"] for _, attrs in reference.closest_neighbors(spinach, 5)]
+
+        # Updates copy the mapped matrices rather than writing to the file.
+        G.remove_ingredient(spinach)
+        assert G.get_node_by_name("spinach") is None
+        assert artifact.weights.flags.writeable is False
+
+    def test_graph_options(self, artifact_path):
+        artifact = open_artifact(artifact_path)
+        sparse = artifact.graph("array", min_weight=100)
+        assert all(w >= 100 for _, _, w in sparse.get_edges())
+        assert artifact.graph("networkx", top_k=3).number_of_edges() <= \
+            3 * len(artifact.ingredients)
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "not-an-artifact"
+        path.write_bytes(b"x" * 100)
+        with pytest.raises(ValueError):
+            open_artifact(str(path))
+
+    def test_float_weights(self, tmp_path, sample_ingredients):
+        ingredients = sample_ingredients[:3]
+        weights = np.array([[0, 0.5, 1.5], [0.5, 0, 2.0], [1.5, 2.0, 0]])
+        path = str(tmp_path / "float.sim")
+        write_artifact(path, ingredients, weights)
+        mapped = open_artifact(path)
+        assert mapped.weights.dtype == np.float64
+        assert np.array_equal(mapped.weights, weights)
+        assert mapped.mappings()[0][2] == 2.0
+
+    def test_stale_artifacts_are_rebuilt(self, tmp_path):
+        data_path = str(tmp_path / "data")
+        shutil.copytree("./data", data_path)
+        path = str(tmp_path / "corpus.sim")
+        assert not is_current(path, data_path)
+        assert ensure_artifact(data_path, path)
+        assert is_current(path, data_path)
+        assert not ensure_artifact(data_path, path)
+        assert open_artifact(path).provenance["parameters"]["metric"] == "count"
+
+        assert not is_current(path, data_path, metric="jaccard")
+        assert not is_current(path, data_path, flavor_weight=1)
+
+        changed = os.path.join(data_path, os.listdir(data_path)[0])
+        changed = os.path.join(changed, sorted(os.listdir(changed))[0])
+        os.utime(changed, ns=(0, 0))
+        assert not is_current(path, data_path)
+        assert ensure_artifact(data_path, path)
+        assert is_current(path, data_path)
+
+    def test_artifacts_without_provenance_are_not_current(self, tmp_path, sample_ingredients):
+        path = str(tmp_path / "bare.sim")
+        write_artifact(path, sample_ingredients[:2], np.zeros((2, 2)))
+        assert open_artifact(path).provenance is None
+        assert not is_current(path, "./data")
+
+    def test_truncated_artifacts_are_rebuilt(self, tmp_path):
+        data_path = str(tmp_path / "data")
+        shutil.copytree("./data", data_path)
+        path = str(tmp_path / "corpus.sim")
+        ensure_artifact(data_path, path)
+        size = os.path.getsize(path)
+        for length in [size - 10, size // 2, 20]:
+            os.truncate(path, length)
+            assert not is_current(path, data_path)
+            with pytest.raises(ValueError):
+                open_artifact(path)
+            assert ensure_artifact(data_path, path)
+            assert os.path.getsize(path) == size
+
+    def test_provenance_is_read_without_the_index(self, tmp_path, artifact_path):
+        path = str(tmp_path / "corpus.sim")
+        shutil.copy(artifact_path, path)
+        recorded = open_artifact(path).provenance
+        with open(path, "r+b") as f:
+            f.seek(-20, os.SEEK_END)
+            f.write(b"\xff" * 20)
+        assert read_provenance(path) == recorded
+
+    def test_close(self, artifact_path):
+        with open_artifact(artifact_path) as artifact:
+            total = int(artifact.weights.sum())
+            mappings = artifact.mappings()
+        assert artifact._mmap.closed
+        assert total > 0 and len(mappings) > 0
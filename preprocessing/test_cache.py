@@ -0,0 +1,68 @@
+import os
+import shutil
+import pytest
+from models.ingredient import IngredientType
+from .main import read_data
+from .cache import load_cache, VALIDATE_HASH
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    root = tmp_path / "data"
+    for folder, name in [("base", "pasta"), ("protein", "tofu"), ("topping", "capers")]:
+        os.makedirs(root / folder)
+        shutil.copy(os.path.join("./data", folder, f"{name}.json"), root / folder)
+    return str(root)
+
+
+def summarise(ingredients):
+    return [(i.get_name(), i.get_category(), i.get_id(), i.get_type(),
+             i.get_molecule_ids(), [m.get_name() for m in i.get_molecules()],
+             i.flavor_profiles) for i in ingredients]
+
+
+class TestCache:
+    def test_cache_round_trip(self, data_dir, tmp_path):
+        cache_path = str(tmp_path / "cache" / "corpus.pickle")
+        uncached = read_data(data_dir)
+        built = read_data(data_dir, cache_path)
+        assert os.path.isfile(cache_path)
+
+        loaded = read_data(data_dir, cache_path)
+        assert summarise(loaded) == summarise(uncached) == summarise(built)
+        assert {i.get_type() for i in loaded} == {IngredientType.BASE,
+                                                 IngredientType.PROTEIN,
+                                                 IngredientType.TOPPING}
+
+    def test_cache_invalidated_by_modification(self, data_dir, tmp_path):
+        cache_path = str(tmp_path / "corpus.pickle")
+        read_data(data_dir, cache_path)
+        paths = [os.path.join(r, f) for r, _, fs in os.walk(data_dir) for f in fs]
+        assert load_cache(cache_path, paths) is not None
+
+        stat = os.stat(paths[0])
+        os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert load_cache(cache_path, paths) is None
+
+    def test_cache_invalidated_by_new_file(self, data_dir, tmp_path):
+        cache_path = str(tmp_path / "corpus.pickle")
+        read_data(data_dir, cache_path)
+        shutil.copy("./data/dressing/vinegar.json", os.path.join(data_dir, "base"))
+
+        names = [i.get_name() for i in read_data(data_dir, cache_path)]
+        assert "vinegar" in names
+
+    def test_hash_validation(self, data_dir, tmp_path):
+        cache_path = str(tmp_path / "corpus.pickle")
+        read_data(data_dir, cache_path, validate=VALIDATE_HASH)
+        paths = [os.path.join(r, f) for r, _, fs in os.walk(data_dir) for f in fs]
+        assert load_cache(cache_path, paths, VALIDATE_HASH) is not None
+        # A cache validated by hash is not reused for mtime validation.
+        assert load_cache(cache_path, paths) is None
+
+    def test_rebuild_and_corrupt_cache(self, data_dir, tmp_path):
+        cache_path = str(tmp_path / "corpus.pickle")
+        with open(cache_path, "wb") as f:
+            f.write(b"not a cache")
+        assert len(read_data(data_dir, cache_path)) == 3
+        assert len(read_data(data_dir, cache_path, rebuild_cache=True)) == 3
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import pytest
+import gc
+from models.graph import BACKENDS, create_graph
+from models.molecule import registry
+from .main import read_data
+from .similarity import similarity_mappings
+from .incremental import CorpusUpdater, MoleculeIndex
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    root = tmp_path / "data"
+    for folder, name in [("base", "pasta"), ("protein", "tofu"), ("topping", "capers"),
+                         ("topping", "tomato")]:
+        os.makedirs(root / folder, exist_ok=True)
+        shutil.copy(os.path.join("./data", folder, f"{name}.json"), root / folder)
+    return str(root)
+
+
+def edge_set(graph):
+    return sorted((min(a.get_id(), b.get_id()), max(a.get_id(), b.get_id()), w)
+                  for a, b, w in graph.get_edges())
+
+
+def assert_matches_rebuild(updater, data_dir, backend):
+    rebuilt = create_graph(similarity_mappings(read_data(data_dir)), backend)
+    assert edge_set(updater.graph) == edge_set(rebuilt)
+    for node in rebuilt.get_nodes():
+        # Neighbours of equal weight may come in a different order.
+        assert [attrs["weight"] for _, attrs in updater.graph.closest_neighbors(node, 3)] == \
+            [attrs["weight"] for _, attrs in rebuilt.closest_neighbors(node, 3)]
+        assert updater.graph.get_node_by_name(node.get_name()) == node
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+class TestIncremental:
+    def test_similarity_row_matches_pairwise(self, data_dir, backend):
+        ingredients = read_data(data_dir)
+        index = MoleculeIndex(ingredients)
+        for a, b, w in similarity_mappings(ingredients):
+            assert index.similarity_row(a)[b] == w
+
+    def test_scan_reports_nothing_when_unchanged(self, data_dir, backend):
+        updater = CorpusUpdater(data_dir, backend)
+        assert updater.scan() == ([], [], [])
+
+    def test_add_file(self, data_dir, backend):
+        updater = CorpusUpdater(data_dir, backend)
+        shutil.copy("./data/protein/chicken.json", os.path.join(data_dir, "protein"))
+        added, changed, removed = updater.refresh()
+        assert [os.path.basename(p) for p in added] == ["chicken.json"]
+        assert changed == removed == []
+        assert_matches_rebuild(updater, data_dir, backend)
+        assert updater.graph.get_node_by_name("chicken") is not None
+
+    def test_remove_file(self, data_dir, backend):
+        updater = CorpusUpdater(data_dir, backend)
+        os.remove(os.path.join(data_dir, "topping", "capers.json"))
+        _, _, removed = updater.refresh()
+        assert len(removed) == 1
+        assert updater.graph.get_node_by_name("capers") is None
+        assert_matches_rebuild(updater, data_dir, backend)
+
+    def test_change_file(self, data_dir, backend):
+        updater = CorpusUpdater(data_dir, backend)
+        path = os.path.join(data_dir, "topping", "tomato.json")
+        with open(path) as f:
+            entity = json.load(f)
+        entity["molecules"] = entity["molecules"][:10]
+        with open(path, "w") as f:
+            json.dump(entity, f)
+        os.utime(path, ns=(1, 1))
+
+        _, changed, _ = updater.refresh()
+        assert changed == [path]
+        assert_matches_rebuild(updater, data_dir, backend)
+
+    def test_min_weight(self, data_dir, backend):
+        updater = CorpusUpdater(data_dir, backend, min_weight=50)
+        shutil.copy("./data/protein/chicken.json", os.path.join(data_dir, "protein"))
+        updater.refresh()
+        assert all(w >= 50 for _, _, w in updater.graph.get_edges())
+        rebuilt = create_graph(similarity_mappings(read_data(data_dir)), backend, min_weight=50)
+        assert edge_set(updater.graph) == edge_set(rebuilt)
+
+    def test_changes_release_replaced_molecules(self, data_dir, backend):
+        updater = CorpusUpdater(data_dir, backend)
+        path = os.path.join(data_dir, "topping", "tomato.json")
+        with open(path) as f:
+            entity = json.load(f)
+
+        sizes = []
+        for generation in range(3):
+            for m in entity["molecules"]:
+                m["common_name"] = f"{m['common_name']} {generation}"
+            with open(path, "w") as f:
+                json.dump(entity, f)
+            os.utime(path, ns=(generation + 1, generation + 1))
+            updater.refresh()
+            gc.collect()
+            sizes.append(len(registry))
+        assert sizes[0] == sizes[1] == sizes[2]
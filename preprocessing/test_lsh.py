@@ -0,0 +1,57 @@
+import pytest
+from typing import List
+from models.ingredient import Ingredient
+from conftest import make_ingredient
+from .main import create_mappings
+from .similarity import MoleculeIncidence
+from .lsh import minhash_signatures, candidate_pairs, approximate_mappings, measure_recall
+
+
+toy_ingredients: List[Ingredient] = [
+    make_ingredient("a", 1, list(range(0, 100))),
+    make_ingredient("b", 2, list(range(5, 105))),
+    make_ingredient("c", 3, list(range(1000, 1100))),
+    make_ingredient("d", 4, [])]
+
+
+class TestLSH:
+    def test_signatures(self):
+        incidence = MoleculeIncidence(toy_ingredients)
+        signatures = minhash_signatures(incidence, num_perm=64, seed=1)
+        assert signatures.shape == (4, 64)
+        assert (signatures == minhash_signatures(incidence, num_perm=64, seed=1)).all()
+
+        # The fraction of agreeing positions estimates the Jaccard similarity.
+        agreement = (signatures[0] == signatures[1]).mean()
+        assert agreement == pytest.approx(95 / 105, abs=0.15)
+        assert (signatures[0] == signatures[2]).mean() < 0.1
+
+    def test_candidate_pairs(self):
+        incidence = MoleculeIncidence(toy_ingredients)
+        pairs = candidate_pairs(minhash_signatures(incidence, num_perm=100), 20, 5)
+        assert pairs == {(0, 1)}
+
+    def test_ingredients_without_molecules_are_never_paired(self):
+        ingredients = toy_ingredients + [make_ingredient("e", 5, [])]
+        signatures = minhash_signatures(MoleculeIncidence(ingredients), num_perm=100)
+        assert (signatures[3] == signatures[4]).all()
+        assert candidate_pairs(signatures, 20, 5) == {(0, 1)}
+        assert approximate_mappings(ingredients) == [(ingredients[0], ingredients[1], 95)]
+
+    def test_approximate_mappings(self):
+        mappings = approximate_mappings(toy_ingredients)
+        assert mappings == [(toy_ingredients[0], toy_ingredients[1], 95)]
+
+    def test_recall_against_exact(self, sample_ingredients):
+        ingredients = sample_ingredients
+        report = measure_recall(ingredients, bands=64, rows=2, min_jaccard=0.3)
+        assert report["total_pairs"] == len(ingredients) * (len(ingredients) - 1) // 2
+        assert report["recall"] > 0.9
+        assert 0 < report["candidate_pairs"] <= report["total_pairs"]
+
+    def test_create_mappings_approximate(self, sample_mappings):
+        exact = {(a.get_id(), b.get_id()): w for a, b, w in sample_mappings}
+        approximate = create_mappings("./data", approximate=True, bands=32, rows=4)
+        assert 0 < len(approximate) < len(exact)
+        for a, b, w in approximate:
+            assert exact.get((a.get_id(), b.get_id()), exact.get((b.get_id(), a.get_id()))) == w
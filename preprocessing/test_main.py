@@ -1,7 +1,11 @@
+import os
+import shutil
 import pytest
 from typing import List, Dict
 from models.ingredient import IngredientType, Ingredient
-from .main import construct_ingredient, calculate_similarity
+from .main import (construct_ingredient, calculate_similarity, read_data,
+                   read_json, projection_fields, IngestError, create_metric_mappings)
+from .similarity import similarity_mappings
 
 test_json: Dict = {
     "category_readable": "Bakery",
@@ -11,7 +15,8 @@ test_json: Dict = {
         {
             "fooddb_flavor_profile": "new mown hay@bitter@green@sweet@tonka",
             "pubchem_id": 323,
-            "common_name": "coumarin"
+            "common_name": "coumarin",
+            "taste": "bitter undertone"
         },
         {
             "fooddb_flavor_profile": "bitter",
@@ -54,3 +59,68 @@ class TestMain:
         ing_2: Ingredient = construct_ingredient(test_json_2, "base")
 
         assert calculate_similarity(ing_1, ing_2) == 1
+
+    def test_construct_ingredient_extra_fields(self):
+        ing: Ingredient = construct_ingredient(test_json, "base", ("taste",))
+        coumarin, daidzin = ing.get_molecules()
+
+        assert coumarin.get_property("taste") == "bitter undertone"
+        assert daidzin.get_properties() == {}
+
+    def test_read_json_projection(self):
+        projected = read_json("./data/topping/capers.json", projection_fields())
+        full = read_json("./data/topping/capers.json")
+
+        assert set(projected.keys()) == {"entity_alias_readable", "category_readable",
+                                         "entity_id", "molecules"}
+        assert set(projected["molecules"][0].keys()) == {"pubchem_id", "common_name",
+                                                         "fooddb_flavor_profile"}
+        assert [m["pubchem_id"] for m in projected["molecules"]] == \
+            [m["pubchem_id"] for m in full["molecules"]]
+
+        projected = read_json("./data/topping/capers.json",
+                              projection_fields(("molecular_weight",)))
+        assert projected["molecules"][0]["molecular_weight"] == \
+            full["molecules"][0]["molecular_weight"]
+
+    def test_read_data_extra_fields(self):
+        ings = read_data("./data/dressing", extra_fields=("molecular_weight",))
+        assert len(ings) == 1
+        assert all(m.get_property("molecular_weight") is not None
+                   for m in ings[0].get_molecules())
+
+    def test_read_data_in_parallel(self, sample_ingredients):
+        serial = sample_ingredients
+        parallel = read_data("./data", workers=4)
+
+        assert [i.get_id() for i in parallel] == [i.get_id() for i in serial]
+        assert [i.get_molecule_ids() for i in parallel] == \
+            [i.get_molecule_ids() for i in serial]
+        assert [i.get_type() for i in parallel] == [i.get_type() for i in serial]
+
+    def test_read_data_in_parallel_reports_errors(self, tmp_path):
+        shutil.copytree("./data/protein", tmp_path / "protein")
+        with open(tmp_path / "protein" / "broken.json", "w") as f:
+            f.write("{not json")
+        os.makedirs(tmp_path / "unknown")
+        shutil.copy("./data/dressing/vinegar.json", tmp_path / "unknown")
+
+        errors = []
+        ings = read_data(str(tmp_path), workers=2, errors=errors)
+        assert len(ings) == len(os.listdir("./data/protein"))
+        assert sorted(os.path.basename(path) for path, _ in errors) == \
+            ["broken.json", "vinegar.json"]
+
+        with pytest.raises(IngestError) as e:
+            read_data(str(tmp_path), workers=2)
+        assert len(e.value.errors) == 2
+
+    def test_create_metric_mappings(self, sample_ingredients, sample_mappings):
+        by_metric = create_metric_mappings("./data", ["count", "overlap"])
+        count = sample_mappings
+        assert [(a.get_id(), b.get_id(), w) for a, b, w in by_metric["count"]] == \
+            [(a.get_id(), b.get_id(), w) for a, b, w in count]
+
+        overlap = similarity_mappings(sample_ingredients, metric="overlap")
+        assert [w for _, _, w in by_metric["overlap"]] == [w for _, _, w in overlap]
+        assert all(0 <= w <= 1 for _, _, w in overlap)
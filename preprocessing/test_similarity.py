@@ -0,0 +1,73 @@
+import itertools
+import math
+import pytest
+from typing import List
+from models.ingredient import Ingredient
+from conftest import make_ingredient
+from .main import calculate_similarity
+from .similarity import (MoleculeIncidence, pairwise_shared_molecules, combined_weights,
+                         similarity_mappings, metric_weights, METRICS)
+
+
+toy_ingredients: List[Ingredient] = [
+    make_ingredient("a", 1, [1, 2, 3, 4]),
+    make_ingredient("b", 2, [2, 3, 5]),
+    make_ingredient("c", 3, [6]),
+    make_ingredient("d", 4, [1, 2, 3, 5, 5])]
+
+
+class TestSimilarity:
+    def test_incidence_counts(self):
+        incidence = MoleculeIncidence(toy_ingredients)
+        assert incidence.shape() == (4, 6)
+        assert incidence.molecule_counts().tolist() == [4, 3, 1, 4]
+        assert incidence.document_frequencies().tolist() == [2, 3, 3, 1, 2, 1]
+
+    def test_pairwise_matches_calculate_similarity(self):
+        counts = pairwise_shared_molecules(toy_ingredients)
+        for (i, a), (j, b) in itertools.combinations(enumerate(toy_ingredients), 2):
+            assert counts[i, j] == calculate_similarity(a, b)
+            assert counts[j, i] == counts[i, j]
+
+    def test_mappings_match_pairwise_loop(self):
+        expected = [(a, b, calculate_similarity(a, b))
+                    for a, b in itertools.combinations(toy_ingredients, 2)]
+        expected.sort(key=lambda tup: tup[2], reverse=True)
+        assert similarity_mappings(toy_ingredients) == expected
+
+    def test_handles_no_shared_molecules(self):
+        ings = [make_ingredient("x", 1, [1]), make_ingredient("y", 2, [2])]
+        assert similarity_mappings(ings) == [(ings[0], ings[1], 0)]
+
+    def test_flavor_weight(self):
+        counts = pairwise_shared_molecules(toy_ingredients)
+        weights = combined_weights(toy_ingredients, molecule_weight=1, flavor_weight=10)
+        # The sample ingredients all share the same flavor profile.
+        assert weights[0, 1] == pytest.approx(counts[0, 1] + 10)
+
+        flavor_only = similarity_mappings(toy_ingredients, molecule_weight=0,
+                                          flavor_weight=1)
+        assert all(w == pytest.approx(1) for _, _, w in flavor_only)
+
+    def test_metrics_match_set_formulas(self):
+        matrices = metric_weights(toy_ingredients)
+        assert set(matrices) == set(METRICS)
+        sets = [set(i.get_molecule_ids()) for i in toy_ingredients]
+        frequencies = {m: sum(m in s for s in sets) for m in set.union(*sets)}
+        n = len(sets)
+        for (i, a), (j, b) in itertools.combinations(enumerate(sets), 2):
+            shared = a & b
+            assert matrices["count"][i, j] == len(shared)
+            assert matrices["jaccard"][i, j] == pytest.approx(len(shared) / len(a | b))
+            assert matrices["overlap"][i, j] == pytest.approx(len(shared) / min(len(a), len(b)))
+            assert matrices["idf"][i, j] == pytest.approx(
+                sum(math.log(n / frequencies[m]) for m in shared), rel=1e-6)
+
+    def test_metric_flows_into_mappings(self):
+        jaccard = similarity_mappings(toy_ingredients, metric="jaccard")
+        assert all(0 <= w <= 1 for _, _, w in jaccard)
+        assert [w for _, _, w in jaccard] == sorted((w for _, _, w in jaccard), reverse=True)
+        # b and d share three of their four molecules, more than any other pair.
+        assert {jaccard[0][0].get_name(), jaccard[0][1].get_name()} == {"b", "d"}
+        with pytest.raises(AssertionError):
+            metric_weights(toy_ingredients, ["cosine"])
@@ -0,0 +1,65 @@
+import csv
+import itertools
+import numpy as np
+import pytest
+from .main import stream_mappings
+from .similarity import pairwise_shared_molecules
+from .stream import (iter_mappings, top_k_mappings, top_k_per_ingredient, write_csv,
+                     write_binary, read_binary)
+
+
+def summarise(mappings):
+    return [(a.get_id(), b.get_id(), w) for a, b, w in mappings]
+
+
+def stream(ingredients):
+    return iter_mappings(ingredients, pairwise_shared_molecules(ingredients))
+
+
+class TestStream:
+    def test_iter_mappings_yields_every_pair(self, sample_ingredients, sample_mappings):
+        weights = pairwise_shared_molecules(sample_ingredients)
+        streamed = iter_mappings(sample_ingredients, weights)
+        assert not isinstance(streamed, list)
+        assert summarise(streamed) == \
+            [(a.get_id(), b.get_id(), int(weights[i, j]))
+             for (i, a), (j, b) in itertools.combinations(enumerate(sample_ingredients), 2)]
+        assert sorted(summarise(stream(sample_ingredients))) == \
+            sorted(summarise(sample_mappings))
+
+    def test_stream_mappings(self, sample_mappings):
+        top = list(stream_mappings("./data", top_k=10))
+        assert [w for _, _, w in top] == [w for _, _, w in sample_mappings[:10]]
+        per_ingredient = list(stream_mappings("./data", top_k=3, per_ingredient=True))
+        assert len(set((a, b) for a, b, _ in per_ingredient)) == len(per_ingredient)
+
+    def test_global_top_k(self, sample_ingredients, sample_mappings):
+        expected = [w for _, _, w in sample_mappings[:10]]
+        top = top_k_mappings(stream(sample_ingredients), 10)
+        assert [w for _, _, w in top] == expected
+        assert top_k_mappings([], 3) == []
+        with pytest.raises(AssertionError):
+            top_k_mappings(stream(sample_ingredients), 0)
+        with pytest.raises(AssertionError):
+            top_k_per_ingredient(stream(sample_ingredients), -1)
+
+    def test_per_ingredient_top_k(self, sample_ingredients, sample_mappings):
+        strongest = top_k_per_ingredient(stream(sample_ingredients), 3)
+        for ing in sample_ingredients:
+            own = [w for a, b, w in sample_mappings if ing in (a, b)]
+            assert [w for _, _, w in strongest[ing]] == sorted(own, reverse=True)[:3]
+
+    def test_writers(self, tmp_path, sample_ingredients):
+        mappings = top_k_mappings(stream(sample_ingredients), 25)
+        csv_path, bin_path = str(tmp_path / "m.csv"), str(tmp_path / "m.bin")
+        assert write_csv(csv_path, iter(mappings), chunk_size=7) == 25
+        assert write_binary(bin_path, iter(mappings), chunk_size=7) == 25
+
+        with open(csv_path) as f:
+            rows = list(csv.DictReader(f))
+        assert [(int(r["id_a"]), int(r["id_b"]), int(r["weight"])) for r in rows] == \
+            summarise(mappings)
+
+        records = read_binary(bin_path)
+        assert records["a"].tolist() == [a.get_id() for a, _, _ in mappings]
+        assert np.array_equal(records["weight"], [w for _, _, w in mappings])
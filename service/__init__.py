@@ -0,0 +1,24 @@
+import sys
+sys.path.append("..")
+import argparse
+import asyncio
+from models.graph import Graph
+from preprocessing.main import create_mappings
+from service.server import RecommendationService
+
+CACHE_PATH = "../.cache/corpus.pickle"
+
+async def serve(host: str, port: int):
+    service = RecommendationService(Graph(create_mappings("../data", CACHE_PATH)))
+    server = await service.start(host, port)
+    print(f"Serving salad recommendations on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves salad recommendations over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port))
@@ -0,0 +1,343 @@
+""" A long-running HTTP/JSON recommendation service built on asyncio and the
+standard library only.
+
+The corpus and ingredient graph are loaded once when the service starts and
+kept in memory. Ranking and salad generation run on a thread pool so that the
+event loop keeps accepting and answering other clients while they work.
+
+Routes:
+
+* GET  /neighbors?name=spinach&count=5&type=base
+* GET  /explain?a=spinach&b=tomato  the molecules shared by two ingredients
+* GET  /ingredients?molecule=323 or ?flavor=green&top=1
+* POST /candidates  {"composition": ["spinach", "chicken"], "count": 10}
+* POST /salad       {"start": "spinach", "method": "greedy", "top_k": 3, "seed": 1};
+                    the beam and exact methods take top_n, beam_width,
+                    max_nodes and time_limit, see SEARCH_DEFAULTS
+* GET  /metrics     request latency percentiles per route, and the stage
+                    timings and call counters when instrumentation is
+                    enabled; ?format=prometheus answers in the Prometheus
+                    text exposition format
+* GET  /health
+"""
+import sys
+sys.path.append("..")
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+from models.ingredient import IngredientType, Ingredient
+from models.graph import Graph
+from models.index import IngredientIndex
+from instrumentation.metrics import metrics as instrumentation
+from traversal.traverser import Traverser, TopKChooser, greedy_chooser
+
+# Largest request body accepted, in bytes.
+MAX_BODY_SIZE: int = 1 << 20
+
+# The search options applied when a /salad request does not supply them, and
+# the largest values a request may ask for. A search always runs with a node
+# and time budget, so no request can hold a worker thread indefinitely.
+SEARCH_DEFAULTS: Dict[str, float] = {"top_n": 1, "beam_width": 50, "max_nodes": 100000,
+                                     "time_limit": 2.0}
+SEARCH_MAXIMUMS: Dict[str, float] = {"top_n": 20, "beam_width": 500, "max_nodes": 1000000,
+                                     "time_limit": 10.0}
+
+# The latency bucket of requests which matched no route.
+UNMATCHED_ROUTE: str = "unmatched"
+
+STATUS_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                  405: "Method Not Allowed", 413: "Payload Too Large",
+                  500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """ Raised by a route handler to answer with an error status.
+    """
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LatencyRecorder:
+    """ Keeps the most recent request latencies of each route and reports
+    their percentiles.
+    """
+    def __init__(self, window: int = 10000):
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def record(self, route: str, seconds: float):
+        self.samples.setdefault(route, deque(maxlen=self.window)).append(seconds)
+        self.counts[route] = self.counts.get(route, 0) + 1
+
+    def percentiles(self, quantiles: Tuple[float, ...] = (50, 90, 99)) -> Dict[str, Dict]:
+        """ Returns, for every route, the number of requests served and the
+        requested latency percentiles in milliseconds, using the nearest-rank
+        method over the recorded window.
+        """
+        report = {}
+        for route, samples in self.samples.items():
+            ordered = sorted(samples)
+            stats: Dict[str, Any] = {"count": self.counts[route]}
+            for q in quantiles:
+                rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+                stats[f"p{q:g}_ms"] = ordered[rank] * 1000
+            report[route] = stats
+        return report
+
+
+def _ingredient_json(ingredient: Ingredient) -> Dict:
+    return {"name": ingredient.get_name(), "type": ingredient.get_type().value}
+
+
+def _parse_limits(limits: Dict) -> Dict[IngredientType, Tuple[int, int]]:
+    try:
+        return {IngredientType(t): (int(r[0]), int(r[1])) for t, r in limits.items()}
+    except (ValueError, TypeError, IndexError, AttributeError):
+        raise HTTPError(400, "limits must map ingredient types to [min, max]")
+
+
+class RecommendationService:
+    """ Answers recommendation requests against an in-memory ingredient graph.
+    """
+    def __init__(self, graph: Graph, executor: Executor = None,
+                 search_maximums: Dict[str, float] = None):
+        self.graph = graph
+        self.search_maximums = dict(SEARCH_MAXIMUMS, **(search_maximums or {}))
+        self.executor = executor if executor is not None else ThreadPoolExecutor()
+        self.latencies = LatencyRecorder()
+        self.index = IngredientIndex(graph.get_nodes())
+        self.routes = {
+            ("GET", "/neighbors"): self.neighbors,
+            ("GET", "/explain"): self.explain,
+            ("GET", "/ingredients"): self.ingredients,
+            ("POST", "/candidates"): self.candidates,
+            ("POST", "/salad"): self.salad,
+            ("GET", "/metrics"): self.metrics,
+            ("GET", "/health"): self.health,
+        }
+
+    def _node(self, name: Any) -> Ingredient:
+        node = self.graph.get_node_by_name(str(name).lower()) if name is not None else None
+        if node is None:
+            raise HTTPError(404, f"unknown ingredient {name}")
+        return node
+
+    def _traverser(self, body: Dict) -> Traverser:
+        limits = _parse_limits(body["limits"]) if "limits" in body else None
+        traverser = Traverser(self.graph, limits)
+        composition = body.get("composition", [])
+        if not isinstance(composition, list):
+            raise HTTPError(400, "composition must be a list of ingredient names")
+        for name in composition:
+            traverser.add_ingredient_to_composition(self._node(name))
+        traverser._pop_used_ingredients()
+        return traverser
+
+    def _search_options(self, body: Dict) -> Dict[str, float]:
+        """ Returns the search options of a request, with defaults for those
+        missing and every value clamped to the configured maximum.
+        """
+        options = {}
+        for key, default in SEARCH_DEFAULTS.items():
+            value = type(default)(body.get(key, default))
+            if value <= 0:
+                raise HTTPError(400, f"{key} must be positive")
+            options[key] = min(value, type(default)(self.search_maximums[key]))
+        return options
+
+    async def neighbors(self, query: Dict, body: Dict) -> Dict:
+        node = self._node(query.get("name"))
+        try:
+            count = int(query.get("count", 10))
+            ingredient_type = IngredientType(query["type"]) if "type" in query else None
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        neighbors = self.graph.closest_neighbors(node, count, ingredient_type)
+        return {"name": node.get_name(),
+                "neighbors": [dict(_ingredient_json(n), weight=attrs["weight"])
+                              for n, attrs in neighbors]}
+
+    async def explain(self, query: Dict, body: Dict) -> Dict:
+        node_a, node_b = self._node(query.get("a")), self._node(query.get("b"))
+        molecules = self.index.explain(node_a, node_b)
+        return {"a": node_a.get_name(), "b": node_b.get_name(), "count": len(molecules),
+                "molecules": [{"pubchem_id": m.get_pubchem_id(), "name": m.get_name(),
+                               "flavor_profiles": list(m.get_flavor_profiles())}
+                              for m in molecules]}
+
+    async def ingredients(self, query: Dict, body: Dict) -> Dict:
+        if "molecule" in query:
+            found = self.index.ingredients_with_molecule(int(query["molecule"]))
+        elif "flavor" in query:
+            found = self.index.ingredients_with_flavor(query["flavor"],
+                                                       top=query.get("top") in ("1", "true"))
+        else:
+            raise HTTPError(400, "a molecule or flavor must be supplied")
+        return {"ingredients": [_ingredient_json(i) for i in found]}
+
+    async def candidates(self, query: Dict, body: Dict) -> Dict:
+        traverser = self._traverser(body)
+        count = int(body.get("count", 10))
+        ranked = await asyncio.get_running_loop().run_in_executor(
+            self.executor, traverser._get_next_candidates)
+        return {"composition": [i.get_name() for i in traverser.get_composition()],
+                "candidates": [dict(_ingredient_json(c), strength=s) for c, s in ranked[:count]]}
+
+    async def salad(self, query: Dict, body: Dict) -> Dict:
+        traverser = self._traverser(body)
+        start = self._node(body["start"]) if body.get("start") is not None else None
+        method = body.get("method", "greedy")
+        loop = asyncio.get_running_loop()
+
+        if method in ("beam", "exact"):
+            if start is not None:
+                traverser.add_ingredient_to_composition(start)
+                traverser._pop_used_ingredients()
+            options = self._search_options(body)
+            top_n = options.pop("top_n")
+            if method == "exact":
+                del options["beam_width"]
+            result = await loop.run_in_executor(
+                self.executor, lambda: traverser.search(top_n, method, **options))
+            return {"salads": [{"score": score, "composition": [_ingredient_json(i) for i in c]}
+                               for score, c in result.compositions],
+                    "nodes_explored": result.nodes_explored,
+                    "exhaustive": result.exhaustive}
+
+        if method == "greedy":
+            chooser = greedy_chooser
+        elif method == "top_k":
+            k = int(body.get("top_k", 3))
+            if k <= 0:
+                raise HTTPError(400, "top_k must be positive")
+            chooser = TopKChooser(k, body.get("seed"))
+        else:
+            raise HTTPError(400, f"unknown method {method}")
+        composition = await loop.run_in_executor(self.executor, traverser.generate,
+                                                 chooser, start)
+        return {"salads": [{"composition": [_ingredient_json(i) for i in composition]}]}
+
+    async def metrics(self, query: Dict, body: Dict) -> Any:
+        if query.get("format") == "prometheus":
+            return instrumentation.to_prometheus()
+        document = {"latency": self.latencies.percentiles()}
+        if instrumentation.enabled:
+            document["instrumentation"] = instrumentation.report()
+        return document
+
+    async def health(self, query: Dict, body: Dict) -> Dict:
+        return {"status": "ok", "ingredients": len(self.graph.get_nodes())}
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        """ Routes one request to its handler and returns the response status
+        and JSON document.
+        """
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return 405, {"error": f"{method} not allowed on {url.path}"}
+            return 404, {"error": f"no route for {url.path}"}
+
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            document = json.loads(body) if body else {}
+            if not isinstance(document, dict):
+                raise HTTPError(400, "request body must be a JSON object")
+            return 200, await handler(query, document)
+        except json.JSONDecodeError as e:
+            return 400, {"error": f"invalid JSON: {e}"}
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {"error": f"bad request: {e}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter):
+        """ Serves the requests sent over one connection until the client
+        closes it or asks for it to be closed.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                started = time.perf_counter()
+                try:
+                    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "malformed request line"}, True)
+                    break
+
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                close = headers.get("connection", "").lower() == "close"
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "invalid Content-Length"}, True)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {"error": "request body too large"}, True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, document = await self.dispatch(method, target, body)
+                except Exception as e:
+                    status, document = 500, {"error": f"{type(e).__name__}: {e}"}
+                await self._respond(writer, status, document, close)
+                self.latencies.record(self._route_name(method, target),
+                                      time.perf_counter() - started)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def _route_name(self, method: str, target: str) -> str:
+        # Latencies are only kept per known route, so that requests for
+        # arbitrary paths cannot grow the recorder.
+        path = urlsplit(target).path
+        return f"{method} {path}" if (method, path) in self.routes else UNMATCHED_ROUTE
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, document: Any,
+                       close: bool):
+        # Handlers answer with a JSON document, or with plain text as a string.
+        if isinstance(document, str):
+            payload = document.encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        else:
+            payload = json.dumps(document).encode("utf-8")
+            content_type = "application/json"
+        head = (f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        """ Starts listening for connections and returns the asyncio server.
+        """
+        return await asyncio.start_server(self.handle_connection, host, port)
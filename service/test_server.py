@@ -0,0 +1,141 @@
+import asyncio
+import json
+import pytest
+from traversal.traverser import Traverser, greedy_chooser
+from .server import RecommendationService, LatencyRecorder
+
+async def request(port, method, target, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode()
+                 + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(content)
+
+def serve(service, *requests):
+    async def run():
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(*(request(port, *r) for r in requests))
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(run())
+
+class TestServer:
+    @pytest.fixture
+    def G(self, sample_graph):
+        return sample_graph
+
+    def test_neighbors(self, G):
+        service = RecommendationService(G)
+        [(status, body)] = serve(service, ("GET", "/neighbors?name=spinach&count=3&type=base"))
+        assert status == 200
+        spinach = G.get_node_by_name("spinach")
+        expected = G.closest_neighbors(spinach, 3, spinach.get_type())
+        assert [n["name"] for n in body["neighbors"]] == [n.get_name() for n, _ in expected]
+
+    def test_explain_and_ingredients(self, G):
+        service = RecommendationService(G)
+        (status, explained), (_, by_molecule), (_, by_flavor), (missing, _) = serve(
+            service, ("GET", "/explain?a=spinach&b=tomato"),
+            ("GET", "/ingredients?molecule=323"),
+            ("GET", "/ingredients?flavor=green&top=1"),
+            ("GET", "/ingredients"))
+        assert status == 200
+        assert explained["count"] == G.get_weight_between("spinach", "tomato")
+        assert len(explained["molecules"]) == explained["count"]
+        assert all(323 in G.get_node_by_name(i["name"]).get_molecule_ids()
+                   for i in by_molecule["ingredients"])
+        assert len(by_flavor["ingredients"]) > 0
+        assert missing == 400
+
+    def test_candidates_and_salad(self, G):
+        service = RecommendationService(G)
+        (status, candidates), (_, greedy), (_, exact) = serve(
+            service,
+            ("POST", "/candidates", {"composition": ["spinach", "chicken"], "count": 5}),
+            ("POST", "/salad", {"start": "spinach"}),
+            ("POST", "/salad", {"method": "exact", "top_n": 1, "limits": {
+                "base": [1, 1], "topping": [1, 1], "protein": [1, 1], "dressing": [0, 0]}}))
+        assert status == 200
+        assert len(candidates["candidates"]) == 5
+
+        expected = Traverser(G).generate(greedy_chooser, G.get_node_by_name("spinach"))
+        assert [i["name"] for i in greedy["salads"][0]["composition"]] == \
+            [i.get_name() for i in expected]
+        assert exact["exhaustive"] is True
+        assert len(exact["salads"][0]["composition"]) == 3
+
+    def test_errors(self, G):
+        service = RecommendationService(G)
+        responses = serve(service,
+                          ("GET", "/neighbors?name=not-an-ingredient"),
+                          ("GET", "/unknown"),
+                          ("GET", "/salad"),
+                          ("POST", "/salad", {"method": "sideways"}),
+                          ("POST", "/salad", {"method": "top_k", "top_k": 0}))
+        assert [status for status, _ in responses] == [404, 404, 405, 400, 400]
+        assert responses[-1][1] == {"error": "top_k must be positive"}
+
+    def test_concurrent_requests_and_metrics(self, G):
+        service = RecommendationService(G)
+        responses = serve(service, *[("POST", "/salad", {"method": "top_k", "seed": i})
+                                     for i in range(20)])
+        assert all(status == 200 for status, _ in responses)
+
+        [(status, metrics)] = serve(service, ("GET", "/metrics"))
+        latency = metrics["latency"]["POST /salad"]
+        assert latency["count"] == 20
+        assert 0 < latency["p50_ms"] <= latency["p90_ms"] <= latency["p99_ms"]
+
+    def test_latency_percentiles(self):
+        recorder = LatencyRecorder()
+        for ms in range(1, 101):
+            recorder.record("GET /health", ms / 1000)
+        stats = recorder.percentiles()["GET /health"]
+        assert stats["p50_ms"] == pytest.approx(50)
+        assert stats["p99_ms"] == pytest.approx(99)
+
+    def test_prometheus_metrics(self, G):
+        service = RecommendationService(G)
+        status, text = asyncio.run(service.dispatch("GET", "/metrics?format=prometheus", b""))
+        assert status == 200
+        assert "# TYPE salad_calls_total counter" in text
+
+    def test_search_budget_is_clamped(self, G):
+        service = RecommendationService(G, search_maximums={"max_nodes": 40})
+        (status, exact), (bad, _) = serve(
+            service, ("POST", "/salad", {"method": "exact", "max_nodes": 10 ** 9}),
+            ("POST", "/salad", {"method": "beam", "top_n": 0}))
+        assert status == 200
+        assert exact["nodes_explored"] <= 40 and exact["exhaustive"] is False
+        assert bad == 400
+
+    def test_unmatched_routes_and_bad_content_length(self, G):
+        service = RecommendationService(G)
+        serve(service, *[("GET", f"/missing/{i}") for i in range(5)])
+        assert set(service.latencies.percentiles()) == {"unmatched"}
+
+        async def send(port, length):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"POST /salad HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return int(response.split(b" ")[1])
+
+        async def run():
+            server = await service.start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                return [await send(port, length) for length in ("-1", "ten")]
+            finally:
+                server.close()
+                await server.wait_closed()
+        assert asyncio.run(run()) == [400, 400]
@@ -1,11 +1,41 @@
 import sys
 sys.path.append("..")
+import argparse
 from models.ingredient import Ingredient, IngredientType
 from models.graph import Graph
-from preprocessing.main import create_mappings
+from preprocessing.main import create_mappings, read_data
 from traversal.traverser import Traverser
+from instrumentation.metrics import metrics
+
+CACHE_PATH = "../.cache/corpus.pickle"
 
 if __name__ == "__main__":
-    mappings = create_mappings("../data")
+    parser = argparse.ArgumentParser(description="Builds a salad interactively.")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="parse the JSON data files again instead of using the corpus cache")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="while waiting for a choice, rank the next step for the top N "
+                             "choices in the background")
+    parser.add_argument("--metrics-output", default=None,
+                        help="record stage timings and write them to this file on exit, "
+                             "in Prometheus text format if it ends in .prom, otherwise JSON")
+    parser.add_argument("--metrics-memory", action="store_true",
+                        help="also record the peak memory of each stage")
+    args = parser.parse_args()
+
+    if args.metrics_output is not None:
+        metrics.enable(memory=args.metrics_memory)
+
+    if args.rebuild_cache:
+        read_data("../data", CACHE_PATH, rebuild_cache=True)
+
+    mappings = create_mappings("../data", CACHE_PATH)
     g = Graph(mappings)
-    t = Traverser(g)
+    t = Traverser(g, prefetch=args.prefetch)
+    try:
+        t.start_traversal()
+    finally:
+        if args.metrics_output is not None:
+            with open(args.metrics_output, "w") as f:
+                f.write(metrics.to_prometheus() if args.metrics_output.endswith(".prom")
+                        else metrics.to_json())
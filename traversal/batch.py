@@ -0,0 +1,95 @@
+""" Generates salads in bulk by running headless traversals from every start
+ingredient under every supplied set of composition limits, spread across a
+pool of worker processes.
+
+Each worker builds the ingredient graph once when it starts and reuses it
+for every traversal it is given. If a similarity artifact is supplied, the
+workers map it read-only instead, so they share one copy of the weights.
+"""
+import sys
+sys.path.append("..")
+import argparse
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+from models.ingredient import IngredientType
+from models.graph import Graph
+from preprocessing.main import create_mappings, read_data
+from preprocessing.artifact import open_artifact, ensure_artifact, is_current
+from traversal.traverser import Traverser, Chooser, greedy_chooser
+
+Limits = Dict[IngredientType, Tuple[int, int]]
+
+class BatchResult(NamedTuple):
+    """ The salad generated from one start ingredient under one set of limits,
+    identified by its index in the supplied limits configurations.
+    """
+    start: str
+    limits_index: int
+    composition: List[str]
+
+# The graph shared by every traversal run within a worker process.
+_worker_graph: Graph = None
+
+def _init_worker(data_path: str, cache_path: str, artifact_path: str):
+    global _worker_graph
+    if artifact_path is not None:
+        _worker_graph = open_artifact(artifact_path).graph("array")
+    else:
+        _worker_graph = Graph(create_mappings(data_path, cache_path))
+
+def _run_traversal(task: Tuple[str, int, Limits, Chooser]) -> BatchResult:
+    start_name, limits_index, limits, chooser = task
+    traverser = Traverser(_worker_graph, limits)
+    composition = traverser.generate(chooser, _worker_graph.get_node_by_name(start_name))
+    return BatchResult(start_name, limits_index, [i.get_name() for i in composition])
+
+def run_batch(data_path: str, limits_configs: Sequence[Limits] = None,
+              start_names: Sequence[str] = None, chooser: Chooser = greedy_chooser,
+              workers: int = None, cache_path: str = None,
+              artifact_path: str = None) -> List[BatchResult]:
+    """ Runs a headless traversal for every combination of start ingredient and
+    limits configuration, and returns the results in that order. By default
+    every ingredient in the corpus is used as a start, under the default
+    Traverser limits. The chooser must be picklable, such as greedy_chooser or
+    a TopKChooser; every traversal starts from its own copy of it. If an
+    artifact_path is given, the workers open that similarity artifact instead
+    of computing the mappings themselves. A ValueError is raised if the
+    artifact was not built from the corpus currently under data_path.
+    """
+    if artifact_path is not None and not is_current(artifact_path, data_path):
+        raise ValueError(f"{artifact_path} is missing or out of date for {data_path}; "
+                         f"rebuild it with ensure_artifact")
+    if limits_configs is None:
+        limits_configs = [Traverser.salad_composition_limits]
+    if start_names is None:
+        start_names = [i.get_name() for i in read_data(data_path, cache_path)]
+
+    tasks = [(name, idx, limits, chooser) for name, (idx, limits)
+             in itertools.product(start_names, enumerate(limits_configs))]
+    chunksize = max(1, len(tasks) // ((workers or 1) * 4))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(data_path, cache_path, artifact_path)) as executor:
+        return list(executor.map(_run_traversal, tasks, chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generates a greedy salad from every start ingredient.")
+    parser.add_argument("--data", default="../data")
+    parser.add_argument("--cache", default="../.cache/corpus.pickle")
+    parser.add_argument("--artifact", default=None,
+                        help="similarity artifact to map in every worker, built if missing "
+                             "or out of date")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="catalog.json")
+    args = parser.parse_args()
+
+    if args.artifact is not None:
+        ensure_artifact(args.data, args.artifact, args.cache)
+    results = run_batch(args.data, workers=args.workers, cache_path=args.cache,
+                        artifact_path=args.artifact)
+    with open(args.output, "w") as f:
+        json.dump([r._asdict() for r in results], f, indent=2)
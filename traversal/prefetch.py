@@ -0,0 +1,80 @@
+""" Speculatively computes the next candidate rankings of an interactive
+traversal while the user is still choosing.
+
+While the choices are displayed and the traversal waits for input, the
+ranking that would follow each of the top few choices is computed on a
+background thread. If the user picks one of them, its ranking is already
+available and is shown straight away. Every other speculation is cancelled:
+those not yet started never run, and those running stop at their next check
+of the cancellation flag. Their results are discarded either way.
+
+A cancelled speculation may still be running while the traversal moves on,
+so speculations never read the traverser's live state. They are given a
+snapshot of it, taken on the calling thread when they are started.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from models.ingredient import Ingredient
+
+# The state following a choice: the running strengths of the remaining
+# candidates and their ranking, or None if the speculation was cancelled.
+Speculation = Optional[Tuple[Dict[Ingredient, float], List[Tuple[Ingredient, float]]]]
+
+
+class Prefetch:
+    """ The speculations started for one set of displayed choices.
+    """
+    def __init__(self, speculations: Dict[Ingredient, Tuple[Future, threading.Event]]):
+        self._speculations = speculations
+
+    def take(self, ingredient: Ingredient) -> Speculation:
+        """ Returns the speculation for the chosen ingredient, waiting for it
+        to finish if it is still running, and cancels all the others. Returns
+        None if the ingredient was not speculated on.
+        """
+        chosen = self._speculations.pop(ingredient, None)
+        self.cancel()
+        if chosen is None:
+            return None
+        return chosen[0].result()
+
+    def cancel(self):
+        """ Cancels and discards every remaining speculation.
+        """
+        for future, cancelled in self._speculations.values():
+            cancelled.set()
+            future.cancel()
+        self._speculations.clear()
+
+
+class Prefetcher:
+    """ Runs speculations for the top choices on a pool of background threads,
+    created when first needed.
+    """
+    def __init__(self, count: int):
+        assert count > 0, "count must be positive"
+        self.count = count
+        self._executor: ThreadPoolExecutor = None
+
+    def start(self, choices: List[Ingredient], snapshot: Any,
+              speculate: Callable[[Ingredient, Any, threading.Event], Speculation]) -> Prefetch:
+        """ Starts speculating on the first count choices, in order, and
+        returns the handle through which the chosen one is collected. Every
+        speculation is given the same snapshot, which must not be changed
+        while any of them runs.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.count,
+                                                thread_name_prefix="prefetch")
+        speculations = {}
+        for ing in choices[:self.count]:
+            cancelled = threading.Event()
+            speculations[ing] = (self._executor.submit(speculate, ing, snapshot, cancelled),
+                                 cancelled)
+        return Prefetch(speculations)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
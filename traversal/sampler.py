@@ -0,0 +1,142 @@
+""" Draws many salad compositions at once by sampling from the pairing weight
+matrix, rather than running one Traverser per salad.
+
+Every salad in a batch is a row of the same arrays: the running strengths of
+its candidates, a mask of the candidates it may still take, and its count of
+each ingredient type. At every step each row takes one more ingredient, so a
+whole batch advances in a handful of array operations per step.
+
+Strengths follow the Traverser: the weight of a candidate to the ingredient
+added at position p counts 2 ** p times. A candidate is allowed while its type
+is below the maximum of the composition limits, and a salad is complete once
+no candidate is allowed. Among the allowed candidates, the next ingredient is
+drawn with probability proportional to exp(s / (s_max * temperature)), where
+s_max is the strength of the strongest allowed candidate of that salad, using
+the Gumbel-max trick. A lower temperature favours the strongest candidates
+more, and a temperature of 0 always takes the strongest, like greedy_chooser.
+
+Usage, from the repository root:
+
+    python -m traversal.sampler --count 100000 --temperature 0.25 --seed 1
+"""
+import sys
+sys.path.append("..")
+import argparse
+import time
+from typing import Iterator, List
+import numpy as np
+from models.ingredient import IngredientType, Ingredient
+from models.graph import Graph
+from traversal.traverser import Traverser
+
+
+class SaladSampler:
+    """ Samples salad compositions from a graph of either backend under a set
+    of composition limits, by default those of the Traverser. The random
+    number generator is seeded so that samples can be reproduced.
+    """
+    def __init__(self, graph: Graph, limits=None, temperature: float = 0.25,
+                 seed: int = None):
+        assert temperature >= 0, "temperature must not be negative"
+        limits = limits or Traverser.salad_composition_limits
+
+        self.nodes: List[Ingredient] = graph.get_nodes()
+        self.weights = np.asarray(graph.to_numpy(), dtype=np.float64)
+        self.temperature = temperature
+        self.rng = np.random.RandomState(seed)
+        self._index = {n: i for i, n in enumerate(self.nodes)}
+
+        types = list(IngredientType)
+        self._node_types = np.array([types.index(n.get_type()) for n in self.nodes],
+                                    dtype=np.int64)
+        # Types missing from the limits are never allowed, as in the Traverser.
+        self._maximums = np.array([limits[t][1] if t in limits else 0 for t in types],
+                                  dtype=np.int64)
+        available = np.bincount(self._node_types, minlength=len(types))
+        self.max_length = int(np.minimum(self._maximums, available).sum())
+
+    def sample_indices(self, count: int, start: Ingredient = None) -> np.ndarray:
+        """ Samples count salads and returns them as a count x max_length
+        array of node indices, in the order they were added, padded with -1
+        after the end of shorter salads. If start is given, every salad
+        begins with it.
+        """
+        n = len(self.nodes)
+        rows = np.arange(count)
+        compositions = np.full((count, self.max_length), -1, dtype=np.int64)
+        strengths = np.zeros((count, n))
+        available = np.ones((count, n), dtype=bool)
+        type_counts = np.zeros((count, len(self._maximums)), dtype=np.int64)
+
+        def add(rows: np.ndarray, cols: np.ndarray, step: int):
+            compositions[rows, step] = cols
+            available[rows, cols] = False
+            type_counts[rows, self._node_types[cols]] += 1
+            strengths[rows] += self.weights[cols] * 2.0 ** step
+
+        first = 0
+        if start is not None:
+            add(rows, np.full(count, self._index[start]), 0)
+            first = 1
+
+        for step in range(first, self.max_length):
+            allowed = available & (type_counts < self._maximums)[:, self._node_types]
+            active = allowed.any(axis=1)
+            if not active.any():
+                break
+            scores = np.where(allowed, strengths, -np.inf)
+            if self.temperature > 0:
+                peak = scores.max(axis=1, keepdims=True)
+                scores = scores / (np.where(peak > 0, peak, 1) * self.temperature)
+                scores += self.rng.gumbel(size=scores.shape)
+            choices = np.argmax(scores, axis=1)
+            add(rows[active], choices[active], step)
+        return compositions
+
+    def sample(self, count: int, start: Ingredient = None) -> List[List[Ingredient]]:
+        """ Samples count salads and returns each as a list of ingredients, in
+        the order they were added.
+        """
+        return [[self.nodes[i] for i in row if i >= 0]
+                for row in self.sample_indices(count, start).tolist()]
+
+    def sample_batches(self, count: int, batch_size: int = 10000,
+                       start: Ingredient = None) -> Iterator[np.ndarray]:
+        """ Samples count salads in batches of at most batch_size, yielding the
+        node indices of each batch as returned by sample_indices. Memory use is
+        bounded by the batch size rather than the count.
+        """
+        assert batch_size > 0, "batch_size must be positive"
+        for offset in range(0, count, batch_size):
+            yield self.sample_indices(min(batch_size, count - offset), start)
+
+
+def throughput(sampler: SaladSampler, count: int, batch_size: int = 10000) -> float:
+    """ Samples count salads in batches and returns the rate in salads per
+    second.
+    """
+    started = time.perf_counter()
+    for _ in sampler.sample_batches(count, batch_size):
+        pass
+    return count / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    from models.graph import create_graph
+    from preprocessing.main import create_mappings
+
+    parser = argparse.ArgumentParser(description="Samples salads in bulk and reports throughput.")
+    parser.add_argument("--data", default="./data")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--temperature", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--show", type=int, default=5, help="number of salads to print")
+    args = parser.parse_args()
+
+    sampler = SaladSampler(create_graph(create_mappings(args.data), "array"),
+                           temperature=args.temperature, seed=args.seed)
+    for salad in sampler.sample(args.show):
+        print(", ".join(i.get_name() for i in salad))
+    rate = throughput(sampler, args.count, args.batch_size)
+    print(f"{args.count} salads at {rate:,.0f} salads/sec")
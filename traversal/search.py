@@ -0,0 +1,266 @@
+""" Searches the ingredient graph for the highest scoring salad compositions
+within a set of composition limits, rather than building one greedily.
+
+A composition is scored by the aggregate strength of all of its pairings,
+i.e. the sum of the weights between every pair of its ingredients. Unlike the
+step-by-step weighting used by the Traverser, this score does not depend on
+the order in which ingredients were picked, so a composition is treated as a
+set.
+
+Two search methods are provided:
+
+* beam_search keeps the strongest partial compositions at each size and
+  extends only those. It is fast but may miss the optimum.
+* branch_and_bound enumerates compositions depth first, pruning any branch
+  whose upper bound cannot beat the compositions found so far. It is exact
+  when it finishes within its budget.
+
+Both accept a node budget and a time budget, and report how many search
+nodes were explored.
+"""
+import sys
+sys.path.append("..")
+import heapq
+import time
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+from models.ingredient import IngredientType, Ingredient
+from models.graph import Graph
+
+Limits = Dict[IngredientType, Tuple[int, int]]
+ScoredComposition = Tuple[float, List[Ingredient]]
+
+class SearchResult(NamedTuple):
+    """ The best compositions found, strongest first, along with the number of
+    search nodes explored and whether the search space was fully covered.
+    Only an exhaustive branch-and-bound result is guaranteed to be optimal.
+    """
+    compositions: List[ScoredComposition]
+    nodes_explored: int
+    exhaustive: bool
+
+
+class _SearchSpace:
+    """ Dense, index-based view of the graph used by both search methods.
+    Candidates are ordered from the strongest total weight to the weakest, so
+    that good compositions tend to be found early.
+    """
+    def __init__(self, graph: Graph, limits: Limits, fixed: Sequence[Ingredient]):
+        self.fixed = list(fixed)
+        fixed_set = set(self.fixed)
+        nodes = [n for n in graph.get_nodes()
+                 if n not in fixed_set and n.get_type() in limits]
+        weights = {n: graph.get_weights_from(n) for n in nodes}
+        nodes.sort(key=lambda n: sum(weights[n].values()), reverse=True)
+
+        self.nodes = nodes
+        self.types: List[IngredientType] = [n.get_type() for n in nodes]
+        self.weights: List[List[float]] = [[weights[a].get(b, 0) for b in nodes]
+                                           for a in nodes]
+        self.minimums = {t: limits[t][0] for t in limits}
+        self.maximums = {t: limits[t][1] for t in limits}
+
+        # Fixed ingredients count towards the limits and contribute their
+        # weights to every candidate.
+        self.fixed_counts = {t: 0 for t in limits}
+        for ing in self.fixed:
+            if ing.get_type() in self.fixed_counts:
+                self.fixed_counts[ing.get_type()] += 1
+        fixed_weights = [graph.get_weights_from(f) for f in self.fixed]
+        self.fixed_score = sum(fixed_weights[i].get(b, 0)
+                               for i in range(len(self.fixed)) for b in self.fixed[i + 1:])
+        self.fixed_gains = [sum(w.get(n, 0) for w in fixed_weights) for n in nodes]
+
+        # Prefix sums of each candidate's neighbour weights sorted from
+        # strongest to weakest, used to bound the weight a candidate can gain
+        # from the ingredients which are yet to be added.
+        self.top_sums: List[List[float]] = []
+        for row in self.weights:
+            sums = [0]
+            for w in sorted(row, reverse=True):
+                sums.append(sums[-1] + w)
+            self.top_sums.append(sums)
+
+        self.capacity = sum(max(0, self.maximums[t] - self.fixed_counts[t])
+                            for t in limits)
+
+    def is_complete(self, counts: Dict[IngredientType, int]) -> bool:
+        return all(counts[t] >= self.minimums[t] for t in counts)
+
+    def has_room(self, counts: Dict[IngredientType, int], ingredient_type) -> bool:
+        return counts[ingredient_type] < self.maximums[ingredient_type]
+
+    def to_composition(self, score: float, chosen: Sequence[int]) -> ScoredComposition:
+        return (score, self.fixed + [self.nodes[i] for i in chosen])
+
+
+class _TopN:
+    """ Keeps the n strongest distinct compositions offered to it.
+    """
+    def __init__(self, n: int):
+        self.n = n
+        self.heap: List[Tuple[float, Tuple[int, ...]]] = []
+        self.seen = set()
+
+    def offer(self, score: float, chosen: Sequence[int]):
+        key = tuple(sorted(chosen))
+        if key in self.seen:
+            return
+        if len(self.heap) < self.n:
+            heapq.heappush(self.heap, (score, key))
+            self.seen.add(key)
+        elif score > self.heap[0][0]:
+            _, evicted = heapq.heappushpop(self.heap, (score, key))
+            self.seen.discard(evicted)
+            self.seen.add(key)
+
+    def threshold(self) -> float:
+        """ Returns the score a composition must beat to be kept.
+        """
+        return self.heap[0][0] if len(self.heap) == self.n else float("-inf")
+
+    def results(self, space: _SearchSpace) -> List[ScoredComposition]:
+        return [space.to_composition(score, chosen)
+                for score, chosen in sorted(self.heap, key=lambda e: e[0], reverse=True)]
+
+
+class _Budget:
+    def __init__(self, max_nodes: int, time_limit: float):
+        self.max_nodes = max_nodes
+        self.deadline = time.monotonic() + time_limit if time_limit is not None else None
+        self.nodes = 0
+
+    def spend(self) -> bool:
+        """ Records one explored node. Returns False, without recording it,
+        once the budget is used up.
+        """
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            return False
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % 256 == 0 and \
+                time.monotonic() > self.deadline:
+            return False
+        return True
+
+
+def beam_search(graph: Graph, limits: Limits, top_n: int = 5, beam_width: int = 50,
+                fixed: Sequence[Ingredient] = (), max_nodes: int = None,
+                time_limit: float = None) -> SearchResult:
+    """ Returns the top_n compositions found by a beam search which, at every
+    composition size, keeps only the beam_width strongest partial
+    compositions. Any fixed ingredients are included in every composition.
+    """
+    space = _SearchSpace(graph, limits, fixed)
+    best = _TopN(top_n)
+    budget = _Budget(max_nodes, time_limit)
+
+    # Each beam entry is (score, chosen indices, counts per type, gain of
+    # every candidate against the chosen and fixed ingredients).
+    beam = [(space.fixed_score, (), dict(space.fixed_counts), list(space.fixed_gains))]
+    if space.is_complete(space.fixed_counts):
+        best.offer(space.fixed_score, ())
+
+    within_budget = True
+    while beam and within_budget:
+        expansions: Dict[frozenset, Tuple] = {}
+        for score, chosen, counts, gains in beam:
+            for c in range(len(space.nodes)):
+                if c in chosen or not space.has_room(counts, space.types[c]):
+                    continue
+                key = frozenset(chosen + (c,))
+                if key in expansions:
+                    continue
+                if not budget.spend():
+                    within_budget = False
+                    break
+                expansions[key] = (score + gains[c], chosen + (c,), counts, gains)
+            if not within_budget:
+                break
+
+        ranked = heapq.nlargest(beam_width, expansions.values(), key=lambda e: e[0])
+        beam = []
+        for score, chosen, parent_counts, parent_gains in ranked:
+            added = chosen[-1]
+            counts = dict(parent_counts)
+            counts[space.types[added]] += 1
+            gains = [g + w for g, w in zip(parent_gains, space.weights[added])]
+            beam.append((score, chosen, counts, gains))
+            if space.is_complete(counts):
+                best.offer(score, chosen)
+
+    return SearchResult(best.results(space), budget.nodes, False)
+
+
+def branch_and_bound(graph: Graph, limits: Limits, top_n: int = 5,
+                     fixed: Sequence[Ingredient] = (), max_nodes: int = None,
+                     time_limit: float = None) -> SearchResult:
+    """ Returns the top_n compositions found by a depth-first branch-and-bound
+    search. A branch is pruned when an upper bound on the score of any of its
+    completions cannot beat the current top_n. The bound adds, for the best
+    remaining candidates of each type, their weight to the chosen
+    ingredients plus half the sum of their strongest neighbour weights for
+    the slots left to fill. If the search finishes within its budget the
+    result is exact.
+    """
+    space = _SearchSpace(graph, limits, fixed)
+    best = _TopN(top_n)
+    budget = _Budget(max_nodes, time_limit)
+    n = len(space.nodes)
+
+    def upper_bound(score, counts, gains, start) -> float:
+        remaining = space.capacity - sum(counts[t] - space.fixed_counts[t] for t in counts)
+        if remaining <= 0:
+            return score
+        partners = min(remaining - 1, n - 1)
+        optimistic: Dict[IngredientType, List[float]] = {t: [] for t in counts}
+        for c in range(start, n):
+            t = space.types[c]
+            if space.has_room(counts, t):
+                optimistic[t].append(gains[c] + space.top_sums[c][partners] / 2)
+        bound = score
+        for t, values in optimistic.items():
+            room = space.maximums[t] - counts[t]
+            bound += sum(heapq.nlargest(room, values))
+        return bound
+
+    def can_complete(counts, start) -> bool:
+        needed = {t: space.minimums[t] - counts[t] for t in counts
+                  if counts[t] < space.minimums[t]}
+        for c in range(start, n):
+            if not needed:
+                break
+            t = space.types[c]
+            if t in needed:
+                needed[t] -= 1
+                if needed[t] == 0:
+                    del needed[t]
+        return not needed
+
+    def visit(score, chosen, counts, gains, start) -> bool:
+        if not budget.spend():
+            return False
+        if space.is_complete(counts):
+            best.offer(score, chosen)
+
+        children = [c for c in range(start, n) if space.has_room(counts, space.types[c])]
+        # Visit the most promising children first to raise the threshold early.
+        children.sort(key=lambda c: gains[c], reverse=True)
+        for c in children:
+            t = space.types[c]
+            counts[t] += 1
+            if not can_complete(counts, c + 1):
+                counts[t] -= 1
+                continue
+            child_gains = [g + w for g, w in zip(gains, space.weights[c])]
+            if upper_bound(score + gains[c], counts, child_gains, c + 1) > best.threshold():
+                if not visit(score + gains[c], chosen + (c,), counts, child_gains, c + 1):
+                    counts[t] -= 1
+                    return False
+            counts[t] -= 1
+        return True
+
+    counts = dict(space.fixed_counts)
+    exhaustive = True
+    if can_complete(counts, 0):
+        exhaustive = visit(space.fixed_score, (), counts, list(space.fixed_gains), 0)
+
+    return SearchResult(best.results(space), budget.nodes, exhaustive)
@@ -0,0 +1,47 @@
+import pytest
+from preprocessing.artifact import build_artifact
+from models.ingredient import IngredientType
+from .batch import run_batch, BatchResult
+from .traverser import Traverser, greedy_chooser
+
+custom_limits = {
+    IngredientType.BASE: (1, 1),
+    IngredientType.TOPPING: (1, 2),
+    IngredientType.PROTEIN: (1, 1),
+    IngredientType.DRESSING: (1, 1)
+}
+
+class TestBatch:
+    def test_run_batch_matches_single_traversals(self, sample_graph):
+        start_names = ["spinach", "chicken", "tomato"]
+        limits_configs = [Traverser.salad_composition_limits, custom_limits]
+        results = run_batch("./data", limits_configs, start_names, workers=2)
+
+        assert [(r.start, r.limits_index) for r in results] == \
+            [(name, idx) for name in start_names for idx in range(2)]
+
+        G = sample_graph
+        for result in results:
+            t = Traverser(G, limits_configs[result.limits_index])
+            expected = t.generate(greedy_chooser, G.get_node_by_name(result.start))
+            assert result.composition == [i.get_name() for i in expected]
+
+    def test_run_batch_from_artifact(self, tmp_path):
+        artifact_path = str(tmp_path / "corpus.sim")
+        build_artifact("./data", artifact_path)
+        start_names = ["spinach", "chicken"]
+        results = run_batch("./data", start_names=start_names, workers=2,
+                            artifact_path=artifact_path)
+
+        for result in results:
+            t = Traverser.from_artifact(artifact_path)
+            expected = t.generate(greedy_chooser, t.graph.get_node_by_name(result.start))
+            assert result.composition == [i.get_name() for i in expected]
+
+    def test_run_batch_refuses_stale_artifact(self, tmp_path):
+        artifact_path = str(tmp_path / "corpus.sim")
+        with pytest.raises(ValueError):
+            run_batch("./data", start_names=["spinach"], artifact_path=artifact_path)
+        build_artifact("./data", artifact_path, metric="jaccard")
+        with pytest.raises(ValueError):
+            run_batch("./data", start_names=["spinach"], artifact_path=artifact_path)
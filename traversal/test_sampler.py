@@ -0,0 +1,52 @@
+import sys
+sys.path.append("..")
+from collections import Counter
+import numpy as np
+import pytest
+from models.graph import BACKENDS
+from models.ingredient import IngredientType
+from .sampler import SaladSampler, throughput
+from .traverser import Traverser, greedy_chooser
+
+custom_limits = {
+    IngredientType.BASE: (1, 1),
+    IngredientType.TOPPING: (1, 2),
+    IngredientType.PROTEIN: (1, 1)
+}
+
+class TestSampler:
+    @pytest.fixture(params=BACKENDS)
+    def G(self, request, sample_graphs):
+        return sample_graphs[request.param]
+
+    def test_salads_respect_limits(self, G):
+        for limits in (Traverser.salad_composition_limits, custom_limits):
+            salads = SaladSampler(G, limits, seed=0).sample(200)
+            for salad in salads:
+                assert len(set(salad)) == len(salad)
+                counts = Counter(i.get_type() for i in salad)
+                assert set(counts) <= set(limits)
+                for t, (minimum, maximum) in limits.items():
+                    assert minimum <= counts[t] <= maximum
+
+    def test_seeded_samples_are_reproducible(self, G):
+        a = SaladSampler(G, seed=7).sample_indices(50)
+        b = SaladSampler(G, seed=7).sample_indices(50)
+        c = SaladSampler(G, seed=8).sample_indices(50)
+        assert np.array_equal(a, b)
+        assert not np.array_equal(a, c)
+        assert len({tuple(row) for row in a.tolist()}) > 1
+
+    def test_zero_temperature_matches_greedy_traversal(self, G):
+        sampler = SaladSampler(G, temperature=0)
+        for name in ["spinach", "chicken", "tomato"]:
+            start = G.get_node_by_name(name)
+            expected = Traverser(G).generate(greedy_chooser, start)
+            assert sampler.sample(3, start) == [expected] * 3
+
+    def test_batches_and_throughput(self, G):
+        sampler = SaladSampler(G, seed=1)
+        batches = list(sampler.sample_batches(25, batch_size=10))
+        assert [len(b) for b in batches] == [10, 10, 5]
+        assert all(b.shape[1] == sampler.max_length for b in batches)
+        assert throughput(sampler, 100, batch_size=50) > 0
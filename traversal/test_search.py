@@ -0,0 +1,70 @@
+import itertools
+import pytest
+from models.ingredient import IngredientType
+from .search import beam_search, branch_and_bound
+from .traverser import Traverser
+
+small_limits = {
+    IngredientType.BASE: (1, 1),
+    IngredientType.TOPPING: (1, 2),
+    IngredientType.PROTEIN: (1, 1),
+    IngredientType.DRESSING: (0, 1)
+}
+
+def score(G, composition):
+    return sum(G.get_weight_between(a.get_name(), b.get_name())
+               for a, b in itertools.combinations(composition, 2))
+
+def brute_force(G, limits, top_n):
+    by_type = {t: [n for n in G.get_nodes() if n.get_type() == t] for t in limits}
+    per_type = []
+    for t, (minimum, maximum) in limits.items():
+        per_type.append([c for k in range(minimum, maximum + 1)
+                         for c in itertools.combinations(by_type[t], k)])
+    scores = sorted((score(G, [i for group in choice for i in group])
+                     for choice in itertools.product(*per_type)), reverse=True)
+    return scores[:top_n]
+
+class TestSearch:
+    @pytest.fixture
+    def G(self, sample_graph):
+        return sample_graph
+
+    def test_branch_and_bound_is_exact(self, G):
+        result = branch_and_bound(G, small_limits, top_n=5)
+        assert result.exhaustive
+        assert [s for s, _ in result.compositions] == brute_force(G, small_limits, 5)
+        for s, composition in result.compositions:
+            assert s == score(G, composition)
+            for t, (minimum, maximum) in small_limits.items():
+                assert minimum <= len([i for i in composition if i.get_type() == t]) <= maximum
+
+    def test_beam_search_finds_valid_compositions(self, G):
+        exact = branch_and_bound(G, small_limits, top_n=3)
+        result = beam_search(G, small_limits, top_n=3, beam_width=20)
+        assert len(result.compositions) == 3
+        assert result.nodes_explored > 0
+        assert result.compositions[0][0] <= exact.compositions[0][0]
+        for s, composition in result.compositions:
+            assert s == score(G, composition)
+            assert len(set(composition)) == len(composition)
+
+    def test_node_budget(self, G):
+        result = branch_and_bound(G, Traverser.salad_composition_limits, max_nodes=50)
+        assert not result.exhaustive
+        assert result.nodes_explored == 50
+
+        result = beam_search(G, small_limits, max_nodes=10)
+        assert result.nodes_explored <= 10
+
+    def test_traverser_search_keeps_composition(self, G):
+        t = Traverser(G, small_limits)
+        chicken = G.get_node_by_name("chicken")
+        t.add_ingredient_to_composition(chicken)
+        t._pop_used_ingredients()
+
+        result = t.search(top_n=2, method="exact")
+        assert result.exhaustive
+        for s, composition in result.compositions:
+            assert composition[0] == chicken
+            assert s == score(G, composition)
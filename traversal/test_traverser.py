@@ -1,10 +1,10 @@
 import sys
 sys.path.append("..")
+import threading
 import pytest
-from preprocessing.main import create_mappings
-from models.graph import Graph
+from models.graph import BACKENDS, create_graph
 from models.ingredient import IngredientType
-from .traverser import Traverser
+from .traverser import Traverser, TopKChooser, greedy_chooser
 
 default_limits = {
     IngredientType.BASE: (1, 2),
@@ -21,29 +21,34 @@ custom_limits = {
 }
 
 class TestTraverser:
-    mappings = create_mappings("./data")
-    G = Graph(mappings)
+    @pytest.fixture(params=BACKENDS)
+    def backend(self, request):
+        return request.param
 
-    def test_init(self):
-        t = Traverser(self.G)
+    @pytest.fixture
+    def G(self, backend, sample_graphs):
+        return sample_graphs[backend]
+
+    def test_init(self, G):
+        t = Traverser(G)
         assert t is not None
 
-    def test_default_and_custom_limits(self):
-        t = Traverser(self.G)
+    def test_default_and_custom_limits(self, G):
+        t = Traverser(G)
         assert t.get_limits() == default_limits
 
-        t = Traverser(self.G, custom_limits)
+        t = Traverser(G, custom_limits)
         assert t.get_limits() == custom_limits
 
-    def test_limit_helpers(self):
-        t = Traverser(self.G)
+    def test_limit_helpers(self, G):
+        t = Traverser(G)
 
         # Check default limits are computed properly.
         assert t._can_add_more(IngredientType.BASE) is True
         assert t._needs_more(IngredientType.BASE) is True
 
-        ing_base_pasta = self.G.get_node_by_name("pasta")
-        ing_base_spinach = self.G.get_node_by_name("spinach")
+        ing_base_pasta = G.get_node_by_name("pasta")
+        ing_base_spinach = G.get_node_by_name("spinach")
 
         # Add one base to the composition. Default limits says we can have a
         # minimum of one base and a maximum of two, so _can_add_more() should
@@ -59,13 +64,13 @@ class TestTraverser:
         assert t._can_add_more(IngredientType.BASE) is False
         assert t._needs_more(IngredientType.BASE) is False
 
-    def test_composition_filtering(self):
-        t = Traverser(self.G)
+    def test_composition_filtering(self, G):
+        t = Traverser(G)
         assert t.get_composition() == []
 
         # Add some ingredients to the salad
-        ing_tomato = self.G.get_node_by_name("tomato")
-        ing_chicken = self.G.get_node_by_name("chicken")
+        ing_tomato = G.get_node_by_name("tomato")
+        ing_chicken = G.get_node_by_name("chicken")
         t.add_ingredient_to_composition(ing_tomato)
         assert t.get_composition() == [ing_tomato]
         t.add_ingredient_to_composition(ing_chicken)
@@ -83,3 +88,115 @@ class TestTraverser:
         # The instance variable shouldn't be mutated through filtering.
         assert t.get_composition() == [ing_tomato, ing_chicken]
 
+
+    def test_candidate_strengths_match_weighting_scheme(self, G):
+        t = Traverser(G)
+        for name in ["spinach", "tomato", "chicken"]:
+            t.add_ingredient_to_composition(G.get_node_by_name(name))
+            t._pop_used_ingredients()
+
+        # Recompute every strength directly from the composition: each
+        # ingredient's raw strength is weighted 2 ** position / n, and the
+        # total is scaled by 2 ** n / n.
+        n = len(t.get_composition())
+        expected = {}
+        for candidate in t.ingredients:
+            strength = sum(G.get_weight_between(ing.get_name(), candidate.get_name())
+                           * 2 ** pos / n for pos, ing in enumerate(t.get_composition()))
+            expected[candidate] = strength * 2 ** n / n
+
+        candidates = t._get_next_candidates()
+        assert len(candidates) == len(t.ingredients)
+        for candidate, strength in candidates:
+            assert strength == pytest.approx(expected[candidate])
+        assert [c[1] for c in candidates] == sorted([c[1] for c in candidates], reverse=True)
+
+    def test_generate_greedy(self, G):
+        t = Traverser(G)
+        spinach = G.get_node_by_name("spinach")
+        composition = t.generate(greedy_chooser, spinach)
+
+        assert composition[0] == spinach
+        assert composition == t.get_composition()
+        for ingredient_type, (_, maximum) in default_limits.items():
+            assert len(t._filter_composition_on_ingredient_type(ingredient_type)) == maximum
+
+        # The greedy choice is always the strongest candidate at each step.
+        replay = Traverser(G)
+        replay.add_ingredient_to_composition(spinach)
+        replay._pop_used_ingredients()
+        for ing in composition[1:]:
+            assert replay._get_next_candidates()[0][0] == ing
+            replay.add_ingredient_to_composition(ing)
+            replay._pop_used_ingredients()
+
+    def test_generate_with_chooser(self, G):
+        first = Traverser(G, custom_limits).generate(TopKChooser(3, seed=1))
+        second = Traverser(G, custom_limits).generate(TopKChooser(3, seed=1))
+        assert first == second
+        # The corpus has a single dressing, so that maximum cannot be reached.
+        available = {t: len([n for n in G.get_nodes() if n.get_type() == t])
+                     for t in custom_limits}
+        assert len(first) == sum(min(maximum, available[t])
+                                 for t, (_, maximum) in custom_limits.items())
+
+        seen = []
+        def last_choice(candidates):
+            seen.append(len(candidates))
+            return len(candidates) - 1
+        Traverser(G).generate(last_choice)
+        assert len(seen) > 0
+
+    def test_generate_on_sparse_graph(self, G, backend, sample_mappings):
+        sparse = create_graph(sample_mappings, backend, top_k=2)
+        composition = Traverser(sparse).generate(greedy_chooser,
+                                                 sparse.get_node_by_name("spinach"))
+        assert len(composition) == len(Traverser(G).generate(greedy_chooser))
+        assert len(set(composition)) == len(composition)
+
+    def test_interactive_prefetch_matches_plain_traversal(self, G, monkeypatch):
+        def play(prefetch):
+            answers = iter(["0", "4", "0", "2", "0", "0", "0", "0", "0", "0", "0", "0"])
+            monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+            t = Traverser(G, prefetch=prefetch)
+            t.start_traversal()
+            return t
+
+        plain, prefetched = play(0), play(3)
+        assert prefetched.get_composition() == plain.get_composition()
+        assert plain.prefetch_hits == 0
+        # Every choice but the fifth-ranked one was among the top three.
+        assert prefetched.prefetch_hits == len(plain.get_composition()) - 1
+
+    def test_prefetch_cancels_other_speculations(self, G):
+        t = Traverser(G, prefetch=2)
+        candidates = [c for c, _ in t._get_next_candidates()]
+        prefetch = t._prefetcher.start(candidates, t._snapshot(), t._speculate)
+        speculations = dict(prefetch._speculations)
+        assert prefetch.take(candidates[5]) is None
+        assert all(cancelled.is_set() for _, cancelled in speculations.values())
+
+        prefetch = t._prefetcher.start(candidates, t._snapshot(), t._speculate)
+        strengths, ranking = prefetch.take(candidates[1])
+        t._prefetcher.shutdown()
+        expected = Traverser(G)
+        expected.add_ingredient_to_composition(candidates[1])
+        expected._pop_used_ingredients()
+        assert strengths == expected._strengths
+        assert ranking == expected._get_next_candidates()
+
+    def test_speculations_use_a_snapshot(self, G):
+        t = Traverser(G, prefetch=1)
+        candidates = [c for c, _ in t._get_next_candidates()]
+        state = t._snapshot()
+        t.add_ingredient_to_composition(candidates[0])
+        t._pop_used_ingredients()
+
+        # Changing the traverser after the snapshot does not affect the speculation.
+        strengths, ranking = t._speculate(candidates[1], state, threading.Event())
+        expected = Traverser(G)
+        expected.add_ingredient_to_composition(candidates[1])
+        expected._pop_used_ingredients()
+        assert strengths == expected._strengths
+        assert ranking == expected._get_next_candidates()
+        assert len(state.strengths) == len(G.get_nodes())
@@ -1,11 +1,49 @@
 import sys
 sys.path.append("..")
-from typing import Dict, List, Tuple
+import random
+from typing import Callable, Dict, List, NamedTuple, Tuple
 from models.ingredient import IngredientType, Ingredient
 from models.graph import Graph
+from instrumentation.metrics import metrics
+from traversal.search import SearchResult, beam_search, branch_and_bound
+from traversal.prefetch import Prefetcher, Speculation
 
 CandidateIngredient = Tuple[Ingredient, int]
 
+# A chooser picks the next ingredient during a headless traversal. It is
+# given the ranked candidates, strongest first, and returns the index of the
+# chosen one.
+Chooser = Callable[[List[CandidateIngredient]], int]
+
+def greedy_chooser(candidates: List[CandidateIngredient]) -> int:
+    """
+    Always chooses the strongest candidate.
+    """
+    return 0
+
+class TopKChooser:
+    """
+    Chooses uniformly at random among the k strongest candidates. The
+    random number generator is seeded so traversals can be reproduced.
+    """
+    def __init__(self, k: int, seed: int = None):
+        assert k > 0, "k must be positive"
+        self.k = k
+        self.rng = random.Random(seed)
+
+    def __call__(self, candidates: List[CandidateIngredient]) -> int:
+        return self.rng.randrange(min(self.k, len(candidates)))
+
+class TraversalState(NamedTuple):
+    """
+    A copy of the running state of a traversal, from which speculations
+    work while the traversal itself may move on.
+    """
+    strengths: Dict[Ingredient, int]
+    ingredients: List[Ingredient]
+    type_counts: Dict[IngredientType, int]
+    composition_size: int
+
 class Traverser:
     """
     Provides methods to traverse an ingredient graph generated
@@ -26,7 +64,7 @@ class Traverser:
         IngredientType.DRESSING: (1, 1)
     }
 
-    def __init__(self, graph: Graph, limits=None):
+    def __init__(self, graph: Graph, limits=None, prefetch: int = 0):
         self.graph = graph
         self.ingredients = graph.get_nodes()
         self.salad_composition = []
@@ -35,21 +73,81 @@ class Traverser:
         if limits:
             self.salad_composition_limits = limits
 
-        self.start_traversal()
+        # Running state updated as ingredients are added to the composition,
+        # so candidates can be ranked without rescanning the composition.
+        # _strengths holds, for every remaining candidate, the sum of its
+        # weights to each composition ingredient multiplied by 2 ** (position
+        # of that ingredient in the composition).
+        self._type_counts: Dict[IngredientType, int] = {t: 0 for t in IngredientType}
+        self._strengths: Dict[Ingredient, int] = {i: 0 for i in self.ingredients}
+
+        # During an interactive traversal, the rankings following the top
+        # prefetch choices are computed in the background while the user
+        # chooses; see traversal.prefetch. _next_candidates holds a ranking
+        # of the current state which was already computed that way.
+        self._prefetcher = Prefetcher(prefetch) if prefetch > 0 else None
+        self._next_candidates: List[CandidateIngredient] = None
+        self.prefetch_hits = 0
+
+    @classmethod
+    def from_artifact(cls, artifact_path: str, limits=None, backend: str = "array"):
+        """
+        Creates a Traverser over the graph stored in a similarity artifact, which is
+        mapped read-only rather than recomputed; see preprocessing.artifact.
+        """
+        from preprocessing.artifact import open_artifact
+        return cls(open_artifact(artifact_path).graph(backend), limits)
 
     def start_traversal(self):
         """
-        Begins the ingredient graph traversal process.
+        Begins the interactive ingredient graph traversal process, which
+        prompts the user for each choice.
         """
         assert self.graph is not None
         assert self.ingredients is not None
         assert len(self.ingredients) > 0
 
-        while self._perform_traversal_iteration():
-            self._print_salad_composition()
+        try:
+            while self._perform_traversal_iteration():
+                self._print_salad_composition()
+        finally:
+            if self._prefetcher is not None:
+                self._prefetcher.shutdown()
         self._print_salad_composition()
 
-    def _perform_traversal_iteration(self):
+    def generate(self, chooser: Chooser = greedy_chooser,
+                 start: Ingredient = None) -> List[Ingredient]:
+        """
+        Runs a headless traversal from the current composition, optionally
+        adding a start ingredient first, and letting the chooser pick each
+        next ingredient until no candidates remain. Nothing is printed and
+        the user is never prompted. Returns the completed composition.
+        """
+        assert self.graph is not None
+        assert self.ingredients is not None
+
+        if start is not None:
+            self.add_ingredient_to_composition(start)
+            self._pop_used_ingredients()
+
+        while self._perform_traversal_iteration(chooser):
+            pass
+        return list(self.salad_composition)
+
+    def search(self, top_n: int = 5, method: str = "beam", **options) -> SearchResult:
+        """
+        Searches for the top_n strongest complete compositions which contain
+        the current composition, scored by the total weight between all
+        pairs of ingredients. The method is either "beam" for a beam search
+        or "exact" for branch-and-bound. Any remaining options, such as
+        max_nodes, time_limit or beam_width, are passed to the search.
+        """
+        search_methods = {"beam": beam_search, "exact": branch_and_bound}
+        assert method in search_methods, f"unknown search method {method}"
+        return search_methods[method](self.graph, self.salad_composition_limits, top_n,
+                                      fixed=self.salad_composition, **options)
+
+    def _perform_traversal_iteration(self, chooser: Chooser = None):
         """
         Performs one interation of traversal through the ingredient
         graph by executing the following:
@@ -57,19 +155,84 @@ class Traverser:
         1) Refreshing the ingredients instance property to remove used
            ingredients.
         2) Calculating the next best candidates.
-        3) Presenting the choices to the user.
-        4) Capturing the next choice taken by the user.
+        3) Presenting the choices to the user, or handing them to the
+           chooser if one is supplied.
+        4) Capturing the next choice taken by the user or chooser.
+
+        If prefetching is enabled, the rankings following the top choices
+        are computed while waiting for the user, and the one matching the
+        choice is used for the next iteration.
         """
-        next_candidates: List[CandidateIngredient] = self._get_next_candidates()
+        next_candidates: List[CandidateIngredient] = self._next_candidates
+        if next_candidates is None:
+            next_candidates = self._get_next_candidates()
+        self._next_candidates = None
+
         has_candidates_remaining = len(next_candidates) > 0
         if has_candidates_remaining:
-            self._print_ingredient_choices(next_candidates)
-            selected_ing = next_candidates[self._get_user_selection()][0]
-            self.add_ingredient_to_composition(selected_ing)
-            self._pop_used_ingredients()
+            speculation: Speculation = None
+            if chooser is None:
+                self._print_ingredient_choices(next_candidates)
+                prefetch = self._prefetcher.start([c for c, _ in next_candidates],
+                                                  self._snapshot(), self._speculate) \
+                    if self._prefetcher is not None else None
+                try:
+                    selection = self._get_user_selection()
+                    selected_ing = next_candidates[selection][0]
+                    speculation = prefetch.take(selected_ing) if prefetch is not None else None
+                finally:
+                    if prefetch is not None:
+                        prefetch.cancel()
+            else:
+                selection = chooser(next_candidates)
+                selected_ing = next_candidates[selection][0]
+
+            if speculation is not None:
+                self._apply_speculation(selected_ing, speculation)
+            else:
+                self.add_ingredient_to_composition(selected_ing)
+                self._pop_used_ingredients()
             return True
         return False
 
+    def _snapshot(self) -> TraversalState:
+        return TraversalState(dict(self._strengths), list(self.ingredients),
+                              dict(self._type_counts), len(self.salad_composition))
+
+    def _speculate(self, ingredient: Ingredient, state: TraversalState,
+                   cancelled) -> Speculation:
+        """
+        Computes, from a snapshot of the traverser's state, the running
+        strengths and candidate ranking which would follow adding the
+        supplied ingredient to the composition. Returns None if cancelled
+        part way through.
+        """
+        position_weighting = 2 ** state.composition_size
+        weights = self.graph.get_weights_from(ingredient)
+        strengths = {c: s + weights.get(c, 0) * position_weighting
+                     for c, s in state.strengths.items() if c != ingredient}
+        if cancelled.is_set():
+            return None
+
+        type_counts = dict(state.type_counts)
+        type_counts[ingredient.type] += 1
+        remaining = [i for i in state.ingredients if i != ingredient]
+        return strengths, self._rank_candidates(remaining, strengths, type_counts,
+                                                state.composition_size + 1)
+
+    def _apply_speculation(self, ingredient: Ingredient, speculation: Speculation):
+        """
+        Adds an ingredient to the composition using the state computed for it
+        by _speculate, which also becomes the next ranking.
+        """
+        strengths, ranking = speculation
+        self.salad_composition.append(ingredient)
+        self._type_counts[ingredient.type] += 1
+        self._strengths = strengths
+        self.ingredients = [i for i in self.ingredients if i != ingredient]
+        self._next_candidates = ranking
+        self.prefetch_hits += 1
+
     def _get_user_selection(self):
         """
         Continuously prompts the user for an ingredient selection until a valid
@@ -100,30 +263,39 @@ class Traverser:
         2) The aggregate strength of the shared molecules of
            previously selected ingredients to unselected candidates.
         """
+        with metrics.span("next_candidates"):
+            return self._rank_candidates(self.ingredients, self._strengths, self._type_counts,
+                                         len(self.salad_composition))
+
+    def _rank_candidates(self, ingredients: List[Ingredient], strengths: Dict[Ingredient, int],
+                         type_counts: Dict[IngredientType, int],
+                         ingredients_in_composition: int) -> List[CandidateIngredient]:
+        """
+        Ranks the supplied remaining ingredients by strength, keeping only the
+        types the limits still allow given the type_counts of a composition of
+        ingredients_in_composition ingredients.
+        """
         candidates: List[CandidateIngredient] = []
 
-        for candidate in self.ingredients:
-            if self._needs_more(candidate.type) or self._can_add_more(candidate.type):
-                # Calculate the aggregate strength between the candidate ingredient
-                # and all ingredients in the salad composition.
-                aggregate_strength = 0
-
-                # We apply a set of weightings when computing the
-                # strength.
-                # The first ingredient in the composition has the lowest
-                # weighting, increasing evenly until the most recently
-                # added ingredient is reached. The increment step is
-                # calculated as 1/len(salad_composition).
-                ingredients_in_composition = len(self.salad_composition)
-                curr_weighting = 1/ingredients_in_composition \
-                        if ingredients_in_composition > 0 else 1
-                for ing in self.salad_composition:
-                    raw_strength = self.graph.get_weight_between(ing.get_name(),
-                                                                 candidate.get_name())
-                    aggregate_strength += raw_strength * curr_weighting
-                    curr_weighting *= 2
-                candidates.append((candidate,
-                                   aggregate_strength * curr_weighting))
+        # We apply a set of weightings when computing the strength.
+        # The first ingredient in the composition has the lowest
+        # weighting, increasing evenly until the most recently
+        # added ingredient is reached. The increment step is
+        # calculated as 1/len(salad_composition), and the total is
+        # scaled by 2 ** len(salad_composition)/len(salad_composition).
+        # The running strengths already hold the sum of each raw
+        # strength multiplied by 2 ** position, so only the constant
+        # scaling is applied here.
+        scale = 2 ** ingredients_in_composition / ingredients_in_composition ** 2 \
+            if ingredients_in_composition > 0 else 1
+
+        # A type is allowed while it is below its minimum or its maximum.
+        allowed = {t for t, (minimum, maximum) in self.salad_composition_limits.items()
+                   if type_counts[t] < minimum or type_counts[t] < maximum}
+
+        for candidate in ingredients:
+            if candidate.type in allowed:
+                candidates.append((candidate, strengths[candidate] * scale))
         return sorted(candidates, key=lambda c: c[1], reverse=True)
 
     def _pop_used_ingredients(self):
@@ -131,8 +303,10 @@ class Traverser:
         Removes items from the ingredients instance property which have
         been incorporated into the salad composition.
         """
-        self.ingredients = [i for i in self.ingredients if i not in
-                            self.salad_composition]
+        used = set(self.salad_composition)
+        self.ingredients = [i for i in self.ingredients if i not in used]
+        for i in used:
+            self._strengths.pop(i, None)
 
     def get_composition(self):
         return self.salad_composition
@@ -147,9 +321,7 @@ class Traverser:
         can be added to the salad composition without reaching its limits.
         """
         allowable_range = self.salad_composition_limits[ingredient_type]
-        filtered_list = \
-            self._filter_composition_on_ingredient_type(ingredient_type)
-        return len(filtered_list) < allowable_range[1]
+        return self._type_counts[ingredient_type] < allowable_range[1]
 
     def _needs_more(self, ingredient_type):
         """
@@ -158,12 +330,22 @@ class Traverser:
         number is reached.
         """
         allowable_range = self.salad_composition_limits[ingredient_type]
-        filtered_list = \
-            self._filter_composition_on_ingredient_type(ingredient_type)
-        return len(filtered_list) < allowable_range[0]
+        return self._type_counts[ingredient_type] < allowable_range[0]
 
     def add_ingredient_to_composition(self, ingredient):
+        """
+        Appends an ingredient to the salad composition and folds its
+        weights to the remaining candidates into their running strengths.
+        """
+        position_weighting = 2 ** len(self.salad_composition)
+        # Candidates missing from the weights have no edge to the ingredient
+        # in a sparse graph, and gain nothing from it.
+        weights = self.graph.get_weights_from(ingredient)
+        for candidate in self._strengths:
+            self._strengths[candidate] += weights.get(candidate, 0) * position_weighting
+
         self.salad_composition.append(ingredient)
+        self._type_counts[ingredient.type] += 1
 
     def _print_ingredient_choices(self, candidates: List[CandidateIngredient]):
         """